@@ -0,0 +1,9 @@
+'''
+Pruebas de rendimiento de extremo a extremo sin evidencia real ni red:
+
+    cd src && python -m benchmarks --archivos 2000 --workers 4 --salida resultados.json
+
+Genera una imagen .E01 sintetica (ver imagen_sintetica), la ingesta completa con digestE01,
+lanza las consultas habituales y guarda en JSON el tiempo total, el pico de memoria (RSS),
+las filas por segundo y las metricas de cada etapa registradas en stage_metrics.
+'''
@@ -0,0 +1,185 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.arranque import LIMITE_ARRANQUE_SEG, comprobar_presupuesto, medir_arranque
+from benchmarks.imagen_sintetica import generar_evidencia
+
+
+# Consultas habituales de la interfaz: busqueda por ruta, archivos interesantes, hives y timeline
+CONSULTAS = {
+    "busqueda_ruta": (
+        "SELECT * FROM filesystem_entry WHERE type !='dir' AND full_path LIKE ?", ("%documento de prueba 00001%",)
+    ),
+    "busqueda_ruta_trigram": (
+        """SELECT e.* FROM filesystem_entry_fts JOIN filesystem_entry e ON e.entry_id = filesystem_entry_fts.rowid
+           WHERE filesystem_entry_fts MATCH ? AND e.type != 'dir'""",
+        ('full_path : "documento de prueba 00001"',)
+    ),
+    "archivos_interesantes": (
+        """SELECT entry_id, partition_id, full_path, LOWER(extension) AS ext FROM filesystem_entry
+           WHERE ext IN ('.pdf', '.doc', '.txt', '.snt', '.pst', '.ost', '.zip', '.rar', '.7z', '.eml')
+             AND known = 0
+           ORDER BY entry_id""", ()
+    ),
+    "hives": (
+        "SELECT full_path FROM filesystem_entry WHERE LOWER(full_path) LIKE ?", ("%/system32/config/%",)
+    ),
+    "timeline": (
+        "SELECT * FROM unified_timeline ORDER BY timestamp DESC LIMIT 1000", ()
+    ),
+    "por_extension": (
+        "SELECT LOWER(extension), COUNT(*), SUM(size) FROM filesystem_entry GROUP BY LOWER(extension)", ()
+    ),
+}
+
+
+def _pico_rss_bytes():
+    # ru_maxrss esta en KB en Linux y en bytes en macOS
+    factor = 1 if sys.platform == "darwin" else 1024
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * factor
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * factor
+    return {"proceso": propio, "hijos": hijos}
+
+
+def medir_consultas(db_path, repeticiones):
+    conn = sqlite3.connect(db_path)
+    resultados = {}
+    for nombre, (sql, parametros) in CONSULTAS.items():
+        tiempos = []
+        filas = 0
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            filas = len(conn.execute(sql, parametros).fetchall())
+            tiempos.append(time.perf_counter() - inicio)
+        tiempos.sort()
+        resultados[nombre] = {"filas": filas, "min_seg": tiempos[0], "mediana_seg": tiempos[len(tiempos) // 2],
+                              "max_seg": tiempos[-1]}
+    conn.close()
+    return resultados
+
+
+def leer_metricas_etapas(db_path):
+    conn = sqlite3.connect(db_path)
+    filas = conn.execute(
+        "SELECT etapa, duracion_seg, cpu_seg, memoria_pico, contadores, error FROM stage_metrics ORDER BY metric_id"
+    ).fetchall()
+    conn.close()
+    return [
+        {"etapa": etapa, "duracion_seg": duracion, "cpu_seg": cpu, "memoria_pico": memoria,
+         "contadores": json.loads(contadores) if contadores else {}, "error": error}
+        for etapa, duracion, cpu, memoria, contadores, error in filas
+    ]
+
+
+def ejecutar_benchmark(args):
+    # Importacion diferida: generar la evidencia no necesita pytsk3/pyewf
+    from forensic_core.cli import ingestar_caso
+    from forensic_core.etapas import ETAPA_RECORRIDO
+    from forensic_core.progreso import ProgresoIngesta
+
+    directorio = args.directorio or tempfile.mkdtemp(prefix="forensic_bench_")
+    inicio = time.perf_counter()
+    evidencia = generar_evidencia(os.path.join(directorio, "evidencia"), archivos=args.archivos,
+                                  semilla=args.semilla, fraccion_borrados=args.borrados)
+    tiempo_generacion = time.perf_counter() - inicio
+
+    casos_dir = os.path.join(directorio, "casos")
+    caso_dir = os.path.join(casos_dir, "bench")
+    shutil.rmtree(caso_dir, ignore_errors=True)
+    os.makedirs(caso_dir)
+
+    progreso = ProgresoIngesta(ruta_log=os.path.join(caso_dir, "ingesta_progreso.jsonl"))
+    inicio = time.perf_counter()
+    try:
+        db_path, _ = ingestar_caso(evidencia["e01"], "bench", casos_dir, progreso=progreso, workers=args.workers,
+                                   politica_hash=args.politica_hash, modo_recorrido=args.modo_recorrido)
+    finally:
+        progreso.cerrar()
+    tiempo_ingesta = time.perf_counter() - inicio
+
+    conn = sqlite3.connect(db_path)
+    filas = conn.execute("SELECT COUNT(*) FROM filesystem_entry").fetchone()[0]
+    conn.close()
+    etapas = leer_metricas_etapas(db_path)
+    duracion_recorrido = sum(e["duracion_seg"] or 0 for e in etapas if e["etapa"] == ETAPA_RECORRIDO)
+
+    resultados = {
+        "fecha": datetime.now(timezone.utc).isoformat(),
+        "entorno": {"python": platform.python_version(), "plataforma": platform.platform(),
+                    "cpus": os.cpu_count(), "sqlite": sqlite3.sqlite_version},
+        "parametros": vars(args),
+        "evidencia": evidencia,
+        "generacion_seg": tiempo_generacion,
+        "ingesta_seg": tiempo_ingesta,
+        "filas_filesystem_entry": filas,
+        "filas_por_seg": filas / duracion_recorrido if duracion_recorrido else None,
+        "filas_por_seg_total": filas / tiempo_ingesta if tiempo_ingesta else None,
+        "pico_rss_bytes": _pico_rss_bytes(),
+        "etapas": etapas,
+        "consultas": medir_consultas(db_path, args.repeticiones),
+    }
+    if not args.conservar:
+        shutil.rmtree(caso_dir, ignore_errors=True)
+        if not args.directorio:
+            shutil.rmtree(directorio, ignore_errors=True)
+    return resultados
+
+
+def main(argv=None):
+    from forensic_core.hashing import POLITICA_HASH_SIEMPRE
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Ingesta de una imagen sintetica y consultas habituales")
+    parser.add_argument("--archivos", type=int, default=2000, help="ficheros generados en la imagen")
+    parser.add_argument("--semilla", type=int, default=1234)
+    parser.add_argument("--borrados", type=float, default=0.02, help="fraccion de ficheros borrados")
+    parser.add_argument("--workers", type=int, default=None, help="procesos de hash (por defecto, todas las CPU)")
+    parser.add_argument("--politica-hash", default=POLITICA_HASH_SIEMPRE,
+                        help="siempre, limite o diferido (diferido deja trabajo en segundo plano sin medir)")
+    parser.add_argument("--modo-recorrido", choices=("directorios", "mft"), default="directorios")
+    parser.add_argument("--repeticiones", type=int, default=5, help="repeticiones de cada consulta")
+    parser.add_argument("--directorio", default=None,
+                        help="directorio de trabajo; si se indica, la evidencia generada se reutiliza")
+    parser.add_argument("--conservar", action="store_true", help="no borrar el caso ingestado")
+    parser.add_argument("--salida", default="resultados_benchmark.json")
+    parser.add_argument("--limite-arranque", type=float, default=LIMITE_ARRANQUE_SEG,
+                        help="segundos maximos para importar la interfaz en frio")
+    parser.add_argument("--solo-arranque", action="store_true", help="medir solo el arranque, sin ingesta")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    arranque = medir_arranque()
+    fallos = comprobar_presupuesto(arranque, args.limite_arranque)
+    print(f"Arranque: {arranque['mediana_seg'] * 1000:.0f} ms importando {arranque['modulo']} "
+          f"(limite {args.limite_arranque * 1000:.0f} ms)")
+    for fallo in fallos:
+        print(f"  PRESUPUESTO DE ARRANQUE SUPERADO: {fallo}")
+
+    resultados = {"arranque": arranque} if args.solo_arranque else {"arranque": arranque, **ejecutar_benchmark(args)}
+    resultados["arranque"]["fallos"] = fallos
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    if args.solo_arranque:
+        return 1 if fallos else 0
+
+    print(f"Ingesta: {resultados['ingesta_seg']:.2f}s, {resultados['filas_filesystem_entry']} filas "
+          f"({resultados['filas_por_seg'] or 0:.0f} filas/s en el recorrido), "
+          f"pico RSS {resultados['pico_rss_bytes']['proceso'] / 1024 ** 2:.0f} MB")
+    for nombre, consulta in resultados["consultas"].items():
+        print(f"  {nombre}: {consulta['mediana_seg'] * 1000:.1f} ms ({consulta['filas']} filas)")
+    print(f"Resultados en {args.salida}")
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
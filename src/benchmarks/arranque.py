@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+
+
+'''
+Presupuesto de arranque: importar el punto de entrada de la interfaz (main) en un interprete
+nuevo no debe cargar las dependencias pesadas ni superar LIMITE_ARRANQUE_SEG. Las dependencias
+pesadas solo se importan al usar la opcion del menu que las necesita.
+'''
+
+MODULO_ARRANQUE = "main"
+MODULOS_PESADOS = ("pytsk3", "pyewf", "Registry", "impacket", "requests", "dotenv")
+LIMITE_ARRANQUE_SEG = 0.5
+
+_SCRIPT = """
+import json, sys, time
+inicio = time.perf_counter()
+import {modulo}
+duracion = time.perf_counter() - inicio
+print(json.dumps({{"duracion": duracion, "pesados": [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+
+def _mas_lentos(salida_importtime, n=10):
+    # Lineas de -X importtime: "import time: self [us] | cumulative | imported package"
+    modulos = []
+    for linea in salida_importtime.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        modulos.append((nombre.strip(), int(acumulado) / 1e6))
+    return sorted(modulos, key=lambda modulo: modulo[1], reverse=True)[:n]
+
+
+def medir_arranque(modulo=MODULO_ARRANQUE, repeticiones=5):
+    """
+    Importa `modulo` en `repeticiones` interpretes nuevos (desde src/) y devuelve la mediana del
+    tiempo de importacion, los modulos pesados que se cargaron y los imports mas lentos.
+    """
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = _SCRIPT.format(modulo=modulo, pesados=MODULOS_PESADOS)
+    duraciones, pesados, mas_lentos = [], set(), []
+    for _ in range(repeticiones):
+        proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=src_dir,
+                                 capture_output=True, text=True)
+        if proceso.returncode != 0:
+            raise RuntimeError(f"No se pudo importar {modulo}:\n{proceso.stderr[-2000:]}")
+        resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+        duraciones.append(resultado["duracion"])
+        pesados.update(resultado["pesados"])
+        mas_lentos = _mas_lentos(proceso.stderr)
+    duraciones.sort()
+    return {
+        "modulo": modulo,
+        "mediana_seg": duraciones[len(duraciones) // 2],
+        "min_seg": duraciones[0],
+        "max_seg": duraciones[-1],
+        "pesados_cargados": sorted(pesados),
+        "mas_lentos": mas_lentos,
+    }
+
+
+def comprobar_presupuesto(medicion, limite=LIMITE_ARRANQUE_SEG):
+    """
+    Lista de incumplimientos del presupuesto de arranque (vacia si se cumple).
+    """
+    fallos = []
+    if medicion["mediana_seg"] > limite:
+        fallos.append(f"importar {medicion['modulo']} tarda {medicion['mediana_seg']:.3f}s (limite {limite:.3f}s)")
+    if medicion["pesados_cargados"]:
+        fallos.append(f"importar {medicion['modulo']} carga {', '.join(medicion['pesados_cargados'])}")
+    return fallos
@@ -0,0 +1,127 @@
+import hashlib
+import struct
+import zlib
+
+
+'''
+Escritor minimo de imagenes EWF (.E01, estilo EnCase 6) en un solo segmento, para convertir
+las imagenes raw sinteticas sin depender de ewfacquire ni de un pyewf compilado con escritura.
+
+Secciones: header, volume, (sectors, table, table2)*, hash (MD5 de los datos) y done.
+Cada chunk se guarda comprimido con zlib si ocupa menos; si no, en claro seguido de su adler32.
+'''
+
+FIRMA_EVF = b"EVF\x09\x0d\x0a\xff\x00"
+TAMANO_DESCRIPTOR = 76
+BYTES_POR_SECTOR = 512
+SECTORES_POR_CHUNK = 64
+CHUNKS_POR_TABLA = 16375
+BIT_COMPRIMIDO = 0x80000000
+
+
+def _adler32(data):
+    return zlib.adler32(data) & 0xFFFFFFFF
+
+
+class _Segmento:
+    def __init__(self, destino):
+        self.f = open(destino, "wb")
+        self.f.write(FIRMA_EVF + struct.pack("<BHH", 1, 1, 0))
+
+    def seccion(self, tipo, datos):
+        inicio = self.f.tell()
+        siguiente = inicio + TAMANO_DESCRIPTOR + len(datos)
+        descriptor = struct.pack("<16sQQ40s", tipo, siguiente, TAMANO_DESCRIPTOR + len(datos), bytes(40))
+        self.f.write(descriptor + struct.pack("<I", _adler32(descriptor)) + datos)
+        return inicio
+
+    def abrir_seccion(self, tipo):
+        # Seccion de tamaño aun desconocido (sectors): el descriptor se reescribe al cerrarla
+        inicio = self.f.tell()
+        self.f.write(bytes(TAMANO_DESCRIPTOR))
+        return inicio, tipo
+
+    def cerrar_seccion(self, abierta):
+        inicio, tipo = abierta
+        fin = self.f.tell()
+        descriptor = struct.pack("<16sQQ40s", tipo, fin, fin - inicio, bytes(40))
+        self.f.seek(inicio)
+        self.f.write(descriptor + struct.pack("<I", _adler32(descriptor)))
+        self.f.seek(fin)
+
+    def done(self):
+        inicio = self.f.tell()
+        descriptor = struct.pack("<16sQQ40s", b"done", inicio, 0, bytes(40))
+        self.f.write(descriptor + struct.pack("<I", _adler32(descriptor)))
+        self.f.close()
+
+
+def _seccion_header(descripcion):
+    campos = ("c", "n", "a", "e", "t", "av", "ov", "m", "u", "p")
+    valores = ("BENCH", "1", descripcion, "benchmarks", "", "1.0", "Linux",
+               "2021 1 1 0 0 0", "2021 1 1 0 0 0", "0")
+    texto = "1\r\nmain\r\n" + "\t".join(campos) + "\r\n" + "\t".join(valores) + "\r\n\r\n"
+    return zlib.compress(texto.encode("ascii"))
+
+
+def _seccion_volume(numero_chunks, numero_sectores):
+    datos = struct.pack(
+        "<B3sIIIQIIIB3sIIIB3sII16s963s5s",
+        1, bytes(3), numero_chunks, SECTORES_POR_CHUNK, BYTES_POR_SECTOR, numero_sectores,
+        0, 0, 0, 1, bytes(3), 0, 0, 0, 0, bytes(3), SECTORES_POR_CHUNK, 0, bytes(16), bytes(963), bytes(5)
+    )
+    return datos + struct.pack("<I", _adler32(datos))
+
+
+def _seccion_tabla(offset_base, entradas):
+    cabecera = struct.pack("<IIQI", len(entradas), 0, offset_base, 0)
+    cabecera += struct.pack("<I", _adler32(cabecera))
+    cuerpo = struct.pack(f"<{len(entradas)}I", *entradas)
+    return cabecera + cuerpo + struct.pack("<I", _adler32(cuerpo))
+
+
+def escribir_ewf(origen_raw, destino_e01, descripcion="imagen sintetica", nivel_compresion=1):
+    """
+    Convierte la imagen raw origen_raw en destino_e01. Devuelve el MD5 de los datos.
+    """
+    tamano_chunk = SECTORES_POR_CHUNK * BYTES_POR_SECTOR
+    with open(origen_raw, "rb") as origen:
+        origen.seek(0, 2)
+        tamano = origen.tell()
+        origen.seek(0)
+        if tamano % BYTES_POR_SECTOR:
+            raise ValueError("El tamaño de la imagen debe ser multiplo de 512 bytes")
+
+        numero_chunks = (tamano + tamano_chunk - 1) // tamano_chunk
+        segmento = _Segmento(destino_e01)
+        segmento.seccion(b"header", _seccion_header(descripcion))
+        segmento.seccion(b"volume", _seccion_volume(numero_chunks, tamano // BYTES_POR_SECTOR))
+
+        md5 = hashlib.md5()
+        restantes = numero_chunks
+        while restantes:
+            abierta = segmento.abrir_seccion(b"sectors")
+            base = abierta[0]
+            entradas = []
+            for _ in range(min(restantes, CHUNKS_POR_TABLA)):
+                chunk = origen.read(tamano_chunk)
+                md5.update(chunk)
+                offset = segmento.f.tell() - base
+                comprimido = zlib.compress(chunk, nivel_compresion)
+                if len(comprimido) < len(chunk):
+                    segmento.f.write(comprimido)
+                    entradas.append(offset | BIT_COMPRIMIDO)
+                else:
+                    segmento.f.write(chunk + struct.pack("<I", _adler32(chunk)))
+                    entradas.append(offset)
+            segmento.cerrar_seccion(abierta)
+            restantes -= len(entradas)
+            tabla = _seccion_tabla(base, entradas)
+            segmento.seccion(b"table", tabla)
+            segmento.seccion(b"table2", tabla)
+
+        digest = md5.digest()
+        hash_datos = digest + bytes(16)
+        segmento.seccion(b"hash", hash_datos + struct.pack("<I", _adler32(hash_datos)))
+        segmento.done()
+    return digest.hex()
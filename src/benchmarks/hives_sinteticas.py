@@ -0,0 +1,211 @@
+import struct
+
+
+'''
+Escritor minimo de hives de registro (formato regf 1.3) para las pruebas de rendimiento:
+un bloque base, un unico hbin y celdas nk/lf/vk/lista de valores/datos. Suficiente para que
+python-registry recorra claves y lea valores; no genera descriptores de seguridad (sk).
+
+Un hive se describe como un diccionario anidado: cada clave es un dict cuyas entradas son
+subclaves, salvo "@", que guarda los valores {nombre: (tipo, dato)} con tipo "sz", "dword",
+"qword", "binary" o "multi_sz".
+'''
+
+TAMANO_BLOQUE_BASE = 4096
+TAMANO_HBIN = 4096
+CABECERA_HBIN = 32
+SIN_CELDA = 0xFFFFFFFF
+
+_TIPOS_VALOR = {"sz": 1, "binary": 3, "dword": 4, "multi_sz": 7, "qword": 11}
+_FILETIME_BENCH = 132539328000000000  # 2021-01-01T00:00:00Z
+
+# Las claves mas habituales que leen los extractores (system_hive, software_hive, sam_hive,
+# usernt_data_hive y usrclass_shellbags_hive)
+HIVE_SYSTEM = {
+    "Select": {"@": {"Current": ("dword", 1), "Default": ("dword", 1), "LastKnownGood": ("dword", 1)}},
+    "ControlSet001": {
+        "Control": {
+            "ComputerName": {"ComputerName": {"@": {"ComputerName": ("sz", "BENCH-PC")}}},
+            "Windows": {"@": {"ShutdownTime": ("binary", struct.pack("<Q", _FILETIME_BENCH))}},
+            "TimeZoneInformation": {"@": {"TimeZoneKeyName": ("sz", "Romance Standard Time")}},
+        },
+        "Enum": {"USB": {"VID_0781&PID_5567": {"4C530001": {"@": {"FriendlyName": ("sz", "SanDisk Cruzer")}}}}},
+        "Services": {
+            f"BenchSvc{i}": {
+                "@": {"ImagePath": ("sz", f"C:\\Windows\\System32\\svc{i}.exe"), "Start": ("dword", 2)},
+                "Parameters": {"@": {"ServiceDll": ("sz", f"C:\\Windows\\System32\\svc{i}.dll")}},
+            }
+            for i in range(20)
+        },
+    },
+}
+
+HIVE_SOFTWARE = {
+    "Microsoft": {
+        "Windows NT": {"CurrentVersion": {
+            "@": {
+                "ProductName": ("sz", "Windows 10 Pro"),
+                "ProductId": ("sz", "00330-80000-00000-AA000"),
+                "InstallDate": ("dword", 1609459200),
+                "RegisteredOwner": ("sz", "bench"),
+            },
+            "Winlogon": {"@": {"DefaultUserName": ("sz", "bench"), "DefaultDomainName": ("sz", "BENCH-PC")}},
+            "SvcHost": {"@": {"netsvcs": ("multi_sz", ["BenchSvc0", "BenchSvc1"])}},
+        }},
+        "Windows": {"CurrentVersion": {
+            "Uninstall": {
+                f"BenchApp{i}": {"@": {
+                    "DisplayName": ("sz", f"Bench App {i}"),
+                    "DisplayVersion": ("sz", f"1.{i}"),
+                    "Publisher": ("sz", "Bench Corp"),
+                    "InstallDate": ("sz", "20210101"),
+                }}
+                for i in range(50)
+            },
+            "Run": {"@": {"BenchAgent": ("sz", "C:\\Program Files\\Bench\\agent.exe")}},
+            "App Paths": {"bench.exe": {"@": {"": ("sz", "C:\\Program Files\\Bench\\bench.exe"),
+                                              "Path": ("sz", "C:\\Program Files\\Bench")}}},
+        }},
+        "Active Setup": {"Installed Components": {
+            "{BENCH-0000}": {"@": {"ComponentID": ("sz", "Bench"), "Version": ("sz", "1,0"),
+                                   "IsInstalled": ("dword", 1), "StubPath": ("sz", "bench.exe /setup")}},
+        }},
+    },
+}
+
+HIVE_SAM = {
+    "SAM": {"Domains": {"Account": {"Users": {
+        "Names": {"Administrador": {}, "bench": {}},
+    }}}},
+}
+
+
+def hive_ntuser(usuario):
+    return {
+        "Software": {"Microsoft": {"Windows": {
+            "CurrentVersion": {
+                "Explorer": {
+                    "RecentDocs": {"@": {str(i): ("binary", f"doc{i}.pdf".encode("utf-16-le") + b"\x00\x00")
+                                         for i in range(30)}},
+                    "RunMRU": {"@": {"a": ("sz", "cmd\\1"), "MRUList": ("sz", "a")}},
+                    "MountPoints2": {"{bench-volume}": {"@": {"_LabelFromReg": ("sz", "BENCHUSB")}}},
+                    "UserAssist": {"{CEBFF5CD-ACE2-4F4F-9178-9926F41749EA}": {"Count": {
+                        "@": {"{1NP14R77-02R7-4R5Q-O744-2RO1NR5198O7}\\abgrcnq.rkr": ("binary", bytes(72))},
+                    }}},
+                },
+                "Run": {"@": {"BenchUser": ("sz", f"C:\\Users\\{usuario}\\bench.exe")}},
+            },
+            "Shell": {"Bags": {"1": {"Desktop": {"@": {"IconSize": ("dword", 48)}}}}},
+        }}},
+    }
+
+
+def hive_usrclass():
+    return {
+        "Local Settings": {"Software": {"Microsoft": {"Windows": {"Shell": {
+            "MuiCache": {"@": {"C:\\Program Files\\Bench\\bench.exe.FriendlyAppName": ("sz", "Bench")}},
+            "BagMRU": {"@": {"MRUListEx": ("binary", struct.pack("<ii", 0, -1))}},
+        }}}}},
+    }
+
+
+def _dato_valor(tipo, dato):
+    if tipo == "sz":
+        return dato.encode("utf-16-le") + b"\x00\x00"
+    if tipo == "multi_sz":
+        return b"".join(s.encode("utf-16-le") + b"\x00\x00" for s in dato) + b"\x00\x00"
+    if tipo == "dword":
+        return struct.pack("<I", dato)
+    if tipo == "qword":
+        return struct.pack("<Q", dato)
+    return bytes(dato)
+
+
+class _Celdas:
+    # Reserva celdas dentro de los hbins; los offsets son relativos al primer hbin
+    def __init__(self):
+        self.datos = bytearray()
+
+    def reservar(self, contenido):
+        tamano = (4 + len(contenido) + 7) & ~7
+        offset = CABECERA_HBIN + len(self.datos)
+        self.datos += struct.pack("<i", -tamano) + contenido + bytes(tamano - 4 - len(contenido))
+        return offset
+
+    def escribir(self, offset, posicion, contenido):
+        # posicion relativa al inicio de los datos de la celda (tras el campo de tamaño)
+        inicio = offset - CABECERA_HBIN + 4 + posicion
+        self.datos[inicio:inicio + len(contenido)] = contenido
+
+
+def _escribir_clave(celdas, nombre, clave, padre, raiz=False):
+    nombre_bytes = nombre.encode("latin-1", "replace")
+    valores = clave.get("@", {})
+    subclaves = sorted(((n, c) for n, c in clave.items() if n != "@"), key=lambda item: item[0].upper())
+
+    nk = bytearray(0x4C + len(nombre_bytes))
+    struct.pack_into("<2sHQ", nk, 0, b"nk", 0x2C if raiz else 0x20, _FILETIME_BENCH)
+    struct.pack_into("<I", nk, 0x10, padre)
+    struct.pack_into("<IIII", nk, 0x14, len(subclaves), 0, SIN_CELDA, SIN_CELDA)
+    struct.pack_into("<III", nk, 0x24, len(valores), SIN_CELDA, SIN_CELDA)
+    struct.pack_into("<I", nk, 0x30, SIN_CELDA)
+    struct.pack_into("<HH", nk, 0x48, len(nombre_bytes), 0)
+    nk[0x4C:] = nombre_bytes
+    offset_nk = celdas.reservar(bytes(nk))
+
+    max_nombre_sub = max((len(n) * 2 for n, _ in subclaves), default=0)
+    max_nombre_valor = max((len(n) * 2 for n in valores), default=0)
+    max_dato = 0
+
+    if valores:
+        offsets_vk = []
+        for nombre_valor, (tipo, dato) in valores.items():
+            datos = _dato_valor(tipo, dato)
+            max_dato = max(max_dato, len(datos))
+            nombre_valor_bytes = nombre_valor.encode("latin-1", "replace")
+            if len(datos) <= 4:
+                # Dato residente: va en el propio campo de offset
+                tamano_dato, offset_dato = 0x80000000 | len(datos), struct.unpack("<I", datos.ljust(4, b"\x00"))[0]
+            else:
+                tamano_dato, offset_dato = len(datos), celdas.reservar(datos)
+            vk = struct.pack("<2sHIIIHH", b"vk", len(nombre_valor_bytes), tamano_dato, offset_dato,
+                             _TIPOS_VALOR[tipo], 1 if nombre_valor_bytes else 0, 0) + nombre_valor_bytes
+            offsets_vk.append(celdas.reservar(vk))
+        offset_lista = celdas.reservar(struct.pack(f"<{len(offsets_vk)}I", *offsets_vk))
+        celdas.escribir(offset_nk, 0x28, struct.pack("<I", offset_lista))
+
+    if subclaves:
+        entradas = []
+        for nombre_sub, clave_sub in subclaves:
+            offset_sub = _escribir_clave(celdas, nombre_sub, clave_sub, offset_nk)
+            pista = nombre_sub.encode("latin-1", "replace")[:4].ljust(4, b"\x00")
+            entradas.append(struct.pack("<I4s", offset_sub, pista))
+        offset_lf = celdas.reservar(struct.pack("<2sH", b"lf", len(entradas)) + b"".join(entradas))
+        celdas.escribir(offset_nk, 0x1C, struct.pack("<I", offset_lf))
+
+    celdas.escribir(offset_nk, 0x34, struct.pack("<IIII", max_nombre_sub, 0, max_nombre_valor, max_dato))
+    return offset_nk
+
+
+def construir_hive(arbol, nombre_fichero="hive"):
+    """
+    Devuelve los bytes de un hive regf con el arbol de claves y valores indicado.
+    """
+    celdas = _Celdas()
+    raiz = _escribir_clave(celdas, "ROOT", arbol, 0, raiz=True)
+
+    # Un unico hbin multiplo de 4 KB; el hueco final es una celda libre (tamaño positivo)
+    tamano_hbin = (CABECERA_HBIN + len(celdas.datos) + 8 + TAMANO_HBIN - 1) // TAMANO_HBIN * TAMANO_HBIN
+    libre = tamano_hbin - CABECERA_HBIN - len(celdas.datos)
+    hbin = (struct.pack("<4sII8sQI", b"hbin", 0, tamano_hbin, bytes(8), _FILETIME_BENCH, 0)
+            + bytes(celdas.datos) + struct.pack("<i", libre) + bytes(libre - 4))
+
+    base = bytearray(TAMANO_BLOQUE_BASE)
+    struct.pack_into("<4sIIQIIIIIII", base, 0, b"regf", 1, 1, _FILETIME_BENCH, 1, 3, 0, 1, raiz, tamano_hbin, 1)
+    nombre = nombre_fichero.encode("utf-16-le")[:64]
+    base[0x30:0x30 + len(nombre)] = nombre
+    checksum = 0
+    for (palabra,) in struct.iter_unpack("<I", bytes(base[:0x1FC])):
+        checksum ^= palabra
+    struct.pack_into("<I", base, 0x1FC, checksum)
+    return bytes(base) + hbin
@@ -0,0 +1,397 @@
+import json
+import math
+import os
+import random
+import sqlite3
+import struct
+import tempfile
+import uuid
+import zlib
+from array import array
+from datetime import datetime, timedelta
+
+from benchmarks.ewf_sintetico import escribir_ewf
+from benchmarks.hives_sinteticas import HIVE_SAM, HIVE_SOFTWARE, HIVE_SYSTEM, construir_hive, hive_ntuser, hive_usrclass
+
+
+'''
+Generador de evidencia sintetica para las pruebas de rendimiento, sin herramientas externas:
+un disco GPT con una "Basic data partition" FAT32 escrita byte a byte, con un arbol de ficheros
+de tamaños variados, hives SYSTEM/SOFTWARE/SAM/NTUSER.DAT/UsrClass.dat, un historial de Firefox
+y algunas entradas borradas, convertido despues a .E01 con ewf_sintetico.
+
+Todo es determinista a partir de la semilla: dos ejecuciones con los mismos parametros
+producen la misma imagen y se reutiliza la ya generada.
+'''
+
+BYTES_SECTOR = 512
+INICIO_PARTICION = 2048          # sectores, alineacion habitual de Windows
+SECTORES_GPT_FINAL = 33          # tabla de particiones de respaldo + cabecera de respaldo
+SECTORES_RESERVADOS_FAT = 32
+MIN_CLUSTERS_FAT32 = 65525
+TIPO_BASIC_DATA = uuid.UUID("EBD0A0A2-B9E5-4433-87C0-68B6B72699C7")
+
+USUARIO = "bench"
+FICHEROS_POR_DIRECTORIO = 50
+DIRECTORIOS_POR_GRUPO = 20
+EXTENSIONES = [".txt", ".pdf", ".docx", ".jpg", ".png", ".dll", ".exe", ".log", ".zip", ".eml", ".xlsx", ".dat"]
+# (peso, tamaño minimo, tamaño maximo): muchos ficheros pequeños y unos pocos por encima de LIMITE_HASH
+TAMANOS = [(70, 512, 16 * 1024), (25, 16 * 1024, 1024 * 1024), (5, 1024 * 1024, 16 * 1024 * 1024)]
+
+
+class Nodo:
+    def __init__(self, nombre, es_dir=False, tamano=0, contenido=None, semilla=0, borrado=False):
+        self.nombre = nombre
+        self.es_dir = es_dir
+        self.hijos = [] if es_dir else None
+        self.tamano = len(contenido) if contenido is not None else tamano
+        self.contenido = contenido   # bytes fijos (hives, places.sqlite) o None para contenido generado
+        self.semilla = semilla
+        self.borrado = borrado
+        self.fecha = None
+        self.primer_cluster = 0
+        self.clusters = 0
+
+    def hijo(self, nombre):
+        for nodo in self.hijos:
+            if nodo.nombre == nombre:
+                return nodo
+        nodo = Nodo(nombre, es_dir=True)
+        self.hijos.append(nodo)
+        return nodo
+
+    def ruta(self, ruta):
+        nodo = self
+        for parte in ruta.strip("/").split("/"):
+            nodo = nodo.hijo(parte)
+        return nodo
+
+
+def _places_sqlite(rng, visitas=200):
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "places.sqlite")
+        conn = sqlite3.connect(ruta)
+        conn.execute("""CREATE TABLE moz_places (id INTEGER PRIMARY KEY, url LONGVARCHAR, title LONGVARCHAR,
+                        visit_count INTEGER DEFAULT 0, last_visit_date INTEGER)""")
+        conn.executemany(
+            "INSERT INTO moz_places (url, title, visit_count, last_visit_date) VALUES (?, ?, ?, ?)",
+            [(f"https://bench.example/{i}", f"Pagina {i}", rng.randint(1, 50),
+              1609459200000000 + i * 3600000000) for i in range(visitas)]
+        )
+        conn.commit()
+        conn.close()
+        with open(ruta, "rb") as f:
+            return f.read()
+
+
+def construir_arbol(archivos, semilla=1234, fraccion_borrados=0.02):
+    """
+    Arbol de la particion: artefactos de Windows fijos mas `archivos` ficheros generados.
+    """
+    rng = random.Random(semilla)
+    raiz = Nodo("", es_dir=True)
+
+    config = raiz.ruta("Windows/System32/config")
+    config.hijos += [
+        Nodo("SYSTEM", contenido=construir_hive(HIVE_SYSTEM, "SYSTEM")),
+        Nodo("SOFTWARE", contenido=construir_hive(HIVE_SOFTWARE, "SOFTWARE")),
+        Nodo("SAM", contenido=construir_hive(HIVE_SAM, "SAM")),
+    ]
+    raiz.ruta(f"Users/{USUARIO}").hijos.append(Nodo("NTUSER.DAT", contenido=construir_hive(hive_ntuser(USUARIO), "NTUSER.DAT")))
+    raiz.ruta(f"Users/{USUARIO}/AppData/Local/Microsoft/Windows").hijos.append(
+        Nodo("UsrClass.dat", contenido=construir_hive(hive_usrclass(), "UsrClass.dat")))
+    raiz.ruta(f"Users/{USUARIO}/AppData/Roaming/Mozilla/Firefox/Profiles/bench.default-release").hijos.append(
+        Nodo("places.sqlite", contenido=_places_sqlite(rng)))
+
+    pesos = [peso for peso, _, _ in TAMANOS]
+    for i in range(archivos):
+        directorio = i // FICHEROS_POR_DIRECTORIO
+        grupo = directorio // DIRECTORIOS_POR_GRUPO
+        carpeta = raiz.ruta(f"Users/{USUARIO}/Documents/grupo_{grupo:03d}/carpeta_{directorio:05d}")
+        _, minimo, maximo = rng.choices(TAMANOS, weights=pesos)[0]
+        nombre = f"documento de prueba {i:07d}{rng.choice(EXTENSIONES)}"
+        carpeta.hijos.append(Nodo(nombre, tamano=rng.randint(minimo, maximo), semilla=semilla * 1000003 + i,
+                                  borrado=rng.random() < fraccion_borrados))
+
+    inicio = datetime(2018, 1, 1)
+    pila = [raiz]
+    while pila:
+        nodo = pila.pop()
+        nodo.fecha = inicio + timedelta(seconds=rng.randint(0, 5 * 365 * 86400))
+        if nodo.es_dir:
+            pila.extend(nodo.hijos)
+    return raiz
+
+
+def _contenido(nodo, bloque, tamano_escritura=1024 * 1024):
+    # Genera el contenido por bloques; los 8 primeros bytes hacen unico cada fichero
+    if nodo.contenido is not None:
+        yield nodo.contenido
+        return
+    desplazamiento = nodo.semilla % len(bloque)
+    datos = struct.pack("<Q", nodo.semilla) + bloque[desplazamiento:] + bloque[:desplazamiento]
+    restante = nodo.tamano
+    while restante > 0:
+        n = min(restante, tamano_escritura, len(datos))
+        yield datos[:n]
+        restante -= n
+        datos = datos[n:] + datos[:n]
+
+
+# --- FAT32 -----------------------------------------------------------------------------------
+
+def _fecha_fat(fecha):
+    return ((fecha.year - 1980) << 9) | (fecha.month << 5) | fecha.day, \
+           (fecha.hour << 11) | (fecha.minute << 5) | (fecha.second // 2)
+
+
+def _checksum_nombre_corto(nombre_corto):
+    suma = 0
+    for c in nombre_corto:
+        suma = (((suma & 1) << 7) + (suma >> 1) + c) & 0xFF
+    return suma
+
+
+def _entradas_lfn(nombre, checksum, borrado):
+    unidades = list(struct.unpack(f"<{len(nombre.encode('utf-16-le')) // 2}H", nombre.encode("utf-16-le")))
+    if len(unidades) % 13:
+        unidades += [0] + [0xFFFF] * (12 - len(unidades) % 13)
+    partes = [unidades[i:i + 13] for i in range(0, len(unidades), 13)]
+    entradas = []
+    for numero, parte in enumerate(partes, start=1):
+        orden = numero | (0x40 if numero == len(partes) else 0)
+        entrada = struct.pack("<B5HBBB6HH2H", 0xE5 if borrado else orden, *parte[:5], 0x0F, 0, checksum,
+                              *parte[5:11], 0, *parte[11:13])
+        entradas.append(entrada)
+    return list(reversed(entradas))
+
+
+def _entrada_corta(nombre_corto, es_dir, primer_cluster, tamano, fecha, borrado=False):
+    fecha_fat, hora_fat = _fecha_fat(fecha)
+    if borrado:
+        nombre_corto = b"\xe5" + nombre_corto[1:]
+    return struct.pack("<11sBBBHHHHHHHI", nombre_corto, 0x10 if es_dir else 0x20, 0, 0, hora_fat, fecha_fat,
+                       fecha_fat, primer_cluster >> 16, hora_fat, fecha_fat, primer_cluster & 0xFFFF,
+                       0 if es_dir else tamano)
+
+
+def _nombre_corto(contador, nombre):
+    ext = "".join(c for c in os.path.splitext(nombre)[1][1:].upper() if c.isalnum())[:3]
+    return f"N{contador:07d}".encode("ascii") + ext.ljust(3).encode("ascii")
+
+
+def _entradas_directorio(nodo):
+    # Numero de entradas de 32 bytes que ocupa el directorio
+    total = 0 if nodo.primer_cluster == 2 else 2
+    for hijo in nodo.hijos:
+        total += 1 + math.ceil(len(hijo.nombre.encode("utf-16-le")) // 2 / 13)
+    return total
+
+
+class ConstructorFat32:
+    """
+    Escribe una particion FAT32 con el arbol dado en el fichero abierto `f`, a partir del
+    byte `inicio`. La asignacion de clusters es contigua y en orden de recorrido.
+    """
+
+    def __init__(self, f, inicio, sectores, sectores_ocultos):
+        self.f = f
+        self.inicio = inicio
+        self.sectores = sectores
+        self.sectores_ocultos = sectores_ocultos
+        self.sectores_por_cluster = 8 if sectores // 8 > MIN_CLUSTERS_FAT32 + 1024 else 1
+        self.bytes_cluster = self.sectores_por_cluster * BYTES_SECTOR
+
+        self.sectores_fat = 1
+        while True:
+            clusters = (sectores - SECTORES_RESERVADOS_FAT - 2 * self.sectores_fat) // self.sectores_por_cluster
+            necesarios = math.ceil((clusters + 2) * 4 / BYTES_SECTOR)
+            if necesarios <= self.sectores_fat:
+                break
+            self.sectores_fat = necesarios
+        self.clusters = clusters
+        if self.clusters < MIN_CLUSTERS_FAT32:
+            raise ValueError("Particion demasiado pequeña para FAT32")
+        self.inicio_datos = SECTORES_RESERVADOS_FAT + 2 * self.sectores_fat
+        self.fat = array("I", bytes(4 * (self.clusters + 2)))
+        self.fat[0], self.fat[1] = 0x0FFFFFF8, 0x0FFFFFFF
+        self.siguiente = 2
+        self.contador_nombres = 0
+
+    def _asignar(self, n, asignado=True):
+        primero = self.siguiente
+        if n == 0:
+            return 0
+        if primero + n > self.clusters + 2:
+            raise ValueError("La particion no tiene espacio para el arbol generado")
+        self.siguiente += n
+        if asignado:
+            for c in range(primero, primero + n - 1):
+                self.fat[c] = c + 1
+            self.fat[primero + n - 1] = 0x0FFFFFFF
+        return primero
+
+    def _asignar_arbol(self, nodo):
+        if nodo.es_dir:
+            nodo.clusters = max(1, math.ceil(_entradas_directorio(nodo) * 32 / self.bytes_cluster))
+            if nodo.primer_cluster != 2:
+                nodo.primer_cluster = self._asignar(nodo.clusters)
+            for hijo in nodo.hijos:
+                self._asignar_arbol(hijo)
+        else:
+            nodo.clusters = math.ceil(nodo.tamano / self.bytes_cluster)
+            # Los borrados conservan sus datos pero sus clusters quedan libres en la FAT
+            nodo.primer_cluster = self._asignar(nodo.clusters, asignado=not nodo.borrado)
+
+    def _offset_cluster(self, cluster):
+        return self.inicio + (self.inicio_datos + (cluster - 2) * self.sectores_por_cluster) * BYTES_SECTOR
+
+    def _escribir_directorio(self, nodo, padre):
+        entradas = []
+        if nodo.primer_cluster != 2:
+            entradas.append(_entrada_corta(b".          ", True, nodo.primer_cluster, 0, nodo.fecha))
+            padre_cluster = 0 if padre.primer_cluster == 2 else padre.primer_cluster
+            entradas.append(_entrada_corta(b"..         ", True, padre_cluster, 0, padre.fecha))
+        for hijo in nodo.hijos:
+            self.contador_nombres += 1
+            corto = _nombre_corto(self.contador_nombres, hijo.nombre)
+            entradas += _entradas_lfn(hijo.nombre, _checksum_nombre_corto(corto), hijo.borrado)
+            entradas.append(_entrada_corta(corto, hijo.es_dir, hijo.primer_cluster, hijo.tamano, hijo.fecha, hijo.borrado))
+        self.f.seek(self._offset_cluster(nodo.primer_cluster))
+        self.f.write(b"".join(entradas))
+
+    def escribir(self, raiz, bloque):
+        raiz.primer_cluster = 2
+        self._asignar(0)
+        raiz.clusters = max(1, math.ceil(_entradas_directorio(raiz) * 32 / self.bytes_cluster))
+        self.siguiente = 2
+        self._asignar(raiz.clusters)
+        for hijo in raiz.hijos:
+            self._asignar_arbol(hijo)
+
+        pila = [(raiz, raiz)]
+        while pila:
+            nodo, padre = pila.pop()
+            if nodo.es_dir:
+                self._escribir_directorio(nodo, padre)
+                pila.extend((hijo, nodo) for hijo in nodo.hijos)
+            elif nodo.tamano:
+                self.f.seek(self._offset_cluster(nodo.primer_cluster))
+                for datos in _contenido(nodo, bloque):
+                    self.f.write(datos)
+
+        self._escribir_sectores_reservados()
+        fat = self.fat.tobytes()
+        for i in range(2):
+            self.f.seek(self.inicio + (SECTORES_RESERVADOS_FAT + i * self.sectores_fat) * BYTES_SECTOR)
+            self.f.write(fat)
+
+    def _escribir_sectores_reservados(self):
+        arranque = bytearray(BYTES_SECTOR)
+        struct.pack_into("<3s8sHBHBHHBHHHII", arranque, 0, b"\xebX\x90", b"MSWIN4.1", BYTES_SECTOR,
+                         self.sectores_por_cluster, SECTORES_RESERVADOS_FAT, 2, 0, 0, 0xF8, 0, 63, 255,
+                         self.sectores_ocultos, self.sectores)
+        struct.pack_into("<IHHIHH12sBBBI11s8s", arranque, 36, self.sectores_fat, 0, 0, 2, 1, 6, bytes(12),
+                         0x80, 0, 0x29, 0x42454E43, b"BENCH      ", b"FAT32   ")
+        arranque[510:512] = b"\x55\xaa"
+
+        fsinfo = bytearray(BYTES_SECTOR)
+        struct.pack_into("<I", fsinfo, 0, 0x41615252)
+        struct.pack_into("<III", fsinfo, 484, 0x61417272, self.clusters + 2 - self.siguiente, self.siguiente)
+        struct.pack_into("<I", fsinfo, 508, 0xAA550000)
+
+        for base in (0, 6):
+            self.f.seek(self.inicio + base * BYTES_SECTOR)
+            self.f.write(bytes(arranque) + bytes(fsinfo))
+
+
+# --- GPT -------------------------------------------------------------------------------------
+
+def _escribir_gpt(f, total_sectores, primer_lba, ultimo_lba, rng):
+    mbr = bytearray(BYTES_SECTOR)
+    struct.pack_into("<B3sB3sII", mbr, 446, 0, b"\x00\x02\x00", 0xEE, b"\xff\xff\xff", 1,
+                     min(total_sectores - 1, 0xFFFFFFFF))
+    mbr[510:512] = b"\x55\xaa"
+    f.seek(0)
+    f.write(mbr)
+
+    entradas = bytearray(128 * 128)
+    nombre = "Basic data partition".encode("utf-16-le")
+    struct.pack_into("<16s16sQQQ72s", entradas, 0, TIPO_BASIC_DATA.bytes_le,
+                     uuid.UUID(int=rng.getrandbits(128)).bytes_le, primer_lba, ultimo_lba, 0, nombre)
+    crc_entradas = zlib.crc32(entradas) & 0xFFFFFFFF
+    disco = uuid.UUID(int=rng.getrandbits(128)).bytes_le
+
+    def cabecera(lba_actual, lba_respaldo, lba_entradas):
+        datos = bytearray(struct.pack("<8sIIIIQQQQ16sQIII", b"EFI PART", 0x00010000, 92, 0, 0,
+                                      lba_actual, lba_respaldo, 34, total_sectores - 34, disco,
+                                      lba_entradas, 128, 128, crc_entradas))
+        struct.pack_into("<I", datos, 16, zlib.crc32(datos) & 0xFFFFFFFF)
+        return bytes(datos).ljust(BYTES_SECTOR, b"\x00")
+
+    f.seek(BYTES_SECTOR)
+    f.write(cabecera(1, total_sectores - 1, 2) + entradas)
+    f.seek((total_sectores - SECTORES_GPT_FINAL) * BYTES_SECTOR)
+    f.write(entradas + cabecera(total_sectores - 1, 1, total_sectores - SECTORES_GPT_FINAL))
+
+
+def _bytes_arbol(nodo, bytes_cluster):
+    if not nodo.es_dir:
+        return math.ceil(nodo.tamano / bytes_cluster) * bytes_cluster
+    return bytes_cluster * 4 + sum(_bytes_arbol(hijo, bytes_cluster) for hijo in nodo.hijos)
+
+
+def generar_imagen_raw(destino, raiz, semilla=1234):
+    """
+    Escribe el disco GPT con la particion FAT32 del arbol. Devuelve el tamaño en bytes.
+    """
+    rng = random.Random(semilla)
+    # Margen para FAT y directorios; minimo para que haya clusters suficientes para FAT32
+    datos = _bytes_arbol(raiz, 4096)
+    sectores_particion = max(math.ceil(datos * 1.1 / BYTES_SECTOR) + 65536, (MIN_CLUSTERS_FAT32 + 4096) * 1)
+    sectores_particion = (sectores_particion + 7) // 8 * 8
+    total_sectores = INICIO_PARTICION + sectores_particion + SECTORES_GPT_FINAL + 1
+
+    bloque = random.Random(semilla).randbytes(1024 * 1024 + 7)
+    with open(destino, "wb") as f:
+        f.truncate(total_sectores * BYTES_SECTOR)
+        _escribir_gpt(f, total_sectores, INICIO_PARTICION, INICIO_PARTICION + sectores_particion - 1, rng)
+        ConstructorFat32(f, INICIO_PARTICION * BYTES_SECTOR, sectores_particion, INICIO_PARTICION).escribir(raiz, bloque)
+    return total_sectores * BYTES_SECTOR
+
+
+def generar_evidencia(directorio, archivos=2000, semilla=1234, fraccion_borrados=0.02, conservar_raw=False):
+    """
+    Genera (o reutiliza) <directorio>/bench_<archivos>_<semilla>.E01 y devuelve su descripcion:
+    {"e01", "md5", "archivos", "bytes_ficheros", "tamano_imagen"}.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    base = os.path.join(directorio, f"bench_{archivos}_{semilla}")
+    manifiesto = base + ".json"
+    parametros = {"archivos": archivos, "semilla": semilla, "fraccion_borrados": fraccion_borrados}
+    if os.path.exists(manifiesto) and os.path.exists(base + ".E01"):
+        with open(manifiesto, encoding="utf-8") as f:
+            descripcion = json.load(f)
+        if descripcion.get("parametros") == parametros:
+            return descripcion
+
+    raiz = construir_arbol(archivos, semilla, fraccion_borrados)
+    tamano = generar_imagen_raw(base + ".raw", raiz, semilla)
+    md5 = escribir_ewf(base + ".raw", base + ".E01", descripcion=f"bench {archivos} ficheros")
+    if not conservar_raw:
+        os.remove(base + ".raw")
+
+    bytes_ficheros = 0
+    pila = [raiz]
+    while pila:
+        nodo = pila.pop()
+        if nodo.es_dir:
+            pila.extend(nodo.hijos)
+        else:
+            bytes_ficheros += nodo.tamano
+
+    descripcion = {"e01": base + ".E01", "md5": md5, "parametros": parametros,
+                   "bytes_ficheros": bytes_ficheros, "tamano_imagen": tamano}
+    with open(manifiesto, "w", encoding="utf-8") as f:
+        json.dump(descripcion, f, indent=2)
+    return descripcion
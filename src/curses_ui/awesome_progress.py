@@ -0,0 +1,91 @@
+import curses
+import threading
+
+from forensic_core.progreso import formatear_bytes, formatear_tiempo
+
+from .renderizable import Renderizable
+
+
+INTERVALO_REPINTADO = 0.25
+
+
+class ProgressPanel(Renderizable):
+    """
+    Panel con el progreso de la ingesta: etapa, hash de la imagen y una linea por particion.
+    Pinta instantaneas de un ProgresoIngesta; no toca el pipeline.
+    """
+    def render(self, instantanea=None):
+        self.win.erase()
+        if not instantanea:
+            self._linea(0, "Cargando...")
+            self.win.refresh()
+            return
+
+        self._linea(0, f"Etapa: {instantanea['etapa'] or '-'}", curses.A_BOLD)
+        self._linea(1, f"Tiempo transcurrido: {formatear_tiempo(instantanea['transcurrido'])}")
+
+        fila = 3
+        imagen = instantanea["imagen"]
+        if imagen:
+            total = imagen["bytes_totales"] or 1
+            self._linea(fila, "Hash de la imagen", curses.A_BOLD)
+            self._linea(fila + 1, self._barra(imagen["bytes_hasheados"] / total) +
+                        f" {formatear_bytes(imagen['bytes_hasheados'])} / {formatear_bytes(imagen['bytes_totales'])}"
+                        f"  {formatear_bytes(imagen['bytes_por_seg'])}/s  ETA {formatear_tiempo(imagen['eta_seg'])}")
+            fila += 3
+
+        if instantanea["particiones"]:
+            self._linea(fila, "Particiones", curses.A_BOLD)
+            fila += 1
+        for particion in instantanea["particiones"]:
+            estado = "terminada" if particion["terminada"] else f"ETA {formatear_tiempo(particion['eta_seg'])}"
+            total = particion["total_estimado"]
+            barra = self._barra(min(particion["entradas"] / total, 1.0)) + " " if total else ""
+            self._linea(fila, f"#{particion['particion']} {barra}{particion['entradas']} entradas "
+                              f"({particion['entradas_por_seg']:.0f}/s)  "
+                              f"hash {formatear_bytes(particion['bytes_hasheados'])} "
+                              f"({formatear_bytes(particion['bytes_por_seg'])}/s)  {estado}")
+            fila += 1
+        self.win.refresh()
+
+    def seguir(self, progreso, hilo):
+        """
+        Repinta el panel mientras el hilo de la ingesta siga vivo.
+        """
+        while hilo.is_alive():
+            self.render(progreso.instantanea())
+            hilo.join(INTERVALO_REPINTADO)
+        self.render(progreso.instantanea())
+
+    def _barra(self, fraccion, ancho=20):
+        llenos = int(ancho * max(0.0, min(fraccion, 1.0)))
+        return "[" + "#" * llenos + "-" * (ancho - llenos) + "]"
+
+    def _linea(self, y, texto, atributo=curses.A_NORMAL):
+        if y >= self.height:
+            return
+        try:
+            self.win.addstr(y, 1, texto[:max(self.width - 2, 0)], atributo)
+        except curses.error:
+            pass
+
+
+def ejecutar_con_progreso(panel, progreso, funcion, *args, **kwargs):
+    """
+    Ejecuta funcion en un hilo aparte mientras el panel muestra el progreso.
+    Devuelve su resultado o relanza su excepcion en el hilo de la interfaz.
+    """
+    resultado = {}
+
+    def objetivo():
+        try:
+            resultado["valor"] = funcion(*args, **kwargs)
+        except BaseException as e:
+            resultado["error"] = e
+
+    hilo = threading.Thread(target=objetivo, name="ingesta", daemon=True)
+    hilo.start()
+    panel.seguir(progreso, hilo)
+    if "error" in resultado:
+        raise resultado["error"]
+    return resultado.get("valor")
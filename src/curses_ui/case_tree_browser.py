@@ -0,0 +1,164 @@
+import curses
+import sqlite3
+from .renderizable import Renderizable
+from curses_ui.system_artifacts_viewer import _fmt_size_short
+from database.create_database import obtener_hijos, obtener_particiones_arbol, resumen_subarbol
+
+KEY_SCAPE = 27
+TECLAS_ATRAS = (curses.KEY_LEFT, curses.KEY_BACKSPACE, 127, 8)
+# Flechas que llegan como secuencia ANSI sin traducir (ESC [ A..D)
+SECUENCIAS_FLECHAS = {65: curses.KEY_UP, 66: curses.KEY_DOWN, 67: curses.KEY_RIGHT, 68: curses.KEY_LEFT}
+
+
+class CaseTreeBrowser(Renderizable):
+    """
+    Explorador del sistema de archivos de un caso a partir de la base de datos (parent_id e
+    idx_arbol, ver forensic_core.arbol_directorios): cada carpeta se lee con una consulta por
+    indice. Con varias particiones se elige primero la particion.
+    - ↑/↓, RePag/AvPag, Inicio/Fin: mover
+    - ENTER o →: abrir carpeta / mostrar los datos del archivo
+    - ← o RETROCESO: subir
+    - t: entradas y tamaño del subarbol de la carpeta seleccionada (o de la actual si la
+      seleccion es un archivo). Solo se calcula al pedirlo: en carpetas grandes recorre miles
+      de filas del indice
+    - ESC o q: salir
+    """
+
+    def __init__(self, win, db_path):
+        super().__init__(win)
+        self.conn = sqlite3.connect(db_path)
+        self.cursor = self.conn.cursor()
+        self.particiones = obtener_particiones_arbol(self.cursor)
+        self._resumenes = {}
+
+    def _resumen(self, particion, ruta):
+        clave = (particion, ruta)
+        if clave not in self._resumenes:
+            self._resumenes[clave] = resumen_subarbol(self.cursor, particion, ruta)
+        return self._resumenes[clave]
+
+    def _texto_resumen(self, particion, ruta):
+        entradas, ficheros, total = self._resumen(particion, ruta)
+        return f"{entradas} entradas, {ficheros} ficheros, {_fmt_size_short(total)}"
+
+    def _etiqueta(self, fila, ancho, en_raiz):
+        _entry_id, name, tipo, size, _mtime, deleted, full_path, depth = fila
+        # En la raiz tambien salen las entradas cuyo directorio padre no tiene fila: se ve su ruta
+        nombre = full_path if en_raiz and depth and depth > 1 else name
+        if tipo == "dir":
+            return f"{nombre}/" + (" (borrado)" if deleted else "")
+        detalle = f"{_fmt_size_short(size or 0)}{' (borrado)' if deleted else ''}"
+        return f"{nombre[:max(1, ancho - len(detalle) - 2)].ljust(ancho - len(detalle) - 1)} {detalle}"
+
+    def _addnstr(self, y, x, texto, atributos=0):
+        try:
+            self.win.addnstr(y, x, texto, max(0, self.width - x - 2), atributos)
+        except curses.error:
+            pass
+
+    def render(self):
+        self.win.keypad(True)
+        curses.curs_set(0)
+        if not self.particiones:
+            self.conn.close()
+            return None
+
+        # Nivel actual: particion None = lista de particiones; parent_id None = raiz de la particion
+        particion = self.particiones[0] if len(self.particiones) == 1 else None
+        parent_id, ruta = None, ""
+        pila = []
+        current_row, scroll = 0, 0
+        items = None
+        mensaje = ""
+        try:
+            while True:
+                if items is None:
+                    items = obtener_hijos(self.cursor, particion, parent_id) if particion is not None else []
+                    mensaje = ""
+                opciones = items if particion is not None else self.particiones
+
+                self.height, self.width = self.win.getmaxyx()
+                self.win.erase()
+                try:
+                    self.win.box()
+                except curses.error:
+                    pass
+                if particion is None:
+                    cabecera = f" Particiones del caso ({len(self.particiones)}) "
+                else:
+                    cabecera = f" Particion {particion}: {ruta or '/'} "
+                self._addnstr(0, max(1, (self.width - len(cabecera)) // 2), cabecera, curses.A_BOLD)
+                if particion is not None:
+                    self._addnstr(1, 2, f"{len(items)} elementos")
+
+                top = 3
+                visible_h = max(1, self.height - top - 3)
+                current_row = max(0, min(current_row, len(opciones) - 1))
+                if current_row < scroll:
+                    scroll = current_row
+                elif current_row >= scroll + visible_h:
+                    scroll = current_row - visible_h + 1
+                ancho = self.width - 4
+                for i, fila in enumerate(opciones[scroll:scroll + visible_h]):
+                    texto = self._etiqueta(fila, ancho, parent_id is None) if particion is not None else f"Particion {fila}/"
+                    atributos = curses.A_REVERSE if scroll + i == current_row else 0
+                    if particion is not None and fila[2] == "dir":
+                        atributos |= curses.A_BOLD
+                    self._addnstr(top + i, 2, texto.ljust(ancho), atributos)
+                if not opciones:
+                    self._addnstr(top, 2, "(carpeta vacia)", curses.A_DIM)
+
+                self._addnstr(self.height - 2, 2, mensaje)
+                pie = " ↑/↓ mover  ENTER/→ abrir  ←/RETROCESO subir  t: tamaño del subarbol  ESC salir "
+                self._addnstr(self.height - 1, max(1, (self.width - len(pie)) // 2), pie)
+                self.win.refresh()
+
+                key = self.win.getch()
+                if key == KEY_SCAPE:
+                    self.win.nodelay(True)
+                    next1, next2 = self.win.getch(), self.win.getch()
+                    self.win.nodelay(False)
+                    if next1 == 91:
+                        key = SECUENCIAS_FLECHAS.get(next2, key)
+                seleccion = opciones[current_row] if opciones else None
+                if key in (KEY_SCAPE, ord("q")):
+                    return None
+                elif key == curses.KEY_UP:
+                    current_row -= 1
+                elif key == curses.KEY_DOWN:
+                    current_row += 1
+                elif key == curses.KEY_NPAGE:
+                    current_row += visible_h
+                elif key == curses.KEY_PPAGE:
+                    current_row -= visible_h
+                elif key == curses.KEY_HOME:
+                    current_row = 0
+                elif key == curses.KEY_END:
+                    current_row = len(opciones) - 1
+                elif key in TECLAS_ATRAS:
+                    if pila:
+                        parent_id, ruta, current_row, scroll = pila.pop()
+                        items = None
+                    elif particion is not None and len(self.particiones) > 1:
+                        current_row, scroll = self.particiones.index(particion), 0
+                        particion, items = None, None
+                elif key == ord("t") and particion is not None:
+                    carpeta = seleccion[6] if seleccion is not None and seleccion[2] == "dir" else ruta
+                    mensaje = f"{carpeta or '/'}: {self._texto_resumen(particion, carpeta)}"
+                elif seleccion is None:
+                    continue
+                elif key in (curses.KEY_ENTER, curses.KEY_RIGHT, 10, 13):
+                    if particion is None:
+                        particion, items = seleccion, None
+                        current_row, scroll = 0, 0
+                    elif seleccion[2] == "dir":
+                        pila.append((parent_id, ruta, current_row, scroll))
+                        parent_id, ruta = seleccion[0], seleccion[6]
+                        current_row, scroll, items = 0, 0, None
+                    else:
+                        _entry_id, _name, _tipo, size, mtime, _deleted, full_path, _depth = seleccion
+                        mensaje = f"{full_path} | {size or 0} bytes | mtime {mtime or '-'}"
+        finally:
+            self.conn.close()
+            self.win.erase()
+            self.win.refresh()
@@ -1,24 +1,21 @@
 import curses
 import os
 import sqlite3
-from curses_ui.artifact_viewer_menu import artifact_menu
-from curses_ui.file_browser import FileBrowser
 
 from curses_ui.awesome_menu import AwesomeMenu
 from curses_ui.awesome_input import AwesomeInput
 from curses_ui.awesome_layout import AwesomeLayout
-from curses_ui.awesome_loader import CircleLoader
 
 
 from curses_ui.ui_handler import UIHandler
-from forensic_core.artifacts.registry.registry_analyzer import registry_analyzer
-from forensic_core.artifacts.registry.sam_hive import visualizar_usuarios
-from forensic_core.artifacts.registry.usernt_data_hive import visualizar_resumen_usuarios
-from forensic_core.search_files import search_files
-from forensic_core.e01_reader import digestE01
+from forensic_core.etapas import ingesta_pendiente
+from forensic_core.progreso import ProgresoIngesta
 from utils.create_and_load_cases import CASES_DIR, crear_directorio_caso
 from database.create_database import crear_base_de_datos
 
+# Los visores, la ingesta y los extractores de registro (pytsk3, pyewf, Registry, impacket,
+# requests) se importan al usar cada opcion del menu, no al arrancar: el menu aparece antes
+
 
 class ForensicTools:
     def __init__(self):
@@ -30,6 +27,8 @@ class ForensicTools:
 
     def new_case(self):
         from curses_ui.new_case_filesystem_browser import file_browser
+        from forensic_core.e01_reader import MODO_HASH_COMPLETO, MODO_HASH_VERIFICAR
+        from forensic_core.ingesta import MODO_RECORRIDO_DIRECTORIOS, MODO_RECORRIDO_MFT
 
         layout = AwesomeLayout()
         layout.render()
@@ -72,23 +71,77 @@ class ForensicTools:
         self.e01_path = selected
 
         self.db_path = os.path.join(self.caso_dir, f"{self.nombre_caso}.db")
-        crear_base_de_datos(self.db_path)
+        # Los indices se crean al final de digestE01, tras la ingesta masiva
+        crear_base_de_datos(self.db_path, con_indices=False)
+
+        layout.change_header("Selecciona como verificar la integridad de la imagen")
+        layout.change_footer("↑/↓ mover  ENTER seleccionar   ESC calculo completo")
+        modo = AwesomeMenu(
+            title="Hash de la imagen",
+            options=[
+                "Calculo completo (lento, se espera a terminar)",
+                "Rapido: hashes del EWF y verificacion en segundo plano"
+            ],
+            win=layout.body_win
+        ).render()
+        modo_hash = MODO_HASH_VERIFICAR if modo == 1 else MODO_HASH_COMPLETO
+
+        layout.change_header("Selecciona como recorrer el sistema de archivos")
+        layout.change_footer("↑/↓ mover  ENTER seleccionar   ESC por directorios")
+        recorrido = AwesomeMenu(
+            title="Recorrido del sistema de archivos",
+            options=[
+                "Por directorios (solo entradas enlazadas)",
+                "Lectura de la MFT por inode (NTFS, incluye borrados y huerfanos)"
+            ],
+            win=layout.body_win
+        ).render()
+        modo_recorrido = MODO_RECORRIDO_MFT if recorrido == 1 else MODO_RECORRIDO_DIRECTORIOS
 
         layout.change_header("Montando y analizando imagen .E01, por favor espera...")
         layout.change_footer("")
         layout.body_win.clear()
-        # mostrar que esta cargando
-        x = CircleLoader(layout.body_win)
-        x.render()
-        
+
         try:
-            digestE01(self.e01_path, self.ui.stdscr, self.db_path, self.nombre_caso, self.caso_dir)
-            x.clear()
+            self._ingestar_con_progreso(layout, modo_hash=modo_hash, modo_recorrido=modo_recorrido)
         except Exception as e:
             self.ui.stdscr.addstr(5, 0, f"Error al montar la imagen: {e}")
             self.ui.stdscr.refresh()
             self.ui.stdscr.getch()
 
+    def _ingestar_con_progreso(self, layout, **opciones):
+        """
+        Lanza digestE01 en segundo plano y muestra su progreso en el cuerpo del layout.
+        Los eventos quedan tambien en ingesta_progreso.jsonl dentro del caso.
+        """
+        from curses_ui.awesome_progress import ProgressPanel, ejecutar_con_progreso
+        from forensic_core.e01_reader import digestE01
+
+        progreso = ProgresoIngesta(ruta_log=os.path.join(self.caso_dir, "ingesta_progreso.jsonl"))
+        panel = ProgressPanel(layout.body_win)
+        try:
+            ejecutar_con_progreso(
+                panel, progreso, digestE01,
+                self.e01_path, None, self.db_path, self.nombre_caso, self.caso_dir,
+                progreso=progreso, **opciones
+            )
+        finally:
+            progreso.cerrar()
+        panel.clear()
+
+    def reanudar_ingesta(self):
+        layout = AwesomeLayout()
+        layout.render()
+        layout.change_header("Reanudando el analisis interrumpido de la imagen .E01, por favor espera...")
+        layout.change_footer("")
+        layout.body_win.clear()
+        try:
+            self._ingestar_con_progreso(layout)
+        except Exception as e:
+            self.ui.stdscr.addstr(5, 0, f"Error al reanudar la imagen: {e}")
+            self.ui.stdscr.refresh()
+            self.ui.stdscr.getch()
+
     def open_case(self):
         caso_seleccionado = self.seleccionar_caso_existente()
         if caso_seleccionado is None:
@@ -101,13 +154,52 @@ class ForensicTools:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("SELECT e01_path FROM case_info WHERE case_name = ?", (self.nombre_caso,))
-        self.e01_path = cursor.fetchone()[0]
+        fila = cursor.fetchone()
+        if fila is None:
+            conn.close()
+            self.ui.stdscr.addstr(0, 0, "El caso no llego a registrar su imagen .E01, crealo de nuevo.")
+            self.ui.stdscr.refresh()
+            self.ui.stdscr.getch()
+            return None
+        self.e01_path = fila[0]
+        try:
+            estado = cursor.execute(
+                "SELECT verificacion_estado FROM case_info WHERE case_name = ?", (self.nombre_caso,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            # Casos creados antes de la verificacion en segundo plano
+            estado = None
         conn.close()
+
+        # Reanudar la ingesta si se interrumpio al crear el caso. digestE01 ya programa al
+        # terminar los hashes de ficheros grandes encolados: no se lanza un segundo hilo
+        reanudada = ingesta_pendiente(self.db_path)
+        if reanudada:
+            self.reanudar_ingesta()
+
+        # Retomar la verificacion de la imagen si quedo a medias al cerrar la herramienta
+        from forensic_core.e01_reader import programar_verificacion_hashes
+        from forensic_core.ingesta import programar_hashes_pendientes
+
+        if estado and estado[0] in ("pendiente", "en_curso"):
+            programar_verificacion_hashes(self.db_path, self.e01_path, self.nombre_caso)
+        # Igual con los hashes de ficheros grandes que quedaron encolados
+        if not reanudada and self._hashes_pendientes():
+            programar_hashes_pendientes(self.db_path, self.e01_path)
         return 1
 
 
         
 
+    def _hashes_pendientes(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM hash_pendiente").fetchone()[0]
+        except sqlite3.OperationalError:
+            return 0
+        finally:
+            conn.close()
+
     def seleccionar_caso_existente(self):
         cases = [f for f in os.listdir(CASES_DIR) if os.path.isdir(os.path.join(CASES_DIR, f))]
         if not cases:
@@ -165,10 +257,24 @@ class ForensicTools:
         cursor.execute("SELECT hash_sha256 FROM case_info WHERE case_name = ?", (self.nombre_caso,))
         case_hash_sha256 = cursor.fetchone()
         case_hash_md5 = cursor.execute("SELECT hash_md5 FROM case_info WHERE case_name = ?", (self.nombre_caso,)).fetchone()
+        try:
+            verificacion = cursor.execute(
+                "SELECT hash_origen, verificacion_estado, verificacion_progreso, verificacion_detalle FROM case_info WHERE case_name = ?",
+                (self.nombre_caso,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            verificacion = None
         conn.close()
 
-        case_hash_sha256 = case_hash_sha256[0] if case_hash_sha256 else "—"
-        case_hash_md5 = case_hash_md5[0] if case_hash_md5 else "—"
+        case_hash_sha256 = case_hash_sha256[0] if case_hash_sha256 and case_hash_sha256[0] else "— (pendiente de verificacion)"
+        case_hash_md5 = case_hash_md5[0] if case_hash_md5 and case_hash_md5[0] else "—"
+        if verificacion:
+            origen, estado, progreso, detalle = verificacion
+            estado_verificacion = f"{estado} ({(progreso or 0) * 100:.0f}%), origen de los hashes: {origen}"
+            if detalle:
+                estado_verificacion += f" - {detalle}"
+        else:
+            estado_verificacion = "—"
         # Construye ayuda dinámica con datos del caso
         nombre = self.nombre_caso or "—"
         caso_dir = self.caso_dir or "—"
@@ -180,7 +286,11 @@ class ForensicTools:
     F2  Usuarios                (información de usuarios extraídos del SAM y descifrado de contraseñas)
     F3  Visualizar Registros    (registros del sistema, eventos, etc.)
     F4  Buscar                  (archivos por nombre, tipo, etc.)
+        texto suelto: parte de la ruta   name:factura*   ext:.pdf,.docx   size>1M   size:1M..10M
+        mtime:2023-01..2023-03   crtime>=2022   user:jimmy   deleted:yes   known:all   type:dir
+        hash:<sha256 o md5>   sort:-size   limit:100
     F5  Artefactos de usuarios  (archivos interesantes clasificados por usuario, historial de busqueda de mavegador, etc.)
+    F6  Explorar                (carpetas del sistema de archivos del caso y tamaño de cada subarbol)
     ESC Salir
 
     INFORMACION DEL CASO (actual)
@@ -190,6 +300,7 @@ class ForensicTools:
     - Imagen E01 donde se extrae la informacion: {e01}
     - Hash SHA256 de la imagen .E01: {case_hash_sha256}
     - Hash MD5 de la imagen .E01: {case_hash_md5}
+    - Verificacion de la imagen: {estado_verificacion}
 
     ESTRUCTURA DEL CASO
     {caso_dir}
@@ -234,10 +345,12 @@ class ForensicTools:
 
         while True:
             self.ui.draw_header("ANALIZADOR FORENSE E01")
-            self.ui.draw_footer("F1: Ayuda | F2: Usuarios | F3: Visualizar Registros | F4: Buscar | F5: Artefactos | ESC: Salir")       
+            self.ui.draw_footer("F1: Ayuda | F2: Usuarios | F3: Visualizar Registros | F4: Buscar | F5: Artefactos | F6: Explorar | ESC: Salir")       
 
             key = self.ui.stdscr.getch()
             if key == 27: # Escape key
+                from forensic_core.sesiones_imagen import cerrar_sesiones
+                cerrar_sesiones()
                 break
             elif key == curses.KEY_UP:
                 self.ui.stdscr.addstr(0, 0, "ssisisisisi")
@@ -246,13 +359,20 @@ class ForensicTools:
             elif key == curses.KEY_F1:
                 self._show_help()
             elif key == curses.KEY_F2:
+                from forensic_core.artifacts.registry.sam_hive import visualizar_usuarios
                 visualizar_usuarios(self.db_path)
             elif key == curses.KEY_F3:
+                from forensic_core.artifacts.registry.registry_analyzer import registry_analyzer
                 registry_analyzer(self.db_path, self.caso_dir)
             elif key == curses.KEY_F4:
+                from forensic_core.search_files import search_files
                 search_files(self.db_path, self.caso_dir)
             elif key == curses.KEY_F5:
+                from curses_ui.artifact_viewer_menu import artifact_menu
                 artifact_menu(self.db_path, self.caso_dir)
+            elif key == curses.KEY_F6:
+                from forensic_core.explorar_caso import explorar_caso
+                explorar_caso(self.db_path, self.caso_dir)
             else:
                 self.ui.stdscr.addstr(0, 0, "Tecla no válida. Presiona ESC para salir.")
                 self.ui.stdscr.refresh()
@@ -0,0 +1,132 @@
+import curses
+import time
+from .renderizable import Renderizable
+from forensic_core.busqueda import BuscadorIncremental
+
+
+# Segundos sin teclear antes de lanzar la busqueda
+RETARDO_TECLEO = 0.15
+# Cada cuanto se comprueba si hay teclas o resultados nuevos (ms)
+INTERVALO_REFRESCO = 50
+
+
+class IncrementalSearchInput(Renderizable):
+    """
+    Caja de busqueda que ejecuta la consulta mientras se escribe y muestra debajo los primeros
+    resultados. Devuelve el texto al pulsar ENTER o None con ESC.
+    """
+
+    def __init__(self, win, db_path, prompt=" Buscar: ", default_text="", retardo=RETARDO_TECLEO):
+        super().__init__(win)
+        self.db_path = db_path
+        self.prompt = prompt
+        self.texto = default_text
+        self.retardo = retardo
+
+    def _ensure_colors(self):
+        # Mismo fondo azul que AwesomeInput (par 21)
+        if not curses.has_colors():
+            return 0
+        curses.start_color()
+        try:
+            curses.init_pair(21, curses.COLOR_WHITE, curses.COLOR_BLUE)
+        except curses.error:
+            pass
+        return curses.color_pair(21)
+
+    def _addnstr(self, y, x, texto, atributos=0):
+        if y >= self.height or x >= self.width:
+            return
+        try:
+            self.win.addnstr(y, x, texto, self.width - x - 1, atributos)
+        except curses.error:
+            pass
+
+    def _dibujar(self, color_input, estado, filas):
+        self.win.erase()
+        ancho_input = max(10, self.width - len(self.prompt) - 3)
+        visible = self.texto[-(ancho_input - 1):]
+        self._addnstr(1, 1, self.prompt, curses.A_BOLD)
+        self._addnstr(1, 1 + len(self.prompt), visible.ljust(ancho_input), color_input)
+        self._addnstr(2, 1, estado, curses.A_DIM)
+        for i, fila in enumerate(filas[:max(0, self.height - 4)]):
+            self._addnstr(4 + i, 1, f"{fila[3]} ({fila[6]} bytes)  {fila[2]}")
+        try:
+            self.win.move(1, min(1 + len(self.prompt) + len(visible), self.width - 2))
+        except curses.error:
+            pass
+        self.win.refresh()
+
+    def _estado(self, resultado, buscando):
+        if not self.texto.strip():
+            return "Escribe para buscar; los resultados aparecen mientras escribes"
+        if buscando or resultado is None:
+            return "buscando..."
+        if resultado["error"]:
+            return f"Error en la busqueda: {resultado['error']}"
+        filas = resultado["filas"]
+        mas = "+" if len(filas) >= self.buscador.primeros else ""
+        return (f"{len(filas)}{mas} resultados ({resultado['segundos'] * 1000:.0f} ms)"
+                f"{', ENTER para verlos todos' if mas else ''}")
+
+    def render(self):
+        color_input = self._ensure_colors()
+        self.win.keypad(True)
+        self.win.timeout(INTERVALO_REFRESCO)
+        curses.curs_set(1)
+        self.buscador = BuscadorIncremental(self.db_path)
+        # Momento de la ultima tecla cuya busqueda aun no se ha lanzado
+        pendiente = time.monotonic() - self.retardo if self.texto.strip() else None
+        resultado = None
+        # Solo se repinta tras una tecla, con resultados nuevos o si cambia la linea de estado
+        redibujar, estado_dibujado = True, None
+        try:
+            while True:
+                buscando = pendiente is not None or self.buscador.ocupado
+                nuevo = self.buscador.resultado()
+                if nuevo is not None:
+                    resultado = nuevo
+                    redibujar = True
+                mostrar = resultado if resultado is not None and resultado["texto"] == self.texto else None
+                estado = self._estado(mostrar, buscando and mostrar is None)
+                if redibujar or estado != estado_dibujado:
+                    self._dibujar(color_input, estado, mostrar["filas"] if mostrar else [])
+                    redibujar, estado_dibujado = False, estado
+
+                try:
+                    tecla = self.win.get_wch()
+                except curses.error:
+                    tecla = None
+
+                if tecla is None:
+                    if pendiente is not None and time.monotonic() - pendiente >= self.retardo:
+                        pendiente = None
+                        if self.texto.strip():
+                            self.buscador.buscar(self.texto)
+                    continue
+                if tecla in ("\n", "\r", curses.KEY_ENTER):
+                    return self.texto.strip()
+                if tecla == "\x1b":
+                    return None
+                if tecla == curses.KEY_RESIZE:
+                    self.height, self.width = self.win.getmaxyx()
+                    redibujar = True
+                    continue
+                if tecla in (curses.KEY_BACKSPACE, "\x7f", "\b"):
+                    self.texto = self.texto[:-1]
+                elif tecla == "\x15":  # Ctrl-U: borrar la linea
+                    self.texto = ""
+                elif isinstance(tecla, str) and tecla.isprintable():
+                    self.texto += tecla
+                else:
+                    continue
+                # La consulta en curso ya no sirve: se cancela y se espera a que pare de teclear
+                self.buscador.cancelar()
+                pendiente = time.monotonic()
+                redibujar = True
+        finally:
+            self.buscador.cerrar()
+            self.win.timeout(-1)
+            curses.curs_set(0)
+            self.win.erase()
+            self.win.refresh()
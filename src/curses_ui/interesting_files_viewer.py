@@ -3,6 +3,8 @@ import os
 
 from curses_ui.awesome_layout import AwesomeLayout
 from curses_ui.file_viewer_panel import FileViewerPanel
+from database.create_database import obtener_hash_entrada
+from forensic_core.almacen_hashes import describir_origen
 from forensic_core.artifact_extractor import exportar_archivos_interesantes
 from forensic_core.search_files import get_info_file2
 from utils.text_sanitizer import TextSanitizer
@@ -406,12 +408,10 @@ def _mostrar_info_extra(file_path, db_path):
     ).fetchone()[0]
     cursor.execute("SELECT e01_path FROM case_info")
     path = cursor.fetchall()
-    sha_row = cursor.execute(
-        "SELECT sha256, size FROM filesystem_entry WHERE entry_id = ?",
-        (selected_file[0],)
-    ).fetchone()
+    sha_row = obtener_hash_entrada(cursor, selected_file[0])
     sha256_db = sha_row[0] if sha_row else None
     size_db   = sha_row[1] if sha_row else None
+    origen_db = sha_row[2] if sha_row else None
     conn.close()
     layout=AwesomeLayout()
     layout.render()
@@ -427,6 +427,7 @@ def _mostrar_info_extra(file_path, db_path):
 
     if sha256_db and str(sha256_db).strip():
         metadata["SHA-256"] = str(sha256_db).strip()
+        metadata["Origen del hash"] = describir_origen(origen_db)
     else:
         if (size_db == 0) or (size_db is None and selected_file[6] == 0):
             metadata["SHA-256"] = "— (no calculado: tamaño 0 bytes)"
@@ -7,14 +7,26 @@ MARGEN_ABAJO = 10
 
 
 class SearchFilesMenu(Renderizable):
-
-    def __init__(self, title, options, info, win=None):
+    """
+    Lista de resultados con la ruta de la fila seleccionada debajo. options e info pueden ser
+    listas o secuencias perezosas con asegurar(n) (ver forensic_core.busqueda): en ese caso solo
+    se piden las filas visibles. estado() devuelve un texto para la esquina del recuadro (p.ej.
+    el total de resultados) y si el texto puede cambiar todavia: (texto, definitivo).
+    """
+
+    def __init__(self, title, options, info, win=None, estado=None):
         super().__init__(win)
         self.title = title
         self.options = options
         self.info = info
+        self.estado = estado
         self.selected_option = 0
-        
+        self._perezosa = hasattr(options, "asegurar")
+
+    def _asegurar(self, n):
+        if self._perezosa:
+            self.options.asegurar(n)
+
 
     def render(self):
         current_row = 0
@@ -22,11 +34,17 @@ class SearchFilesMenu(Renderizable):
 
         MENU_INSTRUCTIONS = "↑/↓: Navegar | Enter: Seleccionar | ESC: Salir"
 
-        max_option_width = max(len(p) for p in self.options) if self.options else 20
+        max_box_height = self.height - MARGEN_ABAJO
+        # Con resultados perezosos basta con conocer las filas que caben en el recuadro
+        self._asegurar(max_box_height)
+        if self._perezosa:
+            max_option_width = self.width
+        else:
+            max_option_width = max(len(p) for p in self.options) if self.options else 20
         max_option_width = max(max_option_width, len(MENU_INSTRUCTIONS) + 4)
         self.box_width = min(max(max_option_width + 4, 40), self.width - 4)
 
-        box_height = min(len(self.options) + 4, self.height - MARGEN_ABAJO)
+        box_height = min(len(self.options) + 4, max_box_height)
 
         start_y = max(1, (self.height - box_height) // 2)
         start_x = max(1, (self.width - self.box_width) // 2)
@@ -51,6 +69,8 @@ class SearchFilesMenu(Renderizable):
 
             visible_rows = box_height - 3
             start_idx = max(0, current_row - visible_rows + 1)
+            # Una fila de mas para saber si hay que pintar ▼
+            self._asegurar(start_idx + visible_rows + 1)
             end_idx = min(start_idx + visible_rows, len(self.options))
 
             for idx in range(start_idx, end_idx):
@@ -88,10 +108,22 @@ class SearchFilesMenu(Renderizable):
             except curses.error:
                 pass
 
+            definitivo = True
+            if self.estado:
+                texto, definitivo = self.estado(current_row)
+                try:
+                    menu_win.addstr(box_height - 1, max(1, self.box_width - len(texto) - 3), texto)
+                except curses.error:
+                    pass
+
             menu_win.noutrefresh()
             curses.doupdate()
 
+            # Mientras el estado puede cambiar (p.ej. el total se esta contando) se repinta
+            # aunque no se pulse ninguna tecla
+            self.win.timeout(-1 if definitivo else 300)
             key = self.win.getch()
+            self.win.timeout(-1)
 
             if key == 27:  # ESC o secuencia ANSI
                 self.win.nodelay(True)
@@ -114,8 +146,17 @@ class SearchFilesMenu(Renderizable):
             if key == curses.KEY_UP and current_row > 0:
                 current_row -= 1
                 self.print_info_row(current_row)
-            elif key == curses.KEY_DOWN and current_row < len(self.options) - 1:
-                current_row += 1
+            elif key == curses.KEY_DOWN:
+                self._asegurar(current_row + 2)
+                if current_row < len(self.options) - 1:
+                    current_row += 1
+                    self.print_info_row(current_row)
+            elif key == curses.KEY_NPAGE:
+                self._asegurar(current_row + visible_rows + 1)
+                current_row = min(current_row + visible_rows, len(self.options) - 1)
+                self.print_info_row(current_row)
+            elif key == curses.KEY_PPAGE:
+                current_row = max(current_row - visible_rows, 0)
                 self.print_info_row(current_row)
             elif key == curses.KEY_ENTER or key in [10, 13]:
                 menu_win.erase()
@@ -1,6 +1,66 @@
+import json
 import sqlite3
 
-def crear_base_de_datos(path_db):
+TAMANO_LOTE_ESCRITURA = 5000
+
+# PRAGMAs para construir la base de datos del caso lo mas rapido posible
+PRAGMAS_INGESTA = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA cache_size=-262144",  # 256 MB
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Índices para rendimiento
+SQL_INDICES_SECUNDARIOS = """
+CREATE INDEX IF NOT EXISTS idx_full_path ON filesystem_entry(full_path);
+CREATE INDEX IF NOT EXISTS idx_extension ON filesystem_entry(extension);
+CREATE INDEX IF NOT EXISTS idx_mtime ON filesystem_entry(mtime);
+CREATE INDEX IF NOT EXISTS idx_crtime ON filesystem_entry(crtime);
+CREATE INDEX IF NOT EXISTS idx_size ON filesystem_entry(size);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_file_hash_entry ON file_hash(entry_id);
+CREATE INDEX IF NOT EXISTS idx_file_hash_sha256 ON file_hash(sha256);
+CREATE INDEX IF NOT EXISTS idx_file_hash_md5 ON file_hash(md5);
+CREATE INDEX IF NOT EXISTS idx_timeline_time ON unified_timeline(timestamp);
+"""
+
+# Indice de subcadenas de las rutas: FTS5 con tokenizador trigram (SQLite >= 3.34). Es una tabla
+# de contenido externo: el texto se lee de filesystem_entry y el indice solo guarda los trigramas
+SQL_INDICE_RUTAS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS filesystem_entry_fts USING fts5(
+    full_path, name, content='filesystem_entry', content_rowid='entry_id', tokenize='trigram'
+);
+"""
+
+# Una vez construido el indice, los triggers lo mantienen si se añaden entradas (p.ej. al reanudar)
+SQL_TRIGGERS_INDICE_RUTAS = """
+CREATE TRIGGER IF NOT EXISTS filesystem_entry_fts_ai AFTER INSERT ON filesystem_entry BEGIN
+    INSERT INTO filesystem_entry_fts (rowid, full_path, name) VALUES (new.entry_id, new.full_path, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS filesystem_entry_fts_ad AFTER DELETE ON filesystem_entry BEGIN
+    INSERT INTO filesystem_entry_fts (filesystem_entry_fts, rowid, full_path, name)
+    VALUES ('delete', old.entry_id, old.full_path, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS filesystem_entry_fts_au AFTER UPDATE OF full_path, name ON filesystem_entry BEGIN
+    INSERT INTO filesystem_entry_fts (filesystem_entry_fts, rowid, full_path, name)
+    VALUES ('delete', old.entry_id, old.full_path, old.name);
+    INSERT INTO filesystem_entry_fts (rowid, full_path, name) VALUES (new.entry_id, new.full_path, new.name);
+END;
+"""
+
+# Con menos de tres caracteres no hay trigramas que buscar
+LONGITUD_MINIMA_TRIGRAM = 3
+
+# Arbol de directorios: los hijos de una carpeta son un tramo contiguo de idx_arbol. El subarbol
+# entero es un rango de full_path (ruta materializada) y se recorre con idx_full_path
+SQL_INDICE_ARBOL = """
+DROP INDEX IF EXISTS idx_subarbol;
+CREATE INDEX IF NOT EXISTS idx_arbol ON filesystem_entry(partition_id, parent_id, name);
+"""
+
+def crear_base_de_datos(path_db, con_indices=True):
+    # con_indices=False crea las tablas sin indices secundarios para la ingesta masiva;
+    # despues hay que llamar a crear_indices_secundarios
     conn = sqlite3.connect(path_db)
     cursor = conn.cursor()
 
@@ -11,8 +71,15 @@ def crear_base_de_datos(path_db):
         case_name TEXT NOT NULL,
         e01_path TEXT NOT NULL,
         created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-        hash_sha256 TEXT NOT NULL,
-        hash_md5 TEXT NOT NULL
+        hash_sha256 TEXT,
+        hash_md5 TEXT,
+        hash_sha1 TEXT,
+        hash_blake3 TEXT,
+        hash_origen TEXT DEFAULT 'calculado', -- 'calculado' o 'ewf' (almacenado en la imagen)
+        verificacion_estado TEXT DEFAULT 'verificado', -- 'pendiente', 'en_curso', 'verificado', 'discrepancia', 'error'
+        verificacion_progreso REAL DEFAULT 1.0,
+        verificacion_detalle TEXT,
+        verificacion_fecha DATETIME
     );
 
     -- Tabla de particiones encontradas
@@ -45,20 +112,57 @@ def crear_base_de_datos(path_db):
         ctime DATETIME,
         crtime DATETIME,
         sha256 TEXT,
+        deleted INTEGER DEFAULT 0, -- registro/nombre no asignado (borrado)
+        orphan INTEGER DEFAULT 0, -- sin directorio padre recuperable (bajo /$OrphanFiles)
+        known INTEGER DEFAULT 0, -- hash presente en el conjunto de ficheros conocidos (NSRL)
+        parent_id INTEGER, -- entry_id del directorio padre (NULL en la raiz o si no hay fila del padre)
+        depth INTEGER, -- numero de componentes de full_path (1 en la raiz)
         FOREIGN KEY (partition_id) REFERENCES partition_info(partition_id)
     );
 
-    -- Hashes de archivos
+    -- Hashes de archivos: una fila por entrada; varias entradas pueden tener el mismo contenido
     CREATE TABLE IF NOT EXISTS file_hash (
         hash_id INTEGER PRIMARY KEY AUTOINCREMENT,
         entry_id INTEGER NOT NULL,
         sha256 TEXT NOT NULL,
         md5 TEXT,
+        origen TEXT DEFAULT 'calculado', -- 'calculado' o 'almacen' (provisional, del almacen de hashes compartido)
         FOREIGN KEY (entry_id) REFERENCES filesystem_entry(entry_id)
     );
 
 
 
+    -- Ficheros grandes cuyo hash se calcula en segundo plano tras la ingesta
+    CREATE TABLE IF NOT EXISTS hash_pendiente (
+        entry_id INTEGER PRIMARY KEY,
+        partition_offset INTEGER NOT NULL,
+        inode INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        FOREIGN KEY (entry_id) REFERENCES filesystem_entry(entry_id)
+    );
+
+    -- Etapas de la ingesta y su punto de control para poder reanudarla
+    CREATE TABLE IF NOT EXISTS ingesta_etapa (
+        etapa TEXT PRIMARY KEY,
+        estado TEXT NOT NULL, -- 'en_curso', 'completada'
+        checkpoint TEXT, -- p.ej. posicion (JSON) de la ultima entrada guardada del recorrido
+        actualizado DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Tiempos y contadores de cada etapa de la ingesta, para comparar ejecuciones e imagenes
+    CREATE TABLE IF NOT EXISTS stage_metrics (
+        metric_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ejecucion TEXT NOT NULL, -- instante de inicio de la ejecucion de digestE01
+        etapa TEXT NOT NULL,
+        inicio DATETIME NOT NULL,
+        duracion_seg REAL NOT NULL,
+        cpu_seg REAL,
+        memoria_pico INTEGER, -- bytes, solo con tracemalloc activo
+        contadores TEXT, -- JSON
+        perfil TEXT, -- ruta del volcado de cProfile, si se capturo
+        error TEXT
+    );
+
     -- Línea de tiempo unificada
     CREATE TABLE IF NOT EXISTS unified_timeline (
         timeline_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -69,26 +173,124 @@ def crear_base_de_datos(path_db):
         timestamp DATETIME NOT NULL,
         FOREIGN KEY (case_id) REFERENCES case_info(case_id)
     );
-
-    -- Índices para rendimiento
-    CREATE INDEX IF NOT EXISTS idx_full_path ON filesystem_entry(full_path);
-    CREATE INDEX IF NOT EXISTS idx_extension ON filesystem_entry(extension);
-    CREATE INDEX IF NOT EXISTS idx_mtime ON filesystem_entry(mtime);
-    CREATE INDEX IF NOT EXISTS idx_crtime ON filesystem_entry(crtime);
-    CREATE UNIQUE INDEX IF NOT EXISTS idx_hash_sha256 ON file_hash(sha256);
-    CREATE INDEX IF NOT EXISTS idx_timeline_time ON unified_timeline(timestamp);
     """)
 
+    if con_indices:
+        crear_indices_secundarios(conn)
+
     conn.commit()
     conn.close()
 
-def insertar_case_info(cursor, case_name, e01_path, hash_sha256, hash_md5):
+def crear_indices_secundarios(conn):
+    """
+    Segunda fase del esquema: con las tablas ya pobladas cada indice se construye en una
+    sola pasada ordenada en lugar de actualizar seis B-trees por cada fila ingestada.
+    """
+    # Sin el indice UNIQUE durante la ingesta puede haberse colado un hash repetido por entrada
+    conn.execute("""
+    DELETE FROM file_hash WHERE hash_id NOT IN (
+        SELECT MIN(hash_id) FROM file_hash GROUP BY entry_id
+    )
+    """)
+    # Casos anteriores: el indice UNIQUE por sha256 descartaba las entradas con contenido repetido
+    conn.execute("DROP INDEX IF EXISTS idx_hash_sha256")
+    conn.executescript(SQL_INDICES_SECUNDARIOS)
+    crear_indice_rutas(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+
+def crear_indice_rutas(conn):
+    """
+    Construye el indice trigram de full_path y name en una pasada y crea los triggers que lo
+    mantienen. Devuelve False si esta version de SQLite no tiene FTS5 con trigram.
+    """
+    try:
+        conn.executescript(SQL_INDICE_RUTAS)
+    except sqlite3.OperationalError:
+        return False
+    conn.execute("INSERT INTO filesystem_entry_fts (filesystem_entry_fts) VALUES ('rebuild')")
+    conn.executescript(SQL_TRIGGERS_INDICE_RUTAS)
+    conn.commit()
+    return True
+
+def indice_rutas_disponible(cursor):
+    return cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'filesystem_entry_fts'"
+    ).fetchone() is not None
+
+def _sql_filtro_entradas(filtro, columnas):
+    # filtro = (match, condicion, parametros, indice): match es una expresion FTS5 sobre
+    # filesystem_entry_fts (o None), condicion usa el alias e de filesystem_entry e indice, si
+    # se da, es el indice de filesystem_entry que debe conducir la consulta
+    match, condicion, parametros, indice = filtro
+    if match and not indice:
+        # El indice FTS5 devuelve los rowid en orden: la paginacion por keyset y el LIMIT se
+        # resuelven sin materializar todas las coincidencias
+        return (f"SELECT {columnas} FROM filesystem_entry_fts JOIN filesystem_entry e "
+                f"ON e.entry_id = filesystem_entry_fts.rowid WHERE filesystem_entry_fts MATCH ? AND ({condicion})",
+                "filesystem_entry_fts.rowid", [match, *parametros])
+    origen = f"filesystem_entry e INDEXED BY {indice}" if indice else "filesystem_entry e"
+    parametros = list(parametros)
+    if match:
+        condicion = f"e.entry_id IN (SELECT rowid FROM filesystem_entry_fts WHERE filesystem_entry_fts MATCH ?) AND ({condicion})"
+        parametros.insert(0, match)
+    return f"SELECT {columnas} FROM {origen} WHERE ({condicion})", "e.entry_id", parametros
+
+def obtener_pagina_entradas(cursor, filtro, despues_de, limite, orden=None):
+    """
+    Paginacion por keyset, sin OFFSET: la pagina empieza tras la ultima fila vista (None para la
+    primera). Sin orden las filas van por entry_id y despues_de es un entry_id. Con
+    orden=(columna, descendente) despues_de es (valor, entry_id) y cada fila lleva el valor de la
+    columna como ultimo campo; el filtro debe excluir los NULL de esa columna.
+    """
+    if orden is None:
+        sql, clave, parametros = _sql_filtro_entradas(filtro, "e.*")
+        keyset = f" AND {clave} > ?" if despues_de is not None else ""
+        return cursor.execute(f"{sql}{keyset} ORDER BY {clave} LIMIT ?",
+                              [*parametros, *([despues_de] if despues_de is not None else []), limite]).fetchall()
+    columna, descendente = orden
+    sql, _, parametros = _sql_filtro_entradas(filtro, f"e.*, e.{columna}")
+    comparador, sentido = ("<", "DESC") if descendente else (">", "ASC")
+    keyset = f" AND (e.{columna}, e.entry_id) {comparador} (?, ?)" if despues_de is not None else ""
+    return cursor.execute(f"{sql}{keyset} ORDER BY e.{columna} {sentido}, e.entry_id {sentido} LIMIT ?",
+                          [*parametros, *(despues_de or ()), limite]).fetchall()
+
+def contar_entradas(cursor, filtro):
+    sql, _, parametros = _sql_filtro_entradas(filtro, "COUNT(*)")
+    return cursor.execute(sql, parametros).fetchone()[0]
+
+def insertar_case_info(cursor, case_name, e01_path, hashes, hash_origen="calculado", verificacion_estado="verificado"):
+    # hashes: diccionario {algoritmo: hex} devuelto por calcular_hashes_E01 o leido de la imagen EWF
+    progreso = 1.0 if verificacion_estado == "verificado" else 0.0
     cursor.execute("""
-    INSERT INTO case_info (case_name, e01_path, hash_sha256, hash_md5)
-    VALUES (?, ?, ?, ?)
-    """, (case_name, e01_path, hash_sha256, hash_md5))
+    INSERT INTO case_info (case_name, e01_path, hash_sha256, hash_md5, hash_sha1, hash_blake3,
+                           hash_origen, verificacion_estado, verificacion_progreso)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (case_name, e01_path, hashes.get("sha256"), hashes.get("md5"), hashes.get("sha1"), hashes.get("blake3"),
+          hash_origen, verificacion_estado, progreso))
     return cursor.lastrowid
 
+def actualizar_progreso_verificacion(cursor, case_name, estado, progreso):
+    cursor.execute("""
+    UPDATE case_info SET verificacion_estado = ?, verificacion_progreso = ?
+    WHERE case_name = ?
+    """, (estado, progreso, case_name))
+
+def actualizar_resultado_verificacion(cursor, case_name, estado, hashes, detalle):
+    # Completa los hashes que no estaban en la imagen (p.ej. SHA-256) sin pisar los almacenados
+    cursor.execute("""
+    UPDATE case_info SET
+        hash_sha256 = COALESCE(hash_sha256, ?),
+        hash_md5 = COALESCE(hash_md5, ?),
+        hash_sha1 = COALESCE(hash_sha1, ?),
+        hash_blake3 = COALESCE(hash_blake3, ?),
+        verificacion_estado = ?,
+        verificacion_progreso = 1.0,
+        verificacion_detalle = ?,
+        verificacion_fecha = CURRENT_TIMESTAMP
+    WHERE case_name = ?
+    """, (hashes.get("sha256"), hashes.get("md5"), hashes.get("sha1"), hashes.get("blake3"), estado, detalle, case_name))
+
 
 
 def insertar_partition_info(cursor, case_id, description, start_offset, length, partition_offset, fs_type, label,
@@ -101,23 +303,24 @@ def insertar_partition_info(cursor, case_id, description, start_offset, length,
 
 
 def insertar_filesystem_entry(cursor, partition_id, full_path, name, extension, tipo, size,
-                              inode, mtime=None, atime=None, ctime=None, crtime=None, sha256=None):
+                              inode, mtime=None, atime=None, ctime=None, crtime=None, sha256=None,
+                              deleted=0, orphan=0):
     cursor.execute("""
     INSERT INTO filesystem_entry (
         partition_id, full_path, name, extension, type, size, inode,
-        mtime, atime, ctime, crtime, sha256
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        mtime, atime, ctime, crtime, sha256, deleted, orphan
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (
         partition_id, full_path, name, extension, tipo, size, inode,
-        mtime, atime, ctime, crtime, sha256
+        mtime, atime, ctime, crtime, sha256, deleted, orphan
     ))
     return cursor.lastrowid
 
-def insertar_file_hash(cursor, entry_id, sha256, md5=None):
+def insertar_file_hash(cursor, entry_id, sha256, md5=None, origen="calculado"):
     cursor.execute("""
-    INSERT INTO file_hash (entry_id, sha256, md5)
-    VALUES (?, ?, ?)
-    """, (entry_id, sha256, md5))
+    INSERT INTO file_hash (entry_id, sha256, md5, origen)
+    VALUES (?, ?, ?, ?)
+    """, (entry_id, sha256, md5, origen))
 
 
 
@@ -129,3 +332,391 @@ def insertar_timeline_event(cursor, case_id, source, reference_id, description,
     """, (
         case_id, source, reference_id, description, timestamp
     ))
+
+
+def aplicar_pragmas_ingesta(conn):
+    for pragma in PRAGMAS_INGESTA:
+        conn.execute(pragma)
+
+def restaurar_pragmas_ingesta(conn):
+    # Al terminar la construccion se vuelve a un modo seguro frente a cortes
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+
+class EscritorIngesta:
+    """
+    Acumula filas de filesystem_entry, file_hash y unified_timeline y las vuelca con
+    executemany en lotes de tamano_lote. Los entry_id se asignan en el cliente, por lo
+    que las claves ajenas de file_hash y unified_timeline se conocen antes del volcado.
+    Debe ser el unico escritor de filesystem_entry mientras este abierto.
+
+    parent_id y depth se calculan al insertar: los directorios ya insertados se recuerdan por
+    (partition_id, full_path). Las entradas cuyo directorio aun no tiene fila (p.ej. en el
+    recorrido por MFT) quedan con parent_id NULL y las completa construir_arbol.
+
+    Solo se vuelca entre entradas: tras encolar una entrada y sus filas dependientes se llama
+    a fin_entrada, que fija el punto de control y vacia si el lote esta lleno. Asi un corte
+    nunca deja guardada una entrada (ni su checkpoint) sin su hash, evento o pendiente.
+    """
+
+    def __init__(self, conn, tamano_lote=TAMANO_LOTE_ESCRITURA, almacen=None):
+        self.conn = conn
+        # AlmacenHashes compartido entre casos (opcional): recibe los contenidos hasheados
+        self.almacen = almacen
+        # {partition_id: etapa}: cada volcado guarda en la etapa de cada particion el punto de
+        # control de su ultima entrada (en JSON) dentro de la misma transaccion, para reanudar
+        self.etapas_checkpoint = {}
+        self.checkpoints = {}
+        self.cursor = conn.cursor()
+        self.tamano_lote = tamano_lote
+        ultimo = self.cursor.execute("SELECT COALESCE(MAX(entry_id), 0) FROM filesystem_entry").fetchone()[0]
+        self.siguiente_entry_id = ultimo + 1
+        asegurar_columnas_arbol(conn)
+        # {(partition_id, full_path): (entry_id, deleted)}; al reanudar se cargan los ya guardados
+        self.directorios = {}
+        for entry_id, partition_id, full_path, deleted in obtener_directorios(self.cursor).fetchall():
+            self.directorios.setdefault((partition_id, full_path), (entry_id, deleted))
+        self.entradas = []
+        self.hashes = []
+        self.eventos = []
+        self.pendientes = []
+        self.contenidos = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.vaciar()
+
+    def insertar_filesystem_entry(self, partition_id, full_path, name, extension, tipo, size,
+                                  inode, mtime=None, atime=None, ctime=None, crtime=None, sha256=None,
+                                  deleted=0, orphan=0):
+        entry_id = self.siguiente_entry_id
+        self.siguiente_entry_id += 1
+        padre = self.directorios.get((partition_id, full_path.rpartition("/")[0]))
+        self.entradas.append((
+            entry_id, partition_id, full_path, name, extension, tipo, size, inode,
+            mtime, atime, ctime, crtime, sha256, deleted, orphan,
+            padre[0] if padre else None, full_path.count("/")
+        ))
+        if tipo == "dir":
+            # Si una ruta se repite (borrado y recreado) gana el directorio vigente
+            previo = self.directorios.get((partition_id, full_path))
+            if previo is None or (previo[1] and not deleted):
+                self.directorios[(partition_id, full_path)] = (entry_id, deleted)
+        return entry_id
+
+    def insertar_file_hash(self, entry_id, sha256, md5=None, origen="calculado"):
+        self.hashes.append((entry_id, sha256, md5, origen))
+
+    def registrar_contenido(self, size, huella, sha256, md5):
+        # Contenido para el almacen de hashes compartido; se guarda en el mismo volcado
+        if self.almacen is not None:
+            self.contenidos.append((size, huella, sha256, md5))
+
+    def insertar_timeline_event(self, case_id, source, reference_id, description, timestamp):
+        self.eventos.append((case_id, source, reference_id, description, timestamp))
+
+    def insertar_hash_pendiente(self, entry_id, partition_offset, inode, size):
+        self.pendientes.append((entry_id, partition_offset, inode, size))
+
+    def fin_entrada(self, partition_id=None, checkpoint=None):
+        """
+        Cierra la entrada actual con todas sus filas ya encoladas: registra su punto de control
+        (si lo hay) y vuelca el lote si esta lleno.
+        """
+        if checkpoint is not None:
+            self.checkpoints[partition_id] = checkpoint
+        if len(self.entradas) + len(self.hashes) + len(self.eventos) + len(self.pendientes) >= self.tamano_lote:
+            self.vaciar()
+
+    def vaciar(self):
+        if self.entradas:
+            self.cursor.executemany("""
+            INSERT INTO filesystem_entry (
+                entry_id, partition_id, full_path, name, extension, type, size, inode,
+                mtime, atime, ctime, crtime, sha256, deleted, orphan, parent_id, depth
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, self.entradas)
+            for partition_id, checkpoint in self.checkpoints.items():
+                etapa = self.etapas_checkpoint.get(partition_id)
+                if etapa:
+                    actualizar_checkpoint_etapa(self.cursor, etapa, json.dumps(checkpoint))
+            self.checkpoints.clear()
+        if self.hashes:
+            # Una fila por entrada: si idx_file_hash_entry (UNIQUE sobre entry_id) ya existe, la
+            # entrada repetida se descarta aqui; si no, crear_indices_secundarios elimina los
+            # duplicados al final
+            self.cursor.executemany("""
+            INSERT OR IGNORE INTO file_hash (entry_id, sha256, md5, origen)
+            VALUES (?, ?, ?, ?)
+            """, self.hashes)
+        if self.eventos:
+            self.cursor.executemany("""
+            INSERT INTO unified_timeline (
+                case_id, source, reference_id, description, timestamp
+            ) VALUES (?, ?, ?, ?, ?)
+            """, self.eventos)
+        if self.pendientes:
+            self.cursor.executemany("""
+            INSERT OR REPLACE INTO hash_pendiente (entry_id, partition_offset, inode, size)
+            VALUES (?, ?, ?, ?)
+            """, self.pendientes)
+        self.entradas = []
+        self.hashes = []
+        self.eventos = []
+        self.pendientes = []
+        self.conn.commit()
+        if self.contenidos:
+            self.almacen.registrar(self.contenidos)
+            self.contenidos = []
+
+
+def obtener_hashes_pendientes(cursor, limite=1000):
+    return cursor.execute("""
+    SELECT entry_id, partition_offset, inode, size FROM hash_pendiente
+    ORDER BY partition_offset, entry_id
+    LIMIT ?
+    """, (limite,)).fetchall()
+
+def obtener_pendientes_sin_hash(cursor):
+    return cursor.execute("""
+    SELECT p.entry_id, p.partition_offset, p.inode, p.size FROM hash_pendiente p
+    WHERE NOT EXISTS (SELECT 1 FROM file_hash h WHERE h.entry_id = p.entry_id)
+    ORDER BY p.partition_offset, p.entry_id
+    """).fetchall()
+
+def guardar_hash_fichero(cursor, entry_id, sha256, md5, origen="calculado"):
+    # Sustituye el hash que tuviera la entrada (p.ej. el provisional tomado del almacen)
+    cursor.execute("UPDATE filesystem_entry SET sha256 = ? WHERE entry_id = ?", (sha256, entry_id))
+    cursor.execute("UPDATE file_hash SET sha256 = ?, md5 = ?, origen = ? WHERE entry_id = ?",
+                   (sha256, md5, origen, entry_id))
+    if cursor.rowcount == 0:
+        cursor.execute("""
+        INSERT INTO file_hash (entry_id, sha256, md5, origen)
+        VALUES (?, ?, ?, ?)
+        """, (entry_id, sha256, md5, origen))
+
+def completar_hash_pendiente(cursor, entry_id, sha256, md5, origen="calculado"):
+    if sha256:
+        guardar_hash_fichero(cursor, entry_id, sha256, md5, origen)
+    cursor.execute("DELETE FROM hash_pendiente WHERE entry_id = ?", (entry_id,))
+
+def obtener_hash_entrada(cursor, entry_id):
+    # (sha256, size, origen) de una entrada; origen es None si no hay fila en file_hash
+    return cursor.execute("""
+    SELECT e.sha256, e.size, h.origen FROM filesystem_entry e
+    LEFT JOIN file_hash h ON h.entry_id = e.entry_id
+    WHERE e.entry_id = ?
+    """, (entry_id,)).fetchone()
+
+
+def asegurar_columna_known(conn):
+    # Casos creados antes de marcar los ficheros conocidos
+    columnas = {fila[1] for fila in conn.execute("PRAGMA table_info(filesystem_entry)")}
+    if "known" not in columnas:
+        conn.execute("ALTER TABLE filesystem_entry ADD COLUMN known INTEGER DEFAULT 0")
+        conn.commit()
+
+def obtener_hashes_entradas(cursor):
+    return cursor.execute("SELECT entry_id, sha256, md5 FROM file_hash")
+
+def marcar_entradas_conocidas(cursor, entry_ids, reiniciar=False):
+    if reiniciar:
+        cursor.execute("UPDATE filesystem_entry SET known = 0 WHERE known != 0")
+    cursor.executemany("UPDATE filesystem_entry SET known = 1 WHERE entry_id = ?", ((e,) for e in entry_ids))
+
+def desmarcar_entrada_conocida(cursor, entry_id):
+    cursor.execute("UPDATE filesystem_entry SET known = 0 WHERE entry_id = ?", (entry_id,))
+
+def asegurar_columnas_arbol(conn):
+    # Casos creados antes del arbol de directorios
+    columnas = {fila[1] for fila in conn.execute("PRAGMA table_info(filesystem_entry)")}
+    for columna in ("parent_id", "depth"):
+        if columna not in columnas:
+            conn.execute(f"ALTER TABLE filesystem_entry ADD COLUMN {columna} INTEGER")
+    conn.commit()
+
+def obtener_directorios(cursor):
+    # Los directorios vigentes primero: si una ruta se repite (borrado y recreado) gana el asignado
+    return cursor.execute(
+        "SELECT entry_id, partition_id, full_path, deleted FROM filesystem_entry WHERE type = 'dir' ORDER BY deleted, entry_id"
+    )
+
+def obtener_entradas_sin_padre(cursor, despues_de, limite):
+    # Entradas fuera de la raiz sin parent_id (padre insertado despues) o sin depth (casos antiguos)
+    return cursor.execute("""
+        SELECT entry_id, partition_id, full_path FROM filesystem_entry
+        WHERE entry_id > ? AND parent_id IS NULL AND (depth IS NULL OR depth > 1)
+        ORDER BY entry_id LIMIT ?
+    """, (despues_de, limite)).fetchall()
+
+def asignar_padres(cursor, filas):
+    # filas: (parent_id, depth, entry_id)
+    cursor.executemany("UPDATE filesystem_entry SET parent_id = ?, depth = ? WHERE entry_id = ?", filas)
+
+def crear_indice_arbol(conn):
+    conn.executescript(SQL_INDICE_ARBOL)
+    conn.commit()
+
+def arbol_disponible(cursor):
+    return cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND name IN ('idx_arbol', 'idx_full_path')"
+    ).fetchone()[0] == 2
+
+def obtener_particiones_arbol(cursor):
+    # Particiones con entradas, saltando de una a la siguiente por idx_arbol sin recorrerlo
+    particiones = []
+    fila = cursor.execute("SELECT MIN(partition_id) FROM filesystem_entry").fetchone()
+    while fila and fila[0] is not None:
+        particiones.append(fila[0])
+        fila = cursor.execute(
+            "SELECT MIN(partition_id) FROM filesystem_entry WHERE partition_id > ?", (fila[0],)
+        ).fetchone()
+    return particiones
+
+def obtener_hijos(cursor, partition_id, parent_id):
+    """
+    Entradas de una carpeta (parent_id None: la raiz de la particion y las entradas cuyo padre no
+    tiene fila), directorios primero: (entry_id, name, type, size, mtime, deleted, full_path, depth).
+    """
+    condicion = "parent_id = ?" if parent_id is not None else "parent_id IS NULL"
+    return cursor.execute(f"""
+        SELECT entry_id, name, type, size, mtime, deleted, full_path, depth FROM filesystem_entry INDEXED BY idx_arbol
+        WHERE partition_id = ? AND {condicion}
+        ORDER BY type != 'dir', name
+    """, (partition_id, *(() if parent_id is None else (parent_id,)))).fetchall()
+
+def resumen_subarbol(cursor, partition_id, full_path):
+    """
+    (entradas, ficheros, bytes) bajo full_path ("" para toda la particion): las rutas del
+    subarbol son el rango [full_path + "/", full_path + "0") de idx_full_path ("0" sigue a "/").
+    """
+    return cursor.execute("""
+        SELECT COUNT(*), COALESCE(SUM(type != 'dir'), 0), COALESCE(SUM(size), 0)
+        FROM filesystem_entry INDEXED BY idx_full_path
+        WHERE partition_id = ? AND full_path >= ? AND full_path < ?
+    """, (partition_id, full_path + "/", full_path + "0")).fetchone()
+
+def obtener_etapa(cursor, etapa):
+    # Devuelve (estado, checkpoint) o None si la etapa no ha empezado
+    return cursor.execute(
+        "SELECT estado, checkpoint FROM ingesta_etapa WHERE etapa = ?", (etapa,)
+    ).fetchone()
+
+def obtener_etapas_sin_completar(cursor):
+    return [fila[0] for fila in cursor.execute(
+        "SELECT etapa FROM ingesta_etapa WHERE estado != 'completada' ORDER BY etapa"
+    ).fetchall()]
+
+def marcar_etapa(cursor, etapa, estado):
+    cursor.execute("""
+    INSERT INTO ingesta_etapa (etapa, estado) VALUES (?, ?)
+    ON CONFLICT(etapa) DO UPDATE SET estado = excluded.estado, actualizado = CURRENT_TIMESTAMP
+    """, (etapa, estado))
+
+def actualizar_checkpoint_etapa(cursor, etapa, checkpoint):
+    cursor.execute("""
+    INSERT INTO ingesta_etapa (etapa, estado, checkpoint) VALUES (?, 'en_curso', ?)
+    ON CONFLICT(etapa) DO UPDATE SET checkpoint = excluded.checkpoint, actualizado = CURRENT_TIMESTAMP
+    """, (etapa, checkpoint))
+
+
+def insertar_stage_metric(cursor, ejecucion, etapa, inicio, duracion_seg, cpu_seg=None,
+                          memoria_pico=None, contadores=None, perfil=None, error=None):
+    cursor.execute("""
+    INSERT INTO stage_metrics (
+        ejecucion, etapa, inicio, duracion_seg, cpu_seg, memoria_pico, contadores, perfil, error
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (ejecucion, etapa, inicio, duracion_seg, cpu_seg, memoria_pico, contadores, perfil, error))
+
+
+def crear_base_de_datos_cola(path_db):
+    # Cola de ingesta por lotes (una base de datos por directorio de casos, no por caso)
+    conn = sqlite3.connect(path_db)
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS ingesta_trabajo (
+        job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        e01_path TEXT NOT NULL UNIQUE,
+        case_name TEXT NOT NULL UNIQUE,
+        estado TEXT NOT NULL DEFAULT 'pendiente', -- 'pendiente', 'en_curso', 'completado', 'incompleto', 'error'
+        intentos INTEGER NOT NULL DEFAULT 0,
+        codigo_salida INTEGER,
+        error TEXT,
+        pid INTEGER,
+        creado DATETIME DEFAULT CURRENT_TIMESTAMP,
+        inicio DATETIME,
+        fin DATETIME
+    );
+    CREATE INDEX IF NOT EXISTS idx_trabajo_estado ON ingesta_trabajo(estado);
+    """)
+    conn.commit()
+    conn.close()
+
+def insertar_trabajo_cola(cursor, e01_path, case_name):
+    # Una imagen ya encolada conserva su trabajo y su estado
+    cursor.execute("""
+    INSERT INTO ingesta_trabajo (e01_path, case_name) VALUES (?, ?)
+    ON CONFLICT(e01_path) DO NOTHING
+    """, (e01_path, case_name))
+    return cursor.rowcount > 0
+
+def obtener_trabajos_cola(cursor, estados=None):
+    sql = "SELECT job_id, e01_path, case_name, estado, intentos, codigo_salida, error, inicio, fin FROM ingesta_trabajo"
+    parametros = ()
+    if estados:
+        sql += f" WHERE estado IN ({','.join('?' for _ in estados)})"
+        parametros = tuple(estados)
+    return cursor.execute(sql + " ORDER BY job_id", parametros).fetchall()
+
+def iniciar_trabajo_cola(cursor, job_id, pid):
+    cursor.execute("""
+    UPDATE ingesta_trabajo SET estado = 'en_curso', intentos = intentos + 1, pid = ?,
+        inicio = CURRENT_TIMESTAMP, fin = NULL, codigo_salida = NULL, error = NULL
+    WHERE job_id = ?
+    """, (pid, job_id))
+
+def terminar_trabajo_cola(cursor, job_id, estado, codigo_salida=None, error=None):
+    cursor.execute("""
+    UPDATE ingesta_trabajo SET estado = ?, codigo_salida = ?, error = ?, pid = NULL, fin = CURRENT_TIMESTAMP
+    WHERE job_id = ?
+    """, (estado, codigo_salida, error, job_id))
+
+def reencolar_trabajos_cola(cursor, estados):
+    cursor.execute(
+        f"UPDATE ingesta_trabajo SET estado = 'pendiente', pid = NULL WHERE estado IN ({','.join('?' for _ in estados)})",
+        tuple(estados)
+    )
+    return cursor.rowcount
+
+
+def crear_base_de_datos_almacen(path_db):
+    # Almacen de hashes compartido entre casos (ver forensic_core.almacen_hashes)
+    conn = sqlite3.connect(path_db, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+    CREATE TABLE IF NOT EXISTS contenido_hash (
+        size INTEGER NOT NULL,
+        huella TEXT NOT NULL, -- sha256 del primer y ultimo bloque del fichero
+        sha256 TEXT NOT NULL,
+        md5 TEXT,
+        vistas INTEGER NOT NULL DEFAULT 1,
+        primera_vez DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (size, huella, sha256)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_contenido_sha256 ON contenido_hash(sha256);
+    """)
+    conn.commit()
+    conn.close()
+
+def buscar_contenido_hash(cursor, size, huella):
+    return cursor.execute(
+        "SELECT sha256, md5 FROM contenido_hash WHERE size = ? AND huella = ? LIMIT 2", (size, huella)
+    ).fetchall()
+
+def registrar_contenidos_hash(cursor, contenidos):
+    # contenidos: [(size, huella, sha256, md5)]
+    cursor.executemany("""
+    INSERT INTO contenido_hash (size, huella, sha256, md5) VALUES (?, ?, ?, ?)
+    ON CONFLICT(size, huella, sha256) DO UPDATE SET vistas = vistas + 1, md5 = COALESCE(md5, excluded.md5)
+    """, contenidos)
@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import os
+import sqlite3
+
+from database.create_database import buscar_contenido_hash, crear_base_de_datos_almacen, registrar_contenidos_hash
+
+
+'''
+Almacen de hashes compartido entre casos, direccionado por contenido: una base de datos SQLite
+junto a los casos (almacen_hashes.db) con (tamaño, huella, sha256, md5) de cada contenido ya
+hasheado. La huella es el sha256 del tamaño, del primer y del ultimo bloque del fichero y de
+muestras repartidas por el centro, para que una edicion a mitad del fichero tambien la cambie.
+
+Al ingestar, los ficheros grandes se buscan primero por (tamaño, huella): leer la huella
+cuesta mucho menos que leer el fichero entero, y los ficheros de sistema de Windows se repiten
+en casi todas las imagenes. En el almacen solo entran hashes calculados leyendo el fichero
+entero, y se reutiliza uno cuando (tamaño, huella) coincide y apunta a un unico sha256; esas
+entradas quedan con origen='almacen' en file_hash. Los ficheros que caben en la huella se
+hashean siempre completos.
+
+Con verificar_almacen (--verificar-almacen) el hash reutilizado es provisional: el fichero se
+encola en hash_pendiente y la pasada en segundo plano lo lee entero y lo sustituye por el
+calculado. Cuesta una lectura completa por fichero, asi que no es el modo por defecto.
+
+Ruta del almacen: el parametro ruta_almacen, la variable FORENSIC_ALMACEN_HASHES o, por
+defecto, <directorio de casos>/almacen_hashes.db. Con "" (o FORENSIC_ALMACEN_HASHES=off) no se
+usa almacen.
+'''
+
+NOMBRE_ALMACEN = "almacen_hashes.db"
+VARIABLE_ALMACEN = "FORENSIC_ALMACEN_HASHES"
+TAMANO_BLOQUE_HUELLA = 64 * 1024
+MUESTRAS_HUELLA = 16
+TAMANO_MUESTRA_HUELLA = 4 * 1024
+# Por debajo de esto la huella cubriria el fichero entero: se hashea completo
+TAMANO_MINIMO_ALMACEN = 2 * TAMANO_BLOQUE_HUELLA
+
+ORIGEN_CALCULADO = "calculado"
+ORIGEN_ALMACEN = "almacen"
+DESCRIPCION_ORIGEN = {
+    ORIGEN_CALCULADO: "calculado sobre el contenido",
+    ORIGEN_ALMACEN: "almacen de hashes compartido (mismo tamaño y huella que un contenido ya calculado)",
+}
+
+
+def resolver_ruta_almacen(ruta_almacen, case_dir):
+    """
+    Ruta del almacen a usar para el caso, o None si esta desactivado.
+    """
+    if ruta_almacen is None:
+        ruta_almacen = os.environ.get(VARIABLE_ALMACEN)
+    if ruta_almacen is None:
+        return os.path.join(os.path.dirname(os.path.abspath(case_dir)), NOMBRE_ALMACEN)
+    if ruta_almacen.strip().lower() in ("", "0", "off", "no"):
+        return None
+    return ruta_almacen
+
+
+def huella_contenido(file_obj, size):
+    huella = hashlib.sha256(str(size).encode())
+    huella.update(file_obj.read_random(0, min(TAMANO_BLOQUE_HUELLA, size)))
+    if size > TAMANO_BLOQUE_HUELLA:
+        inicio_final = max(size - TAMANO_BLOQUE_HUELLA, TAMANO_BLOQUE_HUELLA)
+        # Muestras equiespaciadas entre el primer y el ultimo bloque
+        centro = inicio_final - TAMANO_BLOQUE_HUELLA
+        if centro > 0:
+            for i in range(1, MUESTRAS_HUELLA + 1):
+                desde = TAMANO_BLOQUE_HUELLA + centro * i // (MUESTRAS_HUELLA + 1)
+                huella.update(file_obj.read_random(desde, min(TAMANO_MUESTRA_HUELLA, inicio_final - desde)))
+        huella.update(file_obj.read_random(inicio_final, size - inicio_final))
+    return huella.hexdigest()
+
+
+def describir_origen(origen):
+    """
+    Texto para mostrar junto a un hash de fichero segun su origen en file_hash.
+    """
+    return DESCRIPCION_ORIGEN.get(origen or ORIGEN_CALCULADO, origen)
+
+
+class AlmacenHashes:
+    """
+    Conexion al almacen. En los trabajadores de hash se abre con solo_lectura=True; solo el
+    escritor de la ingesta (o el proceso de hashes diferidos) registra contenidos nuevos.
+    """
+
+    def __init__(self, ruta, solo_lectura=False):
+        self.ruta = ruta
+        if solo_lectura:
+            self.conn = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True, timeout=30, check_same_thread=False)
+        else:
+            crear_base_de_datos_almacen(ruta)
+            self.conn = sqlite3.connect(ruta, timeout=30)
+
+    def buscar(self, size, huella):
+        """
+        {"sha256", "md5"} si la huella corresponde a un unico contenido conocido; si no, None.
+        """
+        try:
+            filas = buscar_contenido_hash(self.conn.cursor(), size, huella)
+        except sqlite3.Error:
+            return None
+        if len(filas) != 1:
+            return None
+        sha256, md5 = filas[0]
+        return {"sha256": sha256, "md5": md5}
+
+    def registrar(self, contenidos):
+        # El almacen es una cache: si esta bloqueado o falla, la ingesta sigue igual
+        try:
+            registrar_contenidos_hash(self.conn.cursor(), contenidos)
+            self.conn.commit()
+        except sqlite3.Error:
+            logging.exception("No se pudieron registrar contenidos en el almacen de hashes")
+            self.conn.rollback()
+
+    def cerrar(self):
+        self.conn.close()
+
+
+def abrir_almacen(ruta, solo_lectura=False):
+    """
+    AlmacenHashes en ruta, o None si no hay ruta o no se puede abrir.
+    """
+    if not ruta:
+        return None
+    try:
+        return AlmacenHashes(ruta, solo_lectura)
+    except sqlite3.Error:
+        logging.exception(f"No se pudo abrir el almacen de hashes {ruta}")
+        return None
@@ -0,0 +1,57 @@
+import sqlite3
+
+from database.create_database import TAMANO_LOTE_ESCRITURA, aplicar_pragmas_ingesta, asegurar_columnas_arbol, asignar_padres, crear_indice_arbol, obtener_directorios, obtener_entradas_sin_padre, restaurar_pragmas_ingesta
+
+
+'''
+Arbol de directorios del caso. filesystem_entry solo guarda full_path: para listar una carpeta
+o sumar lo que cuelga de ella habia que recorrer las rutas con LIKE. EscritorIngesta guarda en
+cada entrada parent_id (entry_id de su directorio) y depth al insertarla; tras el recorrido
+construir_arbol solo completa las que llegaron antes que su directorio, y el indice idx_arbol
+(partition_id, parent_id, name) deja los hijos de cualquier carpeta en un tramo contiguo: abrir
+un directorio cuesta lo que tenga dentro, no lo que tenga la imagen.
+
+Para el subarbol completo no hace falta tabla de cierre: full_path ya es la ruta materializada
+y todo lo que cuelga de /a/b esta en el rango ["/a/b/", "/a/b0"). idx_full_path recorre ese
+rango, asi que contar y sumar un subarbol solo lee sus propias filas (ver resumen_subarbol).
+
+El padre se busca por ruta entre las filas de tipo 'dir' de la misma particion. Las entradas de
+la raiz, y las que cuelgan de un directorio sin fila (p.ej. /$OrphanFiles en el recorrido por
+MFT), quedan con parent_id NULL y se listan en la raiz.
+'''
+
+
+def construir_arbol(db_path):
+    """
+    Completa parent_id y depth de las entradas que se insertaron sin ellos (antes que su
+    directorio, o en casos antiguos) y crea idx_arbol. Se puede repetir. Devuelve cuantas
+    entradas ha completado con padre.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        asegurar_columnas_arbol(conn)
+        aplicar_pragmas_ingesta(conn)
+        cursor = conn.cursor()
+        directorios = {}
+        for entry_id, partition_id, full_path, _ in obtener_directorios(cursor):
+            directorios.setdefault((partition_id, full_path), entry_id)
+
+        con_padre = 0
+        ultimo = 0
+        while True:
+            filas = obtener_entradas_sin_padre(cursor, ultimo, TAMANO_LOTE_ESCRITURA)
+            if not filas:
+                break
+            padres = []
+            for entry_id, partition_id, full_path in filas:
+                parent_id = directorios.get((partition_id, full_path.rpartition("/")[0]))
+                con_padre += parent_id is not None
+                padres.append((parent_id, full_path.count("/"), entry_id))
+            asignar_padres(cursor, padres)
+            ultimo = filas[-1][0]
+        crear_indice_arbol(conn)
+        restaurar_pragmas_ingesta(conn)
+        conn.commit()
+        return con_padre
+    finally:
+        conn.close()
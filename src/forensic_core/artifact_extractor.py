@@ -4,6 +4,8 @@ import pytsk3
 import os
 from pathlib import Path
 import sqlite3
+from database.create_database import asegurar_columna_known
+from forensic_core.etapas import ejecutar_etapa
 from forensic_core.artifacts.deleted_files.extract_info_deleted_files import escanear_y_procesar_archivos_borrados
 from forensic_core.artifacts.registry.sam_hive import extraer_sam
 from forensic_core.artifacts.registry.software_hive import extraer_software
@@ -38,32 +40,33 @@ def analizar_hives(archivo, db_path):
 
 def extraer_artefactos(db_path, caso_dir):
     from forensic_core.artifacts.registry.registry_analyzer import exportar_hives_sistema, exportar_hives_usuario
-    exportar_hives_sistema(db_path, caso_dir)
-    exportar_hives_usuario(db_path, caso_dir)
+    # Cada extractor es una etapa de la ingesta: al reanudar solo se repiten las no completadas
+    ejecutar_etapa(db_path, "hives_sistema", exportar_hives_sistema, db_path, caso_dir)
+    ejecutar_etapa(db_path, "hives_usuario", exportar_hives_usuario, db_path, caso_dir)
     dir_temp = os.path.join(caso_dir, BASE_DIR_EXPORT_TEMP)
     dir_exportar = os.path.join(caso_dir, BASE_DIR_EXPORT)
     archivos = obtener_archivos_en_directorio(dir_temp)
     
     sysfile = os.path.join(dir_temp, "SYSTEM")
-    extraer_system(db_path, sysfile)
+    ejecutar_etapa(db_path, "system", extraer_system, db_path, sysfile)
     samfile = os.path.join(dir_temp, "SAM")
-    extraer_sam(sam_hive_path = samfile, system_hive_path = sysfile, db_path = db_path)
+    ejecutar_etapa(db_path, "sam", extraer_sam, db_path, samfile, sysfile)
     if not archivos:
         return
     for archivo in archivos:
-        analizar_hives(archivo, db_path)
+        ejecutar_etapa(db_path, f"hive_{os.path.basename(archivo)}", analizar_hives, archivo, db_path)
     
     # archivos que pueden tener informacion de usuario
-    exportar_archivos_interesantes(db_path, caso_dir)
-    exportar_historial_firefox(db_path=db_path, caso_dir=caso_dir)
+    ejecutar_etapa(db_path, "archivos_interesantes", exportar_archivos_interesantes, db_path, caso_dir)
+    ejecutar_etapa(db_path, "historial_firefox", exportar_historial_firefox, db_path, caso_dir)
 
 
 def exportar_file(ewf_path, partition_offset, path, dir_interesantes):
-    from forensic_core.e01_reader import open_e01_image
     from forensic_core.export_eml import export_eml
+    from forensic_core.lector_contenido import copiar_contenido
+    from forensic_core.sesiones_imagen import obtener_sistema_archivos
 
-    img = open_e01_image(ewf_path)
-    fs = pytsk3.FS_Info(img, offset=partition_offset)
+    img, fs = obtener_sistema_archivos(ewf_path, partition_offset)
     file_entry = fs.open(path)
 
     nombre = file_entry.info.name.name.decode("utf-8", errors="ignore")
@@ -82,7 +85,9 @@ def exportar_file(ewf_path, partition_offset, path, dir_interesantes):
                    file_entry=file_entry,
                    size=size,
                    offset=offset,
-                   chunk_size=chunk_size)
+                   chunk_size=chunk_size,
+                   img=img,
+                   fs_info=fs)
         return
 
     # Resto: idempotencia por fichero plano
@@ -91,13 +96,7 @@ def exportar_file(ewf_path, partition_offset, path, dir_interesantes):
         return
 
     with open(output_path, "wb") as f:
-        cur = offset
-        while cur < size:
-            data = file_entry.read_random(cur, min(chunk_size, size - cur))
-            if not data:
-                break
-            f.write(data)
-            cur += len(data)
+        copiar_contenido(file_entry, size, f, img, fs)
 
 
 
@@ -106,12 +105,15 @@ def exportar_archivos_interesantes(db_path, caso_dir):
     os.makedirs(dir_interesantes, exist_ok=True)
 
     conn = sqlite3.connect(db_path)
+    asegurar_columna_known(conn)
     cur = conn.cursor()
 
+    # Los ficheros conocidos (known=1, ver ficheros_conocidos) no se exportan
     cur.execute("""
         SELECT entry_id, partition_id, full_path, LOWER(extension) AS ext
         FROM filesystem_entry
         WHERE ext IN ('.pdf', '.doc', '.txt', '.snt', '.pst', '.ost', '.zip', '.rar', '.7z', '.eml')
+          AND known = 0
         ORDER BY entry_id
     """)
     results = cur.fetchall()
@@ -1,6 +1,5 @@
 from Registry import Registry
 import os
-import pytsk3
 from curses_ui.awesome_layout import AwesomeLayout
 from curses_ui.awesome_menu2 import AwesomeMenu
 from curses_ui.registry_viewer import RegistryViewerPanel
@@ -9,7 +8,8 @@ from forensic_core.artifacts.registry.software_hive import extraer_software
 from forensic_core.artifacts.registry.system_hive import extraer_system
 from forensic_core.artifacts.registry.usernt_data_hive import extraer_ntuser_artefactos, visualizar_resumen_usuarios
 from forensic_core.artifacts.registry.usrclass_shellbags_hive import extraer_usrclass
-from forensic_core.e01_reader import open_e01_image
+from forensic_core.sesiones_imagen import obtener_sistema_archivos
+from forensic_core.lector_contenido import copiar_contenido
 import sqlite3
 from pathlib import Path
 
@@ -101,14 +101,11 @@ def generar_nombre_export_ntuser(ruta_completa):
         return partes[-1].upper()
 
 def exportar_reg_usuario(caso_dir, ewf_path, partition_offset, paths):
-    img = open_e01_image(ewf_path)
-    fs = pytsk3.FS_Info(img, offset=partition_offset)
+    img, fs = obtener_sistema_archivos(ewf_path, partition_offset)
 
     for path in paths:
         file_entry = fs.open(path)
         size = file_entry.info.meta.size
-        offset = 0
-        chunk_size = 1024 * 1024  # 1 MB
         output_path = os.path.join(
             caso_dir,
             BASE_DIR_EXPORT_TEMP,
@@ -118,24 +115,16 @@ def exportar_reg_usuario(caso_dir, ewf_path, partition_offset, paths):
         if os.path.exists(output_path):
             continue
         with open(output_path, "wb") as f:
-            while offset < size:
-                data = file_entry.read_random(offset, min(chunk_size, size - offset))
-                if not data:
-                    break
-                f.write(data)
-                offset += len(data)
+            copiar_contenido(file_entry, size, f, img, fs)
 
 
 
 def exportar_registro(caso_dir, ewf_path, partition_offset, path):
 
-    img = open_e01_image(ewf_path)
-    fs = pytsk3.FS_Info(img, offset=partition_offset)
+    img, fs = obtener_sistema_archivos(ewf_path, partition_offset)
     file_entry = fs.open(path)
 
     size = file_entry.info.meta.size
-    offset = 0
-    chunk_size = 1024 * 1024  # 1 MB
 
     output_path = os.path.join(
         caso_dir,
@@ -147,12 +136,7 @@ def exportar_registro(caso_dir, ewf_path, partition_offset, path):
     if os.path.exists(output_path):
         return
     with open(output_path, "wb") as f:
-        while offset < size:
-            data = file_entry.read_random(offset, min(chunk_size, size - offset))
-            if not data:
-                break
-            f.write(data)
-            offset += len(data)
+        copiar_contenido(file_entry, size, f, img, fs)
 
 
 def obtener_archivos_en_directorio(path):
@@ -0,0 +1,558 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from database.create_database import LONGITUD_MINIMA_TRIGRAM, contar_entradas, indice_rutas_disponible, obtener_pagina_entradas
+
+
+'''
+Resultados de busqueda en filesystem_entry leidos por paginas.
+
+Una busqueda amplia ("dll" en una imagen de Windows) puede devolver cientos de miles de filas:
+en lugar de fetchall() los resultados se piden de TAMANO_PAGINA en TAMANO_PAGINA a medida que
+el menu los necesita, con paginacion por keyset (entry_id > ultimo visto, ver
+obtener_pagina_entradas), y solo se conservan en memoria las ultimas PAGINAS_EN_MEMORIA. De
+cada pagina visitada se guarda el entry_id donde empieza, asi volver atras no recorre de nuevo
+las anteriores. El total se cuenta aparte, en un hilo con su propia conexion, y el menu lo
+muestra cuando esta disponible.
+
+La busqueda admite un pequeño lenguaje de filtros (compilar_consulta), traducido a SQL con
+parametros. Los terminos se separan por espacios y se combinan con AND:
+
+    factura "mis documentos"        la ruta contiene el texto (indice trigram)
+    path:texto                      igual que un termino suelto
+    name:factura*                   nombre con comodines * y ?, o que contiene el texto
+    ext:.pdf  ext:doc,docx          extension (indice idx_extension)
+    size>1M  size<=10K  size:1M..2G tamaño en bytes, con sufijos K, M, G, T (idx_size)
+    mtime:2023-01..2023-03          fechas: año, año-mes o dia; rangos a..b, abiertos (a.., ..b)
+    crtime>=2022  atime<2023-06-01  o comparaciones; tambien ctime (idx_mtime, idx_crtime)
+    user:jimmy                      bajo el perfil del usuario (Users o Documents and Settings)
+    deleted:yes  orphan:no          borrados / huerfanos
+    known:yes|no|all                ficheros conocidos (por defecto se ocultan)
+    type:file|dir|all               por defecto solo ficheros
+    hash:3a7bd3e2...                prefijo del SHA-256 o MD5 completo (indices de file_hash)
+    sort:-size  sort:mtime          orden (size, mtime, atime, ctime, crtime, name; - descendente)
+    limit:100                       como mucho N resultados
+
+Solo las comillas dobles agrupan; ' y \ son texto normal. Un termino entre comillas, o cuyo
+prefijo no es un filtro conocido (C:\Windows, a=b), se busca tal cual en la ruta.
+
+Los terminos de texto se resuelven con el indice FTS5 y el resto son condiciones sobre columnas
+indexadas. Al compilar se cuenta, con tope, cuantas filas deja cada predicado indexado y el mas
+selectivo conduce la consulta (ver _Compilador.planificar). El orden y el LIMIT de cada pagina
+se ejecutan en SQLite.
+
+BuscadorIncremental ejecuta las busquedas mientras se escribe: cada pulsacion cancela la
+consulta en curso (el progress handler de sqlite3 la aborta en cuanto cambia la generacion) y
+solo se devuelve el resultado de la ultima, con sus primeras filas.
+'''
+
+TAMANO_PAGINA = 200
+PAGINAS_EN_MEMORIA = 8
+
+
+class ResultadosBusqueda:
+    """
+    Secuencia perezosa de filas de filesystem_entry que cumplen filtro (ver compilar_consulta).
+    len() son las filas ya descubiertas; asegurar(n) pide paginas hasta conocer n filas o el
+    final. total es None mientras se cuenta; ocultos cuenta las filas de filtro_ocultos.
+    """
+
+    def __init__(self, db_path, filtro, filtro_ocultos=None, orden=None, limite=None,
+                 tamano_pagina=TAMANO_PAGINA, paginas_en_memoria=PAGINAS_EN_MEMORIA):
+        self.db_path = db_path
+        self.filtro = filtro
+        self.orden = orden
+        self.limite = limite
+        self.tamano_pagina = tamano_pagina
+        self.paginas_en_memoria = paginas_en_memoria
+        self.conn = sqlite3.connect(db_path)
+        self._inicios = [None]  # clave (entry_id o (valor, entry_id)) tras la que empieza cada pagina
+        self._paginas = OrderedDict()
+        self._descubiertas = 0
+        self._completo = False
+        self.total = None
+        self.ocultos = None
+        self._contador = threading.Thread(target=self._contar, args=(filtro_ocultos,),
+                                          name="contar-resultados", daemon=True)
+        self._contador.start()
+
+    def _contar(self, filtro_ocultos):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            total = contar_entradas(cursor, self.filtro)
+            self.total = min(total, self.limite) if self.limite is not None else total
+            if filtro_ocultos:
+                self.ocultos = contar_entradas(cursor, filtro_ocultos)
+        except sqlite3.Error:
+            logging.exception("No se pudo contar los resultados de la busqueda")
+        finally:
+            conn.close()
+
+    def _pagina(self, numero):
+        if numero in self._paginas:
+            self._paginas.move_to_end(numero)
+            return self._paginas[numero]
+        tamano = self.tamano_pagina
+        if self.limite is not None:
+            tamano = max(0, min(tamano, self.limite - numero * self.tamano_pagina))
+        filas = obtener_pagina_entradas(self.conn.cursor(), self.filtro, self._inicios[numero], tamano, self.orden)
+        if numero == len(self._inicios) - 1:
+            # Primera vez que se lee: queda fijado donde empieza la siguiente
+            self._descubiertas += len(filas)
+            if len(filas) < self.tamano_pagina:
+                self._completo = True
+            else:
+                ultima = filas[-1]
+                self._inicios.append((ultima[-1], ultima[0]) if self.orden else ultima[0])
+        self._paginas[numero] = filas
+        if len(self._paginas) > self.paginas_en_memoria:
+            self._paginas.popitem(last=False)
+        return filas
+
+    def asegurar(self, n):
+        """
+        Lee paginas nuevas hasta conocer al menos n filas o llegar al final.
+        """
+        while self._descubiertas < n and not self._completo:
+            self._pagina(len(self._inicios) - 1)
+
+    @property
+    def contando(self):
+        return self._contador.is_alive()
+
+    @property
+    def completo(self):
+        return self._completo
+
+    def __len__(self):
+        return self._descubiertas
+
+    def __getitem__(self, indice):
+        if indice < 0:
+            raise IndexError(indice)
+        self.asegurar(indice + 1)
+        if indice >= self._descubiertas:
+            raise IndexError(indice)
+        return self._pagina(indice // self.tamano_pagina)[indice % self.tamano_pagina]
+
+    def vista(self, formatear):
+        return VistaResultados(self, formatear)
+
+    def cerrar(self):
+        self.conn.close()
+
+
+class VistaResultados:
+    """
+    Las filas de unos ResultadosBusqueda pasadas por formatear(fila), p.ej. el texto de cada
+    opcion del menu. Se formatean al pedirlas, no se guardan.
+    """
+
+    def __init__(self, resultados, formatear):
+        self.resultados = resultados
+        self.formatear = formatear
+
+    def asegurar(self, n):
+        self.resultados.asegurar(n)
+
+    def __len__(self):
+        return len(self.resultados)
+
+    def __getitem__(self, indice):
+        return self.formatear(self.resultados[indice])
+
+
+# Lenguaje de filtros (ver el bloque del principio)
+
+UNIDADES_TAMANO = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024 ** 2, "MB": 1024 ** 2,
+                   "G": 1024 ** 3, "GB": 1024 ** 3, "T": 1024 ** 4, "TB": 1024 ** 4}
+COLUMNAS_FECHA = ("mtime", "atime", "ctime", "crtime")
+COLUMNAS_ORDEN = ("size", "name", *COLUMNAS_FECHA)
+CARPETAS_PERFIL = ("/users/", "/documents and settings/")
+# Indices secundarios de filesystem_entry que pueden conducir una busqueda
+INDICES_COLUMNA = {"size": "idx_size", "mtime": "idx_mtime", "crtime": "idx_crtime", "extension": "idx_extension"}
+# Por debajo de tantas filas un predicado se considera selectivo (ver _Compilador.planificar)
+UMBRAL_SELECTIVO = 5000
+VALORES_SI = ("yes", "si", "sí", "1", "true")
+VALORES_NO = ("no", "0", "false")
+
+_TERMINO = re.compile(r"^([a-z]+)(:|>=|<=|>|<|=)(.*)$", re.IGNORECASE)
+# Palabras separadas por espacios; lo que va entre comillas dobles queda en la misma palabra
+_PALABRA = re.compile(r'(?:[^\s"]+|"[^"]*"?)+')
+CLAVES_FILTRO = ("path", "name", "ext", "size", *COLUMNAS_FECHA, "user", "deleted", "orphan", "known", "type",
+                 "hash", "sort", "limit")
+_TAMANO = re.compile(r"^(\d+(?:\.\d+)?)\s*([KMGT]?B?)$", re.IGNORECASE)
+
+
+class Consulta:
+    """
+    Consulta compilada: filtro (match, condicion, parametros, indice) para ResultadosBusqueda, el filtro
+    de los ficheros conocidos que quedan ocultos (o None), el orden y el limite.
+    """
+
+    def __init__(self, filtro, filtro_ocultos=None, orden=None, limite=None):
+        self.filtro = filtro
+        self.filtro_ocultos = filtro_ocultos
+        self.orden = orden
+        self.limite = limite
+
+    def resultados(self, db_path, **opciones):
+        return ResultadosBusqueda(db_path, self.filtro, self.filtro_ocultos, self.orden, self.limite, **opciones)
+
+
+def _frase_fts(columna, texto):
+    return f'{columna} : "{texto.replace(chr(34), chr(34) * 2)}"'
+
+
+def _patron_like(texto):
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _tamano(valor):
+    encontrado = _TAMANO.match(valor.strip())
+    if not encontrado:
+        raise ValueError(f"Tamaño no valido: {valor} (p.ej. 100, 10K, 1.5M, 2G)")
+    return int(float(encontrado.group(1)) * UNIDADES_TAMANO[encontrado.group(2).upper()])
+
+
+def _periodo(valor):
+    """
+    (inicio, fin) como texto comparable con las fechas guardadas; fin es exclusivo.
+    """
+    valor = valor.strip()
+    try:
+        if re.fullmatch(r"\d{4}", valor):
+            return f"{valor}-01-01", f"{int(valor) + 1:04d}-01-01"
+        if re.fullmatch(r"\d{4}-\d{1,2}", valor):
+            anio, mes = map(int, valor.split("-"))
+            siguiente = date(anio + mes // 12, mes % 12 + 1, 1)
+            return date(anio, mes, 1).isoformat(), siguiente.isoformat()
+        if re.fullmatch(r"\d{4}-\d{1,2}-\d{1,2}", valor):
+            dia = date(*map(int, valor.split("-")))
+            return dia.isoformat(), (dia + timedelta(days=1)).isoformat()
+        instante = datetime.fromisoformat(valor.replace("T", " "))
+        return instante.strftime("%Y-%m-%d %H:%M:%S"), (instante + timedelta(seconds=1)).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise ValueError(f"Fecha no valida: {valor} (p.ej. 2023, 2023-01, 2023-01-15)") from None
+
+
+def _si_no(clave, valor):
+    valor = valor.strip().lower()
+    if valor in VALORES_SI:
+        return 1
+    if valor in VALORES_NO:
+        return 0
+    raise ValueError(f"{clave}: usa yes o no")
+
+
+def _contar_hasta(cursor, sql, parametros, tope=UMBRAL_SELECTIVO):
+    return cursor.execute(f"SELECT COUNT(*) FROM ({sql} LIMIT ?)", [*parametros, tope]).fetchone()[0]
+
+
+class _Compilador:
+    def __init__(self, con_trigram):
+        self.con_trigram = con_trigram
+        self.match = []
+        self.condiciones = []
+        self.parametros = []
+        self.tipo = "file"
+        self.known = "no"
+        self.orden = None
+        self.limite = None
+        self.indexables = {}   # indice -> [(condicion, parametros)] que puede resolver
+        self.indice = None
+
+    def condicion(self, sql, *parametros, columna=None):
+        self.condiciones.append(sql)
+        self.parametros.extend(parametros)
+        if columna in INDICES_COLUMNA:
+            self.indexables.setdefault(INDICES_COLUMNA[columna], []).append((sql, parametros))
+
+    def contiene(self, columna, texto):
+        # Subcadena: por el indice trigram si se puede, si no LIKE
+        if self.con_trigram and len(texto) >= LONGITUD_MINIMA_TRIGRAM:
+            self.match.append(_frase_fts(columna, texto))
+        else:
+            self.condicion(f"e.{columna} LIKE ? ESCAPE '\\'", f"%{_patron_like(texto)}%")
+
+    def nombre(self, patron):
+        if "*" not in patron and "?" not in patron:
+            self.contiene("name", patron)
+            return
+        # El trozo literal mas largo acota por el indice; el LIKE comprueba el patron completo
+        literal = max(re.split(r"[*?]", patron), key=len)
+        if self.con_trigram and len(literal) >= LONGITUD_MINIMA_TRIGRAM:
+            self.match.append(_frase_fts("name", literal))
+        like = _patron_like(patron).replace("*", "%").replace("?", "_")
+        self.condicion("e.name LIKE ? ESCAPE '\\'", like)
+
+    def usuario(self, nombre):
+        rutas = [f"{carpeta}{nombre.lower()}/" for carpeta in CARPETAS_PERFIL]
+        if self.con_trigram:
+            self.match.append("(" + " OR ".join(_frase_fts("full_path", ruta) for ruta in rutas) + ")")
+        else:
+            self.condicion("(" + " OR ".join("e.full_path LIKE ? ESCAPE '\\'" for _ in rutas) + ")",
+                           *(f"%{_patron_like(ruta)}%" for ruta in rutas))
+
+    def extension(self, valor):
+        extensiones = [ext if ext.startswith(".") else f".{ext}" for ext in valor.lower().split(",") if ext]
+        if not extensiones:
+            raise ValueError("ext: indica al menos una extension")
+        self.condicion(f"e.extension IN ({', '.join('?' * len(extensiones))})", *extensiones, columna="extension")
+
+    def tamano(self, operador, valor):
+        if ".." in valor:
+            inicio, fin = valor.split("..", 1)
+            if inicio:
+                self.condicion("e.size >= ?", _tamano(inicio), columna="size")
+            if fin:
+                self.condicion("e.size <= ?", _tamano(fin), columna="size")
+            return
+        self.condicion(f"e.size {'=' if operador == ':' else operador} ?", _tamano(valor), columna="size")
+
+    def fecha(self, columna, operador, valor):
+        if ".." in valor:
+            inicio, fin = valor.split("..", 1)
+            if inicio:
+                self.condicion(f"e.{columna} >= ?", _periodo(inicio)[0], columna=columna)
+            if fin:
+                self.condicion(f"e.{columna} < ?", _periodo(fin)[1], columna=columna)
+            return
+        inicio, fin = _periodo(valor)
+        if operador in (":", "="):
+            self.condicion(f"e.{columna} >= ? AND e.{columna} < ?", inicio, fin, columna=columna)
+        elif operador == ">":
+            self.condicion(f"e.{columna} >= ?", fin, columna=columna)
+        elif operador == ">=":
+            self.condicion(f"e.{columna} >= ?", inicio, columna=columna)
+        elif operador == "<":
+            self.condicion(f"e.{columna} < ?", inicio, columna=columna)
+        else:
+            self.condicion(f"e.{columna} < ?", fin, columna=columna)
+
+    def hash(self, valor):
+        valor = valor.strip().lower()
+        if len(valor) < 4 or not re.fullmatch(r"[0-9a-f]+", valor):
+            raise ValueError("hash: indica al menos 4 digitos hexadecimales")
+        # Prefijo como rango: usa el indice de sha256 (BETWEEN sobre texto)
+        siguiente = valor[:-1] + chr(ord(valor[-1]) + 1)
+        if len(valor) == 32:
+            self.condicion("e.entry_id IN (SELECT entry_id FROM file_hash WHERE md5 = ? "
+                           "OR (sha256 >= ? AND sha256 < ?))", valor, valor, siguiente)
+        else:
+            self.condicion("e.entry_id IN (SELECT entry_id FROM file_hash WHERE sha256 >= ? AND sha256 < ?)",
+                           valor, siguiente)
+
+    def termino(self, termino):
+        encontrado = _TERMINO.match(termino)
+        if not encontrado or encontrado.group(1).lower() not in CLAVES_FILTRO:
+            self.contiene("full_path", termino)
+            return
+        clave, operador, valor = encontrado.group(1).lower(), encontrado.group(2), encontrado.group(3)
+        if not valor:
+            raise ValueError(f"{clave}: falta el valor")
+        if operador != ":" and clave != "size" and clave not in COLUMNAS_FECHA:
+            raise ValueError(f"{clave} no admite {operador}")
+        if clave == "path":
+            self.contiene("full_path", valor)
+        elif clave == "name":
+            self.nombre(valor)
+        elif clave == "ext":
+            self.extension(valor)
+        elif clave == "size":
+            self.tamano(operador, valor)
+        elif clave in COLUMNAS_FECHA:
+            self.fecha(clave, operador, valor)
+        elif clave == "user":
+            self.usuario(valor)
+        elif clave in ("deleted", "orphan"):
+            self.condicion(f"e.{clave} = ?", _si_no(clave, valor))
+        elif clave == "known":
+            if valor.lower() not in ("yes", "no", "all"):
+                raise ValueError("known: usa yes, no o all")
+            self.known = valor.lower()
+        elif clave == "type":
+            if valor.lower() not in ("file", "dir", "all"):
+                raise ValueError("type: usa file, dir o all")
+            self.tipo = valor.lower()
+        elif clave == "hash":
+            self.hash(valor)
+        elif clave == "sort":
+            columna = valor.lstrip("-").lower()
+            if columna not in COLUMNAS_ORDEN:
+                raise ValueError(f"sort: usa {', '.join(COLUMNAS_ORDEN)}")
+            self.orden = (columna, valor.startswith("-"))
+        elif clave == "limit":
+            if not valor.isdigit() or int(valor) == 0:
+                raise ValueError("limit: indica un numero positivo")
+            self.limite = int(valor)
+
+    def planificar(self, cursor):
+        """
+        Elige que conduce la consulta, contando como mucho UMBRAL_SELECTIVO filas por predicado:
+        el indice FTS5 si el texto es selectivo, si no el indice de columna mas selectivo, si no
+        el indice de la columna de orden (las paginas salen en orden sin ordenar), y si no hay
+        nada de eso FTS5 o el rowid. Las estadisticas de ANALYZE no estiman bien los rangos de
+        fechas y tamaños, y sin esto SQLite prefiere recorrer por rowid para evitar ordenar.
+        """
+        match = " AND ".join(self.match)
+        coincidencias = None
+        if match:
+            coincidencias = _contar_hasta(
+                cursor, "SELECT 1 FROM filesystem_entry_fts WHERE filesystem_entry_fts MATCH ?", [match]
+            )
+            if coincidencias < UMBRAL_SELECTIVO:
+                return
+        # Casos ingestados antes de añadir algun indice: solo se usan los que existen
+        existentes = {fila[0] for fila in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        candidatos = []
+        for indice, condiciones in self.indexables.items():
+            if indice not in existentes:
+                continue
+            sql = " AND ".join(condicion for condicion, _ in condiciones)
+            parametros = [parametro for _, valores in condiciones for parametro in valores]
+            filas = _contar_hasta(cursor, f"SELECT 1 FROM filesystem_entry e INDEXED BY {indice} WHERE {sql}", parametros)
+            candidatos.append((filas, indice))
+        if candidatos and min(candidatos)[0] < UMBRAL_SELECTIVO:
+            self.indice = min(candidatos)[1]
+        elif self.orden and INDICES_COLUMNA.get(self.orden[0]) in existentes:
+            self.indice = INDICES_COLUMNA[self.orden[0]]
+
+    def filtro(self, known):
+        condiciones = list(self.condiciones)
+        parametros = list(self.parametros)
+        if self.tipo == "file":
+            condiciones.insert(0, "e.type != 'dir'")
+        elif self.tipo == "dir":
+            condiciones.insert(0, "e.type = 'dir'")
+        if known is not None:
+            condiciones.append("e.known = ?")
+            parametros.append(known)
+        if self.orden:
+            # El keyset por (valor, entry_id) no admite NULL en la columna de orden
+            condiciones.append(f"e.{self.orden[0]} IS NOT NULL")
+        return " AND ".join(self.match) or None, " AND ".join(condiciones) or "1", parametros, self.indice
+
+
+def compilar_consulta(cursor, texto):
+    """
+    Traduce el texto de busqueda a una Consulta. Lanza ValueError si algun termino no es valido.
+    """
+    terminos = [palabra for palabra in _PALABRA.findall(texto) if palabra.replace('"', "")]
+    if not terminos:
+        raise ValueError("Busqueda vacia")
+
+    compilador = _Compilador(indice_rutas_disponible(cursor))
+    for termino in terminos:
+        if termino.startswith('"'):
+            # Entre comillas es texto literal aunque parezca un filtro
+            compilador.contiene("full_path", termino.replace('"', ""))
+        else:
+            compilador.termino(termino.replace('"', ""))
+    compilador.planificar(cursor)
+
+    if compilador.known == "no":
+        return Consulta(compilador.filtro(0), compilador.filtro(1), compilador.orden, compilador.limite)
+    known = 1 if compilador.known == "yes" else None
+    return Consulta(compilador.filtro(known), None, compilador.orden, compilador.limite)
+
+
+PRIMEROS_RESULTADOS = 50
+# Instrucciones de la VM de SQLite entre comprobaciones de cancelacion
+PASOS_PROGRESO = 2000
+
+
+class BuscadorIncremental:
+    """
+    Hilo con su propia conexion que compila y ejecuta la ultima busqueda pedida con buscar(texto)
+    y guarda sus primeras filas. Una busqueda nueva (o cancelar()) aborta la que este en curso.
+    resultado() devuelve el de la ultima busqueda cuando termina, una sola vez:
+    {"texto", "filas", "error", "segundos"}.
+    """
+
+    def __init__(self, db_path, primeros=PRIMEROS_RESULTADOS):
+        self.db_path = db_path
+        self.primeros = primeros
+        self._condicion = threading.Condition()
+        self._generacion = 0
+        self._en_curso = None
+        self._pedido = None
+        self._resultado = None
+        self._cerrado = False
+        self._hilo = threading.Thread(target=self._bucle, name="busqueda-incremental", daemon=True)
+        self._hilo.start()
+
+    def buscar(self, texto):
+        with self._condicion:
+            self._generacion += 1
+            self._pedido = (self._generacion, texto)
+            self._resultado = None
+            self._condicion.notify()
+
+    def cancelar(self):
+        with self._condicion:
+            self._generacion += 1
+            self._pedido = None
+            self._resultado = None
+
+    def resultado(self):
+        with self._condicion:
+            resultado, self._resultado = self._resultado, None
+        return resultado
+
+    @property
+    def ocupado(self):
+        return self._pedido is not None or self._en_curso == self._generacion
+
+    def _cancelada(self):
+        # Progress handler: un valor distinto de cero aborta la consulta (OperationalError)
+        return self._en_curso != self._generacion
+
+    def _bucle(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.set_progress_handler(self._cancelada, PASOS_PROGRESO)
+        cursor = conn.cursor()
+        try:
+            while True:
+                with self._condicion:
+                    while self._pedido is None and not self._cerrado:
+                        self._condicion.wait()
+                    if self._cerrado:
+                        return
+                    generacion, texto = self._pedido
+                    self._pedido = None
+                    self._en_curso = generacion
+
+                inicio = time.perf_counter()
+                filas, error = [], None
+                try:
+                    consulta = compilar_consulta(cursor, texto)
+                    filas = obtener_pagina_entradas(cursor, consulta.filtro, None,
+                                                    min(self.primeros, consulta.limite or self.primeros), consulta.orden)
+                except ValueError as e:
+                    error = str(e)
+                except sqlite3.OperationalError as e:
+                    if self._cancelada():
+                        continue
+                    error = str(e)
+
+                with self._condicion:
+                    if generacion == self._generacion:
+                        self._resultado = {"texto": texto, "filas": filas, "error": error,
+                                           "segundos": time.perf_counter() - inicio}
+                    self._en_curso = None
+        finally:
+            conn.close()
+
+    def cerrar(self):
+        with self._condicion:
+            self._cerrado = True
+            self._generacion += 1
+            self._condicion.notify()
+        self._hilo.join()
@@ -0,0 +1,331 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+
+from database.create_database import crear_base_de_datos
+from forensic_core.progreso import ProgresoIngesta, formatear_bytes, formatear_tiempo
+from utils.create_and_load_cases import CASES_DIR, crear_directorio_caso
+
+
+'''
+Ingesta sin interfaz curses, para servidores sin TTY, colas de trabajos y benchmarks:
+
+    cd src && python -m forensic_core ingest /ruta/imagen.E01 --case caso1 --workers 8
+
+`ingest` crea el caso (o lo reanuda si una ingesta anterior quedo a medias), imprime el
+progreso por stdout y termina con un codigo de salida:
+    0    ingesta completa
+    1    error durante la ingesta
+    2    argumentos invalidos, imagen inexistente o caso de otra imagen
+    3    ingesta terminada con etapas fallidas (se reintentan lanzando el mismo comando)
+    4    el caso ya existe y su ingesta esta completa (no se ha hecho nada)
+    130  interrumpida con Ctrl+C (se reanuda lanzando el mismo comando)
+
+`known` construye el conjunto de ficheros conocidos (ver ficheros_conocidos) a partir de
+listas de hashes o CSV del NSRL:
+
+    cd src && python -m forensic_core known NSRLFile.txt --marcar-casos
+'''
+
+SALIDA_OK = 0
+SALIDA_ERROR = 1
+SALIDA_USO = 2
+SALIDA_INCOMPLETA = 3
+SALIDA_YA_COMPLETO = 4
+SALIDA_INTERRUMPIDA = 130
+
+INTERVALO_IMPRESION = 2.0
+
+
+class CasoCompletoError(FileExistsError):
+    pass
+
+
+def linea_progreso(instantanea):
+    """
+    Resumen de una instantanea de ProgresoIngesta en una linea de texto.
+    """
+    partes = [f"[{formatear_tiempo(instantanea['transcurrido'])}] {instantanea['etapa'] or '-'}"]
+    imagen = instantanea["imagen"]
+    if imagen and instantanea["etapa"] == "hash_imagen":
+        partes.append(f"imagen {formatear_bytes(imagen['bytes_hasheados'])}/{formatear_bytes(imagen['bytes_totales'])} "
+                      f"({formatear_bytes(imagen['bytes_por_seg'])}/s, ETA {formatear_tiempo(imagen['eta_seg'])})")
+    for particion in instantanea["particiones"]:
+        estado = "terminada" if particion["terminada"] else f"ETA {formatear_tiempo(particion['eta_seg'])}"
+        partes.append(f"#{particion['particion']} {particion['entradas']} entradas "
+                      f"({particion['entradas_por_seg']:.0f}/s, hash {formatear_bytes(particion['bytes_por_seg'])}/s, {estado})")
+    return " | ".join(partes)
+
+
+class ImpresorProgreso:
+    """
+    Hilo que imprime el progreso cada `intervalo` segundos (texto o JSON lines).
+    """
+
+    def __init__(self, progreso, intervalo=INTERVALO_IMPRESION, como_json=False, salida=None):
+        self.progreso = progreso
+        self.intervalo = intervalo
+        self.como_json = como_json
+        self.salida = salida or sys.stdout
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, name="impresor-progreso", daemon=True)
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, tipo_excepcion, *exc):
+        self._parar.set()
+        self._hilo.join()
+        if tipo_excepcion is None:
+            self.imprimir()
+
+    def imprimir(self):
+        instantanea = self.progreso.instantanea()
+        texto = json.dumps(instantanea) if self.como_json else linea_progreso(instantanea)
+        print(texto, file=self.salida, flush=True)
+
+    def _bucle(self):
+        while not self._parar.wait(self.intervalo):
+            self.imprimir()
+
+
+def ingestar_caso(e01_path, nombre_caso, casos_dir=CASES_DIR, progreso=None, esperar_segundo_plano=True, **opciones):
+    """
+    Ingesta headless: crea el caso en casos_dir/nombre_caso (o reanuda su ingesta si quedo a
+    medias) y ejecuta digestE01 sin pantalla. Las opciones se pasan a digestE01 (workers,
+    modo_hash, modo_recorrido, politica_hash, limite_hash, ruta_almacen, ruta_conocidos,
+    verificar_almacen).
+
+    Devuelve (db_path, etapas_pendientes). Lanza FileNotFoundError si la imagen no existe,
+    CasoCompletoError si el caso ya tiene una ingesta completa y FileExistsError si el caso
+    pertenece a otra imagen.
+    """
+    # Importacion diferida: pytsk3/pyewf solo hacen falta al ingestar
+    from forensic_core.e01_reader import digestE01
+    from forensic_core.etapas import etapas_pendientes, ingesta_pendiente
+
+    e01_path = os.path.abspath(e01_path)
+    if not os.path.isfile(e01_path):
+        raise FileNotFoundError(f"No existe la imagen {e01_path}")
+
+    caso_dir = crear_directorio_caso(nombre_caso, casos_dir)
+    db_path = os.path.join(caso_dir, f"{nombre_caso}.db")
+    if os.path.exists(db_path):
+        if not ingesta_pendiente(db_path):
+            raise CasoCompletoError(f"El caso {nombre_caso} ya existe y su ingesta esta completa")
+        conn = sqlite3.connect(db_path)
+        fila = conn.execute("SELECT e01_path FROM case_info WHERE case_name = ?", (nombre_caso,)).fetchone()
+        conn.close()
+        if fila and os.path.abspath(fila[0]) != e01_path:
+            raise FileExistsError(f"El caso {nombre_caso} pertenece a otra imagen: {fila[0]}")
+        logging.info(f"Reanudando la ingesta del caso {nombre_caso}")
+    else:
+        # Los indices se crean al final de digestE01, tras la ingesta masiva
+        crear_base_de_datos(db_path, con_indices=False)
+
+    hilos = digestE01(e01_path, None, db_path, nombre_caso, caso_dir, progreso=progreso, **opciones)
+    if esperar_segundo_plano:
+        for hilo in hilos or []:
+            logging.info(f"Esperando al trabajo en segundo plano {hilo.name}")
+            hilo.join()
+    return db_path, etapas_pendientes(db_path)
+
+
+def _parser():
+    from forensic_core.hashing import LIMITE_HASH, POLITICA_HASH_DIFERIDO, POLITICA_HASH_LIMITE, POLITICA_HASH_SIEMPRE
+
+    parser = argparse.ArgumentParser(prog="python -m forensic_core", description="Herramientas forenses sin interfaz")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    ingest = subcomandos.add_parser("ingest", help="ingesta una imagen .E01 en un caso nuevo (o la reanuda)")
+    ingest.add_argument("e01", help="ruta al primer segmento de la imagen (.E01)")
+    ingest.add_argument("--case", required=True, dest="caso", help="nombre del caso")
+    ingest.add_argument("--cases-dir", dest="casos_dir", default=CASES_DIR, help=f"directorio de casos (por defecto {CASES_DIR})")
+    ingest.add_argument("--workers", type=int, default=None, help="procesos de hash (por defecto, todas las CPU)")
+    ingest.add_argument("--hash-imagen", dest="modo_hash", choices=("completo", "verificar"), default="completo",
+                        help="completo: recalcular el hash de la imagen; verificar: usar los del EWF y comprobarlos en segundo plano")
+    ingest.add_argument("--recorrido", dest="modo_recorrido", choices=("directorios", "mft"), default="directorios")
+    ingest.add_argument("--politica-hash", choices=(POLITICA_HASH_SIEMPRE, POLITICA_HASH_LIMITE, POLITICA_HASH_DIFERIDO),
+                        default=POLITICA_HASH_DIFERIDO)
+    ingest.add_argument("--limite-hash", type=int, default=LIMITE_HASH, help="bytes; ficheros mayores segun la politica")
+    ingest.add_argument("--almacen-hashes", dest="ruta_almacen", default=None,
+                        help="almacen de hashes compartido entre casos (por defecto <casos>/almacen_hashes.db)")
+    ingest.add_argument("--sin-almacen-hashes", dest="ruta_almacen", action="store_const", const="",
+                        help="no consultar ni actualizar el almacen de hashes")
+    ingest.add_argument("--verificar-almacen", action="store_true",
+                        help="leer enteros en segundo plano los ficheros cuyo hash salio del almacen")
+    ingest.add_argument("--conocidos", dest="ruta_conocidos", default=None,
+                        help="conjunto de ficheros conocidos (por defecto <casos>/ficheros_conocidos.idx si existe)")
+    ingest.add_argument("--sin-conocidos", dest="ruta_conocidos", action="store_const", const="",
+                        help="no marcar ficheros conocidos")
+    ingest.add_argument("--no-esperar", action="store_true",
+                        help="terminar sin esperar a los hashes diferidos ni a la verificacion en segundo plano")
+    ingest.add_argument("--intervalo", type=float, default=INTERVALO_IMPRESION, help="segundos entre lineas de progreso")
+    ingest.add_argument("--json", action="store_true", help="progreso como JSON lines")
+    ingest.add_argument("-v", "--verbose", action="store_true", help="mensajes de log por stderr")
+
+    batch = subcomandos.add_parser("batch", help="ingesta por lotes: un caso por cada imagen de un directorio o manifiesto")
+    batch.add_argument("origen", nargs="?", help="directorio con imagenes .E01 o manifiesto (.json o texto); "
+                                                 "sin origen se procesa lo que quede en la cola")
+    batch.add_argument("--cases-dir", dest="casos_dir", default=CASES_DIR, help=f"directorio de casos (por defecto {CASES_DIR})")
+    batch.add_argument("--trabajos", type=int, default=None, help="ingestas simultaneas (por defecto, CPU / workers)")
+    batch.add_argument("--workers", type=int, default=None, help="procesos de hash por ingesta")
+    batch.add_argument("--por-disco", type=int, default=None, help="ingestas simultaneas leyendo del mismo disco")
+    batch.add_argument("--reintentar-errores", action="store_true", help="volver a encolar los trabajos con error")
+    batch.add_argument("--recorrido", dest="modo_recorrido", choices=("directorios", "mft"), default=None)
+    batch.add_argument("--politica-hash", choices=(POLITICA_HASH_SIEMPRE, POLITICA_HASH_LIMITE, POLITICA_HASH_DIFERIDO),
+                       default=None)
+    batch.add_argument("--almacen-hashes", dest="ruta_almacen", default=None,
+                       help="almacen de hashes compartido (por defecto <casos>/almacen_hashes.db)")
+    batch.add_argument("--verificar-almacen", action="store_true",
+                       help="leer enteros en segundo plano los ficheros cuyo hash salio del almacen")
+    batch.add_argument("-v", "--verbose", action="store_true", help="mensajes de log por stderr")
+
+    known = subcomandos.add_parser("known", help="construye el conjunto de ficheros conocidos (estilo NSRL)")
+    known.add_argument("origenes", nargs="+", help="ficheros de texto o CSV con hashes MD5/SHA-256")
+    known.add_argument("--cases-dir", dest="casos_dir", default=CASES_DIR, help=f"directorio de casos (por defecto {CASES_DIR})")
+    known.add_argument("--salida", default=None, help="fichero del conjunto (por defecto <casos>/ficheros_conocidos.idx)")
+    known.add_argument("--marcar-casos", action="store_true", help="volver a marcar los casos ya ingestados")
+    known.add_argument("-v", "--verbose", action="store_true", help="mensajes de log por stderr")
+
+    status = subcomandos.add_parser("status", help="estado de la cola de ingesta por lotes")
+    status.add_argument("--cases-dir", dest="casos_dir", default=CASES_DIR)
+    status.add_argument("--json", action="store_true")
+    status.add_argument("-v", "--verbose", action="store_true", help=argparse.SUPPRESS)
+    return parser
+
+
+def _comando_ingest(args):
+    if not os.path.isfile(args.e01):
+        print(f"Error: No existe la imagen {args.e01}", file=sys.stderr)
+        return SALIDA_USO
+    caso_dir = os.path.join(args.casos_dir, args.caso)
+    os.makedirs(caso_dir, exist_ok=True)
+    progreso = ProgresoIngesta(ruta_log=os.path.join(caso_dir, "ingesta_progreso.jsonl"))
+    try:
+        with ImpresorProgreso(progreso, args.intervalo, args.json):
+            db_path, pendientes = ingestar_caso(
+                args.e01, args.caso, args.casos_dir, progreso=progreso,
+                esperar_segundo_plano=not args.no_esperar,
+                workers=args.workers, modo_hash=args.modo_hash, modo_recorrido=args.modo_recorrido,
+                politica_hash=args.politica_hash, limite_hash=args.limite_hash, ruta_almacen=args.ruta_almacen,
+                ruta_conocidos=args.ruta_conocidos, verificar_almacen=args.verificar_almacen,
+            )
+    except CasoCompletoError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return SALIDA_YA_COMPLETO
+    except (FileNotFoundError, FileExistsError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return SALIDA_USO
+    except KeyboardInterrupt:
+        print("Interrumpido: vuelve a lanzar el mismo comando para reanudar la ingesta.", file=sys.stderr)
+        return SALIDA_INTERRUMPIDA
+    except Exception as e:
+        logging.exception("Error durante la ingesta")
+        print(f"Error durante la ingesta: {e}", file=sys.stderr)
+        return SALIDA_ERROR
+    finally:
+        progreso.cerrar()
+
+    if pendientes:
+        print(f"Ingesta terminada con etapas pendientes: {', '.join(pendientes)}. "
+              f"Vuelve a lanzar el mismo comando para reintentarlas.", file=sys.stderr)
+        return SALIDA_INCOMPLETA
+    print(f"Ingesta completa: {db_path}")
+    return SALIDA_OK
+
+
+def _comando_batch(args):
+    from forensic_core.cola_ingesta import TRABAJO_COMPLETADO, TRABAJO_ERROR, TRABAJOS_POR_DISCO, WORKERS_POR_TRABAJO, ColaIngesta, buscar_imagenes, leer_manifiesto
+
+    cola = ColaIngesta(args.casos_dir)
+    if args.origen:
+        if os.path.isdir(args.origen):
+            imagenes = [(e01, None) for e01 in buscar_imagenes(args.origen)]
+        elif os.path.isfile(args.origen):
+            imagenes = leer_manifiesto(args.origen)
+        else:
+            print(f"Error: No existe {args.origen}", file=sys.stderr)
+            return SALIDA_USO
+        print(f"{cola.encolar(imagenes)} imagenes nuevas en la cola ({len(imagenes)} en el origen)")
+
+    opciones = []
+    if args.modo_recorrido:
+        opciones += ["--recorrido", args.modo_recorrido]
+    if args.politica_hash:
+        opciones += ["--politica-hash", args.politica_hash]
+    if args.ruta_almacen is not None:
+        opciones += ["--almacen-hashes", os.path.abspath(args.ruta_almacen) if args.ruta_almacen else ""]
+    if args.verificar_almacen:
+        opciones.append("--verificar-almacen")
+
+    def al_terminar(trabajo, estado, codigo):
+        print(f"{trabajo[2]}: {estado} (codigo {codigo})", flush=True)
+
+    try:
+        resumen = cola.ejecutar(
+            trabajos=args.trabajos, workers=args.workers or WORKERS_POR_TRABAJO,
+            por_disco=args.por_disco or TRABAJOS_POR_DISCO, reintentar_errores=args.reintentar_errores,
+            opciones_ingesta=opciones, al_terminar=al_terminar
+        )
+    except KeyboardInterrupt:
+        print("Interrumpido: vuelve a lanzar la cola para reanudar los trabajos en curso.", file=sys.stderr)
+        return SALIDA_INTERRUMPIDA
+
+    print("Cola terminada: " + ", ".join(f"{n} {estado}" for estado, n in sorted(resumen.items())))
+    if resumen.get(TRABAJO_ERROR):
+        return SALIDA_ERROR
+    if any(estado != TRABAJO_COMPLETADO for estado in resumen):
+        return SALIDA_INCOMPLETA
+    return SALIDA_OK
+
+
+def _comando_status(args):
+    from forensic_core.cola_ingesta import NOMBRE_DB_COLA, ColaIngesta
+
+    if not os.path.exists(os.path.join(args.casos_dir, NOMBRE_DB_COLA)):
+        print(f"No hay cola de ingesta en {args.casos_dir}", file=sys.stderr)
+        return SALIDA_USO
+    columnas = ("job_id", "e01_path", "case_name", "estado", "intentos", "codigo_salida", "error", "inicio", "fin")
+    trabajos = [dict(zip(columnas, fila)) for fila in ColaIngesta(args.casos_dir).trabajos()]
+    if args.json:
+        print(json.dumps(trabajos, indent=2))
+        return SALIDA_OK
+    for trabajo in trabajos:
+        print(f"{trabajo['job_id']:>4}  {trabajo['estado']:<11} {trabajo['case_name']:<30} {trabajo['e01_path']}"
+              + (f"  ({trabajo['error']})" if trabajo["error"] else ""))
+    return SALIDA_OK
+
+
+def _comando_known(args):
+    from forensic_core.ficheros_conocidos import NOMBRE_CONJUNTO, construir_conjunto, marcar_conocidos
+
+    for origen in args.origenes:
+        if not os.path.isfile(origen):
+            print(f"Error: No existe {origen}", file=sys.stderr)
+            return SALIDA_USO
+    salida = args.salida or os.path.join(args.casos_dir, NOMBRE_CONJUNTO)
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    totales = construir_conjunto(args.origenes, salida)
+    print(f"Conjunto de ficheros conocidos en {salida}: "
+          + ", ".join(f"{n} {algoritmo}" for algoritmo, n in totales.items()))
+
+    if args.marcar_casos and os.path.isdir(args.casos_dir):
+        for nombre in sorted(os.listdir(args.casos_dir)):
+            db_path = os.path.join(args.casos_dir, nombre, f"{nombre}.db")
+            if os.path.isfile(db_path):
+                print(f"{nombre}: {marcar_conocidos(db_path, salida)} ficheros conocidos")
+    return SALIDA_OK
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    comandos = {"ingest": _comando_ingest, "batch": _comando_batch, "status": _comando_status, "known": _comando_known}
+    return comandos[args.comando](args)
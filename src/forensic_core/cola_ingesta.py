@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+
+from database.create_database import (
+    crear_base_de_datos_cola, iniciar_trabajo_cola, insertar_trabajo_cola, obtener_trabajos_cola,
+    reencolar_trabajos_cola, terminar_trabajo_cola
+)
+from forensic_core.cli import SALIDA_INCOMPLETA, SALIDA_INTERRUMPIDA, SALIDA_OK, SALIDA_YA_COMPLETO
+
+
+'''
+Ingesta por lotes: una cola persistente de imagenes .E01, un caso por imagen.
+
+Cada trabajo se ejecuta en su propio proceso con la CLI headless (python -m forensic_core
+ingest), asi un fallo de pytsk3/pyewf en una imagen no tumba al resto de la cola, y el codigo
+de salida decide su estado. Como mucho se ejecutan `trabajos` a la vez (por defecto, las CPU
+entre los workers de hash de cada trabajo) y `por_disco` a la vez leyendo del mismo
+dispositivo, para no saturar un disco con lecturas concurrentes.
+
+El estado de cada trabajo queda en <casos>/cola_ingesta.db. Si la cola se interrumpe, al
+volver a lanzarla los trabajos que estaban en curso o incompletos se reanudan desde los
+checkpoints de su caso; los completados no se repiten.
+'''
+
+NOMBRE_DB_COLA = "cola_ingesta.db"
+NOMBRE_LOG_TRABAJO = "ingesta_lote.log"
+
+TRABAJO_PENDIENTE = "pendiente"
+TRABAJO_EN_CURSO = "en_curso"
+TRABAJO_COMPLETADO = "completado"
+TRABAJO_INCOMPLETO = "incompleto"   # termino con etapas fallidas; se reintenta al relanzar la cola
+TRABAJO_ERROR = "error"
+
+INTERVALO_SONDEO = 0.5
+WORKERS_POR_TRABAJO = 4
+TRABAJOS_POR_DISCO = 2
+
+
+def buscar_imagenes(directorio):
+    """
+    Primeros segmentos (.E01) bajo el directorio, en orden.
+    """
+    imagenes = []
+    for raiz, dirs, ficheros in os.walk(directorio):
+        dirs.sort()
+        for fichero in sorted(ficheros):
+            if fichero.lower().endswith(".e01"):
+                imagenes.append(os.path.abspath(os.path.join(raiz, fichero)))
+    return imagenes
+
+
+def leer_manifiesto(ruta):
+    """
+    Manifiesto de imagenes: JSON (lista de rutas o de {"e01": ruta, "case": nombre}) o texto
+    con una ruta por linea, opcionalmente seguida de un tabulador y el nombre del caso.
+    Las rutas relativas se resuelven respecto al manifiesto. Devuelve [(e01, caso|None)].
+    """
+    base = os.path.dirname(os.path.abspath(ruta))
+    with open(ruta, encoding="utf-8") as f:
+        contenido = f.read()
+
+    entradas = []
+    if ruta.lower().endswith(".json"):
+        for elemento in json.loads(contenido):
+            if isinstance(elemento, str):
+                entradas.append((elemento, None))
+            else:
+                entradas.append((elemento["e01"], elemento.get("case")))
+    else:
+        for linea in contenido.splitlines():
+            linea = linea.strip()
+            if not linea or linea.startswith("#"):
+                continue
+            e01, _, caso = linea.partition("\t")
+            entradas.append((e01.strip(), caso.strip() or None))
+    return [(os.path.normpath(os.path.join(base, e01)), caso) for e01, caso in entradas]
+
+
+def nombre_caso_para(e01_path, usados):
+    # Nombre del caso a partir del fichero; si ya existe en la cola se le añade un sufijo
+    base = "".join(c if c.isalnum() or c in "-_." else "_" for c in os.path.splitext(os.path.basename(e01_path))[0])
+    nombre, n = base, 2
+    while nombre in usados:
+        nombre = f"{base}_{n}"
+        n += 1
+    return nombre
+
+
+def _dispositivo(ruta):
+    try:
+        return os.stat(ruta).st_dev
+    except OSError:
+        return None
+
+
+class ColaIngesta:
+    """
+    Cola de ingesta persistente en <casos_dir>/cola_ingesta.db.
+    """
+
+    def __init__(self, casos_dir, ruta_db=None):
+        self.casos_dir = os.path.abspath(casos_dir)
+        os.makedirs(self.casos_dir, exist_ok=True)
+        self.ruta_db = ruta_db or os.path.join(self.casos_dir, NOMBRE_DB_COLA)
+        crear_base_de_datos_cola(self.ruta_db)
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta_db, timeout=30)
+
+    def encolar(self, imagenes):
+        """
+        Añade [(e01, caso|None)] a la cola. Las imagenes ya encoladas se ignoran.
+        Devuelve cuantos trabajos nuevos se han creado.
+        """
+        conn = self._conectar()
+        cursor = conn.cursor()
+        usados = {fila[2] for fila in obtener_trabajos_cola(cursor)}
+        nuevos = 0
+        for e01, caso in imagenes:
+            caso = caso or nombre_caso_para(e01, usados)
+            if caso in usados:
+                logging.warning(f"El caso {caso} ya esta en la cola; se ignora {e01}")
+                continue
+            if insertar_trabajo_cola(cursor, os.path.abspath(e01), caso):
+                usados.add(caso)
+                nuevos += 1
+        conn.commit()
+        conn.close()
+        return nuevos
+
+    def trabajos(self, estados=None):
+        conn = self._conectar()
+        try:
+            return obtener_trabajos_cola(conn.cursor(), estados)
+        finally:
+            conn.close()
+
+    def ejecutar(self, trabajos=None, workers=WORKERS_POR_TRABAJO, por_disco=TRABAJOS_POR_DISCO,
+                 reintentar_errores=False, opciones_ingesta=(), al_terminar=None):
+        """
+        Procesa la cola hasta vaciarla. opciones_ingesta son argumentos extra para
+        `python -m forensic_core ingest` (p.ej. ["--recorrido", "mft"]). al_terminar(trabajo,
+        estado, codigo) se llama cada vez que termina un trabajo.
+
+        Devuelve {estado: numero de trabajos} al terminar.
+        """
+        trabajos = trabajos or max(1, (os.cpu_count() or 1) // max(workers, 1))
+
+        conn = self._conectar()
+        cursor = conn.cursor()
+        # Trabajos en curso de una ejecucion anterior que no llego a terminar: su caso se reanuda
+        estados = [TRABAJO_EN_CURSO, TRABAJO_INCOMPLETO] + ([TRABAJO_ERROR] if reintentar_errores else [])
+        reencolados = reencolar_trabajos_cola(cursor, estados)
+        conn.commit()
+        if reencolados:
+            logging.info(f"{reencolados} trabajos reencolados de una ejecucion anterior")
+
+        pendientes = list(obtener_trabajos_cola(cursor, [TRABAJO_PENDIENTE]))
+        en_ejecucion = {}   # job_id -> (Popen, fila, dispositivo, log)
+        try:
+            while pendientes or en_ejecucion:
+                # Lanzar los pendientes que quepan, respetando el limite por disco
+                ocupados = [dispositivo for _, _, dispositivo, _ in en_ejecucion.values()]
+                for fila in list(pendientes):
+                    if len(en_ejecucion) >= trabajos:
+                        break
+                    dispositivo = _dispositivo(fila[1])
+                    if dispositivo is not None and ocupados.count(dispositivo) >= por_disco:
+                        continue
+                    pendientes.remove(fila)
+                    proceso, log = self._lanzar(fila, workers, opciones_ingesta)
+                    iniciar_trabajo_cola(cursor, fila[0], proceso.pid)
+                    conn.commit()
+                    en_ejecucion[fila[0]] = (proceso, fila, dispositivo, log)
+                    ocupados.append(dispositivo)
+                    logging.info(f"Trabajo {fila[0]} ({fila[2]}) lanzado, pid {proceso.pid}")
+
+                for job_id, (proceso, fila, _, log) in list(en_ejecucion.items()):
+                    codigo = proceso.poll()
+                    if codigo is None:
+                        continue
+                    log.close()
+                    del en_ejecucion[job_id]
+                    estado, error = self._estado_por_codigo(codigo, fila)
+                    terminar_trabajo_cola(cursor, job_id, estado, codigo, error)
+                    conn.commit()
+                    logging.info(f"Trabajo {job_id} ({fila[2]}) terminado: {estado} (codigo {codigo})")
+                    if al_terminar:
+                        al_terminar(fila, estado, codigo)
+                time.sleep(INTERVALO_SONDEO)
+        except KeyboardInterrupt:
+            # Los procesos hijos reciben tambien el Ctrl+C y guardan su checkpoint; quedan en curso
+            # y se reanudan la proxima vez que se lance la cola
+            for proceso, _, _, log in en_ejecucion.values():
+                try:
+                    proceso.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    proceso.send_signal(signal.SIGTERM)
+                log.close()
+            raise
+        finally:
+            conn.close()
+
+        return self.resumen()
+
+    def resumen(self):
+        resumen = {}
+        for fila in self.trabajos():
+            resumen[fila[3]] = resumen.get(fila[3], 0) + 1
+        return resumen
+
+    def _lanzar(self, fila, workers, opciones_ingesta):
+        _, e01_path, case_name = fila[:3]
+        caso_dir = os.path.join(self.casos_dir, case_name)
+        os.makedirs(caso_dir, exist_ok=True)
+        log = open(os.path.join(caso_dir, NOMBRE_LOG_TRABAJO), "a", encoding="utf-8")
+        comando = [
+            sys.executable, "-m", "forensic_core", "ingest", e01_path,
+            "--case", case_name, "--cases-dir", self.casos_dir,
+            "--workers", str(workers), "--intervalo", "10", *opciones_ingesta
+        ]
+        # El hijo se ejecuta desde src/ para que encuentre los paquetes del proyecto
+        src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        proceso = subprocess.Popen(comando, cwd=src_dir, stdout=log, stderr=subprocess.STDOUT,
+                                   stdin=subprocess.DEVNULL)
+        return proceso, log
+
+    def _estado_por_codigo(self, codigo, fila):
+        # Un caso que ya estaba completo (p.ej. reencolado) no es un error
+        if codigo in (SALIDA_OK, SALIDA_YA_COMPLETO):
+            return TRABAJO_COMPLETADO, None
+        if codigo in (SALIDA_INCOMPLETA, SALIDA_INTERRUMPIDA):
+            return TRABAJO_INCOMPLETO, None
+        log = os.path.join(self.casos_dir, fila[2], NOMBRE_LOG_TRABAJO)
+        return TRABAJO_ERROR, f"Codigo de salida {codigo}, ver {log}"
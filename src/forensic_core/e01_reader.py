@@ -1,34 +1,121 @@
-from datetime import datetime, timezone
-import hashlib
 import logging
 import os
+from collections import OrderedDict
+import queue
 import sqlite3
+import threading
+import time
 import pytsk3 # type: ignore
 import pyewf
 
 
-from database.create_database import insertar_file_hash, insertar_filesystem_entry, insertar_timeline_event, insertar_partition_info, insertar_case_info
+from database.create_database import EscritorIngesta, actualizar_progreso_verificacion, aplicar_pragmas_ingesta, crear_indices_secundarios, actualizar_resultado_verificacion, insertar_partition_info, insertar_case_info, marcar_etapa, obtener_etapas_sin_completar, restaurar_pragmas_ingesta
+from forensic_core.almacen_hashes import abrir_almacen, resolver_ruta_almacen
+from forensic_core.arbol_directorios import construir_arbol
 from forensic_core.artifact_extractor import extraer_artefactos
+from forensic_core.ficheros_conocidos import marcar_conocidos, resolver_ruta_conjunto
+from forensic_core.etapas import ESTADO_COMPLETADA, ESTADO_EN_CURSO, ETAPA_ARBOL, ETAPA_ARTEFACTOS, ETAPA_CONOCIDOS, ETAPA_FIN, ETAPA_HASH_IMAGEN, ETAPA_INDICES, ETAPA_PARTICIONES, ETAPA_RECORRIDO, checkpoint_etapa, completar_etapa, ejecutar_etapa, etapa_completada, etapa_recorrido, fijar_modo_recorrido
+from forensic_core.ingesta import MODO_RECORRIDO_DIRECTORIOS, ingestar_directorio, ingestar_particiones, programar_hashes_pendientes
+from forensic_core.metricas import iniciar_ejecucion, medir_etapa
+from forensic_core.progreso import ProgresoIngesta
+from forensic_core.sesiones_imagen import obtener_imagen
+from forensic_core.hashing import ALGORITMOS_POR_DEFECTO, LIMITE_HASH, POLITICA_HASH_DIFERIDO, actualizar_hashes, digests_hex, nuevos_hashes
 
 
-def open_e01_image(e01_path):
-    filenames = pyewf.glob(e01_path)
-    ewf_handle = pyewf.handle()
-    ewf_handle.open(filenames)
+# Cache LRU de chunks EWF ya descomprimidos bajo EWFImgInfo.read
+CACHE_E01_BYTES = 64 * 1024 * 1024
+TAMANO_CHUNK_EWF = 32 * 1024  # 64 sectores de 512 bytes, valor por defecto de EWF
+# Las lecturas grandes (data runs, hash) van directas para no expulsar metadatos de la cache
+LECTURA_SIN_CACHE = 256 * 1024
 
-    class EWFImgInfo(pytsk3.Img_Info):
-        def __init__(self, ewf_handle):
-            self._ewf_handle = ewf_handle
-            super().__init__(url="", type=pytsk3.TSK_IMG_TYPE_EXTERNAL)
 
-        def read(self, offset, size):
-            self._ewf_handle.seek(offset)
-            return self._ewf_handle.read(size)
+def _tamano_chunk_ewf(ewf_handle):
+    try:
+        return ewf_handle.get_chunk_size()
+    except Exception:
+        pass
+    try:
+        return ewf_handle.get_sectors_per_chunk() * ewf_handle.get_bytes_per_sector()
+    except Exception:
+        return TAMANO_CHUNK_EWF
 
-        def get_size(self):
-            return self._ewf_handle.get_media_size()
 
-    return EWFImgInfo(ewf_handle)
+class EWFImgInfo(pytsk3.Img_Info):
+    """
+    Img_Info de pytsk3 sobre un handle pyewf con una cache LRU de chunks, indexada por
+    numero de chunk, para no descomprimir una y otra vez los mismos bloques de MFT e indices.
+    """
+
+    def __init__(self, ewf_handle, cache_bytes=CACHE_E01_BYTES):
+        self._ewf_handle = ewf_handle
+        self._media_size = ewf_handle.get_media_size()
+        self._chunk_size = _tamano_chunk_ewf(ewf_handle) or TAMANO_CHUNK_EWF
+        self._max_chunks = max(0, cache_bytes // self._chunk_size)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        super().__init__(url="", type=pytsk3.TSK_IMG_TYPE_EXTERNAL)
+
+    def _leer_directo(self, offset, size):
+        self._ewf_handle.seek(offset)
+        return self._ewf_handle.read(size)
+
+    def _leer_chunk(self, indice):
+        data = self._cache.get(indice)
+        if data is not None:
+            self._cache.move_to_end(indice)
+            self.cache_hits += 1
+            return data
+        self.cache_misses += 1
+        inicio = indice * self._chunk_size
+        data = self._leer_directo(inicio, min(self._chunk_size, self._media_size - inicio))
+        self._cache[indice] = data
+        if len(self._cache) > self._max_chunks:
+            self._cache.popitem(last=False)
+        return data
+
+    def read(self, offset, size):
+        with self._lock:
+            if self._max_chunks == 0 or size > LECTURA_SIN_CACHE:
+                return self._leer_directo(offset, size)
+            size = min(size, self._media_size - offset)
+            if size <= 0:
+                return b""
+            primero = offset // self._chunk_size
+            ultimo = (offset + size - 1) // self._chunk_size
+            data = b"".join(self._leer_chunk(indice) for indice in range(primero, ultimo + 1))
+            inicio = offset - primero * self._chunk_size
+            return data[inicio:inicio + size]
+
+    def get_size(self):
+        return self._media_size
+
+    def estadisticas_cache(self):
+        total = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "ratio": self.cache_hits / total if total else 0.0,
+            "chunks": len(self._cache),
+            "bytes": len(self._cache) * self._chunk_size,
+        }
+
+    def vaciar_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        with self._lock:
+            self._cache.clear()
+            self._ewf_handle.close()
+
+
+def open_e01_image(e01_path, cache_bytes=CACHE_E01_BYTES):
+    filenames = pyewf.glob(e01_path)
+    ewf_handle = pyewf.handle()
+    ewf_handle.open(filenames)
+    return EWFImgInfo(ewf_handle, cache_bytes)
 
 def abrir_fs_con_particion(img, partition_offset):
     try:
@@ -61,136 +148,313 @@ def get_partition_label(fs_info):
     return "Sin etiqueta"
 
 def recorrer_archivos_recursivo(cursor, fs_info, dir_obj, parent_path, partition_id, case_id):
-    for entry in dir_obj:
-        if not entry.info.name.name or entry.info.name.name in [b".", b".."]:
-            continue
+    # Recorrido secuencial (un solo proceso) del motor de ingesta
+    with EscritorIngesta(cursor.connection) as escritor:
+        ingestar_directorio(escritor, fs_info, dir_obj, parent_path, partition_id, case_id)
 
-        try:
-            name = entry.info.name.name.decode("utf-8", "ignore")
-            full_path = os.path.join(parent_path, name)
-            ext = os.path.splitext(name)[1].lower()
-            tipo = entry.info.meta.type if entry.info.meta else None
-            tipo = "dir" if tipo == pytsk3.TSK_FS_META_TYPE_DIR else "file"
-            size = entry.info.meta.size if entry.info.meta else 0
-            inode = entry.info.meta.addr if entry.info.meta else None
-
-            def get_ts(attr): return datetime.fromtimestamp(attr, timezone.utc) if attr else None
-            
-            mtime = get_ts(entry.info.meta.mtime)
-            atime = get_ts(entry.info.meta.atime)
-            ctime = get_ts(entry.info.meta.ctime)
-            crtime = get_ts(entry.info.meta.crtime)
-
-            # Extraer SHA256 si es archivo y no es gigante
-            sha256 = None
-            if tipo == "file" and size < 10 * 1024 * 1024:
-                try:
-                    f = entry.read_random(0, size)
-                    sha256 = hashlib.sha256(f).hexdigest()
-                except Exception:
-                    pass
+# Lecturas grandes y alineadas a multiplos del tamaño de chunk EWF (32 KB por defecto)
+ALINEACION_LECTURA_E01 = 64 * 1024
+BUFFER_HASH_E01 = 8 * 1024 * 1024
+BLOQUES_EN_COLA_HASH = 4
+# Intentos de guardar el resultado de la verificacion en segundo plano (cada uno espera el
+# timeout de la conexion y un segundo mas)
+INTENTOS_RESULTADO_VERIFICACION = 20
 
-            entry_id = insertar_filesystem_entry(
-                cursor, partition_id, full_path, name, ext, tipo, size,
-                inode, mtime, atime, ctime, crtime, sha256
-            )
 
-            if sha256:
-                insertar_file_hash(cursor, entry_id, sha256)
+def calcular_hashes_E01(ruta_E01, algoritmos=ALGORITMOS_POR_DEFECTO, buffer_size=BUFFER_HASH_E01, progreso=None):
+    """
+    Calcula varios hashes de la imagen .E01 (EWF) en una unica lectura del medio.
+
+    Un hilo lector descomprime la imagen con pyewf mientras el hilo principal
+    alimenta todos los digest, de modo que lectura y hash se solapan.
+
+    Args:
+        ruta_E01 (str): Ruta al archivo .E01.
+        algoritmos (iterable): Algoritmos a calcular ("md5", "sha1", "sha256", "blake3"...).
+        buffer_size (int): Tamaño de cada lectura, se alinea a ALINEACION_LECTURA_E01 (por defecto 8MB).
+        progreso (callable): Opcional, se llama con (bytes_leidos, bytes_totales) tras cada bloque.
+
+    Returns:
+        dict: {algoritmo: hash hexadecimal}.
+    """
+    hashes = nuevos_hashes(algoritmos)
+    buffer_size = max(ALINEACION_LECTURA_E01, buffer_size - buffer_size % ALINEACION_LECTURA_E01)
 
-            # Insertar en línea de tiempo
-            if crtime:
-                insertar_timeline_event(cursor, case_id, "fs", entry_id, f"Archivo: {name}", crtime)
+    ewf_handle = pyewf.handle()
+    filenames = pyewf.glob(ruta_E01)
+    ewf_handle.open(filenames)
+    total = ewf_handle.get_media_size()
 
-            # Recursividad en carpetas
-            if tipo == "dir":
-                subdir = entry.as_directory()
-                recorrer_archivos_recursivo(cursor, fs_info, subdir, full_path, partition_id, case_id)
+    cola = queue.Queue(maxsize=BLOQUES_EN_COLA_HASH)
+    errores = []
+    parar = threading.Event()
 
+    def lector():
+        try:
+            leidos = 0
+            while leidos < total and not parar.is_set():
+                data = ewf_handle.read(min(buffer_size, total - leidos))
+                if not data:
+                    break
+                leidos += len(data)
+                cola.put(data)
         except Exception as e:
-            continue
+            errores.append(e)
+        finally:
+            cola.put(None)
+
+    hilo = threading.Thread(target=lector, name="lector-hash-e01", daemon=True)
+    hilo.start()
+    procesados = 0
+    try:
+        while True:
+            data = cola.get()
+            if data is None:
+                break
+            actualizar_hashes(hashes, data)
+            procesados += len(data)
+            if progreso:
+                progreso(procesados, total)
+    finally:
+        # Si falla el hash, desbloquear al lector para que pueda terminar
+        parar.set()
+        while hilo.is_alive():
+            try:
+                cola.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        hilo.join()
+        ewf_handle.close()
+
+    if errores:
+        raise errores[0]
+
+    return digests_hex(hashes)
+
 
-def calcular_hash_E01(ruta_E01, algoritmo="sha256", buffer_size=65536):
-    #return "hola"
+def calcular_hash_E01(ruta_E01, algoritmo="sha256", buffer_size=BUFFER_HASH_E01):
     """
     Calcula el hash de un archivo .E01 (EWF).
     
     Args:
         ruta_ewf (str): Ruta al archivo .E01.
         algoritmo (str): "sha256", "md5", "sha1", etc.
-        buffer_size (int): Tamaño del buffer de lectura (por defecto 64KB).
+        buffer_size (int): Tamaño del buffer de lectura (por defecto 8MB).
     
     Returns:
         str: Hash hexadecimal del archivo.
     """
-    # Inicializar el objeto hashlib según el algoritmo
-    if algoritmo not in hashlib.algorithms_available:
-        raise ValueError(f"Algoritmo no soportado. Usa uno de: {hashlib.algorithms_available}")
-    
-    hash_obj = hashlib.new(algoritmo)
-    
-    # Abrir el archivo E01 con pyewf
+    return calcular_hashes_E01(ruta_E01, (algoritmo,), buffer_size)[algoritmo]
+
+
+
+MODO_HASH_COMPLETO = "completo"
+MODO_HASH_VERIFICAR = "verificar"
+
+
+def leer_hashes_almacenados_E01(ruta_E01):
+    """
+    Lee los hashes (MD5/SHA-1) que el adquiridor guardo en las secciones de hash del EWF.
+
+    Returns:
+        dict: {algoritmo: hash hexadecimal}, vacio si la imagen no trae hashes.
+    """
     ewf_handle = pyewf.handle()
-    filenames = pyewf.glob(ruta_E01)
-    ewf_handle.open(filenames)
-    
-    # Leer el contenido en bloques y actualizar el hash
-    while True:
-        data = ewf_handle.read(buffer_size)
-        if not data:
-            break
-        hash_obj.update(data)
-    
-    ewf_handle.close()
-    
-    return hash_obj.hexdigest()
+    ewf_handle.open(pyewf.glob(ruta_E01))
+    valores = {}
+    try:
+        try:
+            valores = ewf_handle.get_hash_values() or {}
+        except AttributeError:
+            for identificador in ("MD5", "SHA1", "SHA256"):
+                try:
+                    valores[identificador] = ewf_handle.get_hash_value(identificador)
+                except Exception:
+                    pass
+    finally:
+        ewf_handle.close()
 
+    hashes = {}
+    for identificador, valor in valores.items():
+        if valor and identificador:
+            hashes[identificador.lower().replace("-", "")] = str(valor).strip().lower()
+    return hashes
 
 
-def digestE01(e01_path, stdscr, db_path, case_name, case_dir):
-    
+def verificar_hashes_E01(db_path, ruta_E01, case_name):
+    """
+    Recalcula los hashes de la imagen y los compara con los almacenados en case_info.
+    El progreso y el resultado se escriben en la base de datos del caso.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    cursor = conn.cursor()
+    fila = cursor.execute(
+        "SELECT hash_md5, hash_sha1, hash_sha256 FROM case_info WHERE case_name = ?", (case_name,)
+    ).fetchone()
+    almacenados = dict(zip(("md5", "sha1", "sha256"), fila)) if fila else {}
+    almacenados = {algoritmo: valor for algoritmo, valor in almacenados.items() if valor}
+
+    ultimo = [0.0]
+
+    def progreso(leidos, total):
+        fraccion = leidos / total if total else 1.0
+        if fraccion - ultimo[0] < 0.01:
+            return
+        ultimo[0] = fraccion
+        try:
+            actualizar_progreso_verificacion(cursor, case_name, "en_curso", fraccion)
+            conn.commit()
+        except sqlite3.OperationalError:
+            # La ingesta tiene la base de datos bloqueada: el progreso es orientativo
+            pass
+
+    try:
+        calculados = calcular_hashes_E01(ruta_E01, progreso=progreso)
+        discrepancias = [
+            f"{algoritmo.upper()}: almacenado {valor}, calculado {calculados.get(algoritmo)}"
+            for algoritmo, valor in almacenados.items()
+            if calculados.get(algoritmo) != valor
+        ]
+        estado = "discrepancia" if discrepancias else "verificado"
+        detalle = "; ".join(discrepancias) if discrepancias else "Hashes de la imagen verificados"
+    except Exception as e:
+        calculados = {}
+        estado = "error"
+        detalle = f"Error verificando la imagen: {e}"
+
+    # El resultado final no debe perderse: se reintenta mientras la ingesta tenga la base de
+    # datos bloqueada, pero no indefinidamente (un error de esquema no se arregla esperando)
+    try:
+        for intento in range(1, INTENTOS_RESULTADO_VERIFICACION + 1):
+            try:
+                actualizar_resultado_verificacion(cursor, case_name, estado, calculados, detalle)
+                conn.commit()
+                break
+            except sqlite3.OperationalError as e:
+                logging.warning(f"No se pudo guardar la verificacion de {case_name} "
+                                f"(intento {intento}/{INTENTOS_RESULTADO_VERIFICACION}): {e}")
+                if intento == INTENTOS_RESULTADO_VERIFICACION:
+                    logging.error(f"Verificacion de {case_name} sin guardar: {estado}, {detalle}")
+                    raise
+                time.sleep(1)
+    finally:
+        conn.close()
+    return estado
 
 
+def programar_verificacion_hashes(db_path, ruta_E01, case_name):
+    """
+    Lanza la verificacion completa de la imagen en un hilo en segundo plano.
+    """
+    hilo = threading.Thread(
+        target=verificar_hashes_E01,
+        args=(db_path, ruta_E01, case_name),
+        name="verificacion-hash-e01",
+        daemon=True
+    )
+    hilo.start()
+    return hilo
+
+
+
+def digestE01(e01_path, stdscr, db_path, case_name, case_dir, modo_hash=MODO_HASH_COMPLETO, workers=None,
+              politica_hash=POLITICA_HASH_DIFERIDO, limite_hash=LIMITE_HASH,
+              modo_recorrido=MODO_RECORRIDO_DIRECTORIOS, progreso=None, ruta_almacen=None,
+              ruta_conocidos=None, verificar_almacen=False):
+    """
+    Ingesta completa de la imagen en la base de datos del caso. Cada etapa queda registrada
+    en ingesta_etapa: si se interrumpe, volver a llamarla reanuda desde la ultima etapa
+    completada y el recorrido de cada particion desde su checkpoint.
+
+    Con modo_recorrido=MODO_RECORRIDO_MFT las particiones NTFS se recorren leyendo la MFT por
+    inode (incluye borrados y huerfanos); el resto de sistemas de archivos, por directorios.
+
+    Las particiones se recorren en paralelo (ver ingestar_particiones). Si se pasa un
+    ProgresoIngesta en progreso, se publican en el la etapa actual, los bytes hasheados y las
+    entradas guardadas por particion. Con stdscr=None los errores se propagan al llamador en
+    lugar de mostrarse en pantalla.
+
+    Los hashes de ficheros grandes se reutilizan del almacen compartido entre casos cuando su
+    tamaño y huella ya son conocidos (ver almacen_hashes); ruta_almacen="" lo desactiva y
+    verificar_almacen=True vuelve a leerlos enteros en segundo plano. Si hay conjunto de
+    ficheros conocidos (ver ficheros_conocidos), sus entradas se marcan antes de exportar los
+    archivos interesantes para omitirlas.
+
+    Devuelve los hilos que quedan trabajando en segundo plano (verificacion de los hashes del
+    EWF, hashes diferidos) por si el llamador quiere esperarlos.
+    """
+    hilos = []
+    if progreso is None:
+        progreso = ProgresoIngesta()
+    ruta_almacen = resolver_ruta_almacen(ruta_almacen, case_dir)
+    ruta_conocidos = resolver_ruta_conjunto(ruta_conocidos, case_dir)
+    # Tiempos y contadores de cada etapa en stage_metrics (ver forensic_core.metricas)
+    iniciar_ejecucion()
+
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
-    insertar_case_info(cursor, case_name, e01_path, calcular_hash_E01(e01_path,"sha256"), calcular_hash_E01(e01_path,"md5"))
-    conn.commit()
-
-    image = open_e01_image(e01_path)
+    if not etapa_completada(cursor, ETAPA_HASH_IMAGEN):
+        hashes_almacenados = leer_hashes_almacenados_E01(e01_path) if modo_hash == MODO_HASH_VERIFICAR else {}
+        if hashes_almacenados:
+            # Confiar en los hashes del EWF y verificarlos en segundo plano
+            insertar_case_info(cursor, case_name, e01_path, hashes_almacenados,
+                               hash_origen="ewf", verificacion_estado="pendiente")
+            marcar_etapa(cursor, ETAPA_HASH_IMAGEN, ESTADO_COMPLETADA)
+            conn.commit()
+            hilos.append(programar_verificacion_hashes(db_path, e01_path, case_name))
+        else:
+            progreso.iniciar_etapa(ETAPA_HASH_IMAGEN)
+            with medir_etapa(db_path, ETAPA_HASH_IMAGEN) as medicion:
+                hashes = calcular_hashes_E01(e01_path, progreso=progreso.progreso_imagen)
+                imagen = progreso.instantanea()["imagen"]
+                if imagen:
+                    medicion.contar("bytes", imagen["bytes_hasheados"])
+            insertar_case_info(cursor, case_name, e01_path, hashes)
+            marcar_etapa(cursor, ETAPA_HASH_IMAGEN, ESTADO_COMPLETADA)
+            conn.commit()
+
+    # Imagen de la sesion del caso: la reutilizan despues la exportacion de hives y artefactos
+    image = obtener_imagen(e01_path)
 
     volume_info = pytsk3.Volume_Info(image)
 
     try:
-        for i, partition in enumerate(volume_info):
-            partition_offset = partition.start * 512
-            fs_type = "Unallocated"
-            label = ""
-            block_size = 0
-            block_count = 0
-            description = partition.desc.decode(errors='ignore') if partition.desc else ""
-            start_offset = partition.start
-            lenght = partition.len
-            # Solo intentamos analizar si no es espacio no asignado
-            if b"Unallocated" not in partition.desc:
-                try:
-                    fs_info = pytsk3.FS_Info(image, offset=partition_offset)
-                    fs_type = get_fs_type_name(fs_info.info.ftype)
-                    label = get_partition_label(fs_info)
-                    block_size = fs_info.info.block_size
-                    block_count = fs_info.info.block_count
-                    logging.info(f"Tipo de sistema de archivos: {fs_type}, Etiqueta: {label}, Tamaño de bloque: {block_size}, Conteo de bloques: {block_count}")
-                    # Verificar acceso al sistema de archivos
-                    try:
-                        fs_info.open_dir("/")
-                    except:
-                        fs_type += " (inaccesible)"
-                except Exception as e:
-                    fs_type = f"Unknown"
-            # Insertar en la base de datos
-            insertar_partition_info(
-                cursor, case_name, description, start_offset, lenght, partition_offset, fs_type, label,
-                block_size, block_count
-            )
+        if not etapa_completada(cursor, ETAPA_PARTICIONES):
+            progreso.iniciar_etapa(ETAPA_PARTICIONES)
+            with medir_etapa(db_path, ETAPA_PARTICIONES) as medicion:
+                for i, partition in enumerate(volume_info):
+                    partition_offset = partition.start * 512
+                    fs_type = "Unallocated"
+                    label = ""
+                    block_size = 0
+                    block_count = 0
+                    description = partition.desc.decode(errors='ignore') if partition.desc else ""
+                    start_offset = partition.start
+                    lenght = partition.len
+                    # Solo intentamos analizar si no es espacio no asignado
+                    if b"Unallocated" not in partition.desc:
+                        try:
+                            fs_info = pytsk3.FS_Info(image, offset=partition_offset)
+                            fs_type = get_fs_type_name(fs_info.info.ftype)
+                            label = get_partition_label(fs_info)
+                            block_size = fs_info.info.block_size
+                            block_count = fs_info.info.block_count
+                            logging.info(f"Tipo de sistema de archivos: {fs_type}, Etiqueta: {label}, Tamaño de bloque: {block_size}, Conteo de bloques: {block_count}")
+                            # Verificar acceso al sistema de archivos
+                            try:
+                                fs_info.open_dir("/")
+                            except:
+                                fs_type += " (inaccesible)"
+                        except Exception as e:
+                            fs_type = f"Unknown"
+                    # Insertar en la base de datos
+                    insertar_partition_info(
+                        cursor, case_name, description, start_offset, lenght, partition_offset, fs_type, label,
+                        block_size, block_count
+                    )
+                    medicion.contar("particiones")
+                marcar_etapa(cursor, ETAPA_PARTICIONES, ESTADO_COMPLETADA)
+                conn.commit()
 
         conn.commit()
         conn.close()
@@ -200,27 +464,104 @@ def digestE01(e01_path, stdscr, db_path, case_name, case_dir):
         # Reabrir la conexión para recorrer archivos
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
-        for i, partition in enumerate(volume_info):
-            try:
-                # Detectar la partición "Basic data partition" (suele ser NTFS o FAT)
-                if b"Basic data partition" in partition.desc or b"NTFS" in partition.desc or b"exFAT" in partition.desc:
-                    partition_offset = partition.start * 512
-                    fs_info = abrir_fs_con_particion(image, partition_offset)
-                    if fs_info:
-                        recorrer_archivos_recursivo(cursor, fs_info, fs_info.open_dir("/"), "/", partition.addr , case_name)
-            except Exception as e:
-                continue
-        
+        aplicar_pragmas_ingesta(conn)
+        modo_recorrido = fijar_modo_recorrido(cursor, modo_recorrido)
         conn.commit()
+        progreso.iniciar_etapa(ETAPA_RECORRIDO)
+        particiones = []
+        for partition in volume_info:
+            etapa = etapa_recorrido(partition.addr)
+            if etapa_completada(cursor, etapa):
+                continue
+            # Detectar la partición "Basic data partition" (suele ser NTFS o FAT)
+            if b"Basic data partition" in partition.desc or b"NTFS" in partition.desc or b"exFAT" in partition.desc:
+                partition_offset = partition.start * 512
+                fs_info = abrir_fs_con_particion(image, partition_offset)
+                if fs_info:
+                    particiones.append((partition.addr, partition_offset, checkpoint_etapa(cursor, etapa)))
+                    progreso.estimar_particion(partition.addr, fs_info.info.last_inum - fs_info.info.first_inum + 1)
+
+        # Todas las particiones se recorren a la vez; esta conexion es el unico escritor
+        with medir_etapa(db_path, ETAPA_RECORRIDO) as medicion:
+            # El escritor registra en el almacen los contenidos nuevos; los trabajadores solo lo leen
+            almacen = abrir_almacen(ruta_almacen) if particiones else None
+            escritor = EscritorIngesta(conn, almacen=almacen)
+            escritor.etapas_checkpoint = {addr: etapa_recorrido(addr) for addr, _, _ in particiones}
+            # En curso desde el principio: si falla antes del primer volcado tambien queda pendiente
+            for addr, _, _ in particiones:
+                marcar_etapa(cursor, etapa_recorrido(addr), ESTADO_EN_CURSO)
+            conn.commit()
+            try:
+                resultados = ingestar_particiones(
+                    escritor, particiones, case_name, e01_path,
+                    workers=workers or os.cpu_count() or 1,
+                    politica_hash=politica_hash, limite_hash=limite_hash,
+                    modo_recorrido=modo_recorrido, progreso=progreso.progreso_particion,
+                    ruta_almacen=ruta_almacen if almacen else None, verificar_almacen=verificar_almacen
+                )
+            finally:
+                if almacen is not None:
+                    almacen.cerrar()
+            for addr, error in resultados.items():
+                # Una particion con error queda en curso y se reintenta desde su checkpoint al reanudar
+                if error is None:
+                    marcar_etapa(cursor, etapa_recorrido(addr), ESTADO_COMPLETADA)
+            conn.commit()
+
+            for particion in progreso.instantanea()["particiones"]:
+                medicion.contar("entradas", particion["entradas"])
+                medicion.contar("bytes_hasheados", particion["bytes_hasheados"])
+            medicion.contar("particiones", len(particiones))
+            medicion.contar("particiones_con_error", sum(1 for error in resultados.values() if error is not None))
+            for clave, valor in image.estadisticas_cache().items():
+                if isinstance(valor, (int, float)):
+                    medicion.contar(f"cache_{clave}", valor)
+
+        logging.info(f"Cache EWF tras el recorrido: {image.estadisticas_cache()}")
+        fallidas = [etapa for etapa in obtener_etapas_sin_completar(cursor) if etapa.startswith(etapa_recorrido(""))]
+        if fallidas:
+            # Indices, arbol, conocidos y artefactos trabajan sobre todas las entradas: no se
+            # completan hasta que el recorrido de todas las particiones termine al reanudar
+            logging.error(f"Recorrido incompleto ({', '.join(fallidas)}): las demas etapas esperan a que se reanude")
+            restaurar_pragmas_ingesta(conn)
+            conn.close()
+            return hilos
+        if not etapa_completada(cursor, ETAPA_INDICES):
+            progreso.iniciar_etapa(ETAPA_INDICES)
+            with medir_etapa(db_path, ETAPA_INDICES):
+                crear_indices_secundarios(conn)
+                marcar_etapa(cursor, ETAPA_INDICES, ESTADO_COMPLETADA)
+                conn.commit()
+        restaurar_pragmas_ingesta(conn)
         conn.close()
 
-        extraer_artefactos(db_path, case_dir)    
+        # parent_id y depth para listar carpetas por indice (explorador del caso)
+        progreso.iniciar_etapa(ETAPA_ARBOL)
+        ejecutar_etapa(db_path, ETAPA_ARBOL, construir_arbol, db_path)
+
+        if ruta_conocidos:
+            progreso.iniciar_etapa(ETAPA_CONOCIDOS)
+            ejecutar_etapa(db_path, ETAPA_CONOCIDOS, marcar_conocidos, db_path, ruta_conocidos)
+
+        progreso.iniciar_etapa(ETAPA_ARTEFACTOS)
+        with medir_etapa(db_path, ETAPA_ARTEFACTOS):
+            extraer_artefactos(db_path, case_dir)
+
+        # Los ficheros grandes encolados se hashean mientras el analista navega el caso; con
+        # verificar_almacen tambien se verifican los hashes que se tomaron del almacen
+        if politica_hash == POLITICA_HASH_DIFERIDO or (ruta_almacen and verificar_almacen):
+            hilos.append(programar_hashes_pendientes(db_path, e01_path, ruta_almacen or "", ruta_conocidos or "",
+                                                     verificar_almacen))
+
+        completar_etapa(db_path, ETAPA_FIN)
+        progreso.iniciar_etapa(ETAPA_FIN)
+        return hilos
 
 
 
     except Exception as e:
+        if stdscr is None:
+            raise
         stdscr.addstr(0, 0, f"Error procesando imagen: {str(e)}")
         stdscr.refresh()
         stdscr.getch()
-
-
@@ -0,0 +1,116 @@
+import sqlite3
+
+from database.create_database import actualizar_checkpoint_etapa, marcar_etapa, obtener_etapa, obtener_etapas_sin_completar
+from forensic_core.metricas import medir_etapa
+
+
+'''
+Etapas registradas de la ingesta (tabla ingesta_etapa). Si digestE01 se interrumpe, al
+reabrir el caso se vuelve a llamar y solo se ejecutan las etapas que no llegaron a
+completarse; el recorrido del sistema de archivos continua desde su checkpoint.
+'''
+
+ESTADO_EN_CURSO = "en_curso"
+ESTADO_COMPLETADA = "completada"
+
+ETAPA_HASH_IMAGEN = "hash_imagen"
+ETAPA_PARTICIONES = "particiones"
+# Nombres de progreso: el recorrido se registra por particion (etapa_recorrido) y los
+# artefactos por paso (ver extraer_artefactos)
+ETAPA_RECORRIDO = "recorrido"
+ETAPA_ARTEFACTOS = "artefactos"
+ETAPA_INDICES = "indices"
+ETAPA_ARBOL = "arbol_directorios"
+ETAPA_CONOCIDOS = "ficheros_conocidos"
+ETAPA_FIN = "fin"
+# No es una etapa a ejecutar: guarda en su checkpoint el modo de recorrido elegido para el caso
+ETAPA_MODO_RECORRIDO = "modo_recorrido"
+
+
+def etapa_recorrido(partition_addr):
+    return f"recorrido_{partition_addr}"
+
+
+def etapa_completada(cursor, etapa):
+    fila = obtener_etapa(cursor, etapa)
+    return bool(fila) and fila[0] == ESTADO_COMPLETADA
+
+
+def checkpoint_etapa(cursor, etapa):
+    fila = obtener_etapa(cursor, etapa)
+    return fila[1] if fila else None
+
+
+def fijar_modo_recorrido(cursor, modo):
+    """
+    Devuelve el modo de recorrido del caso. La primera vez guarda `modo`; al reanudar se
+    mantiene el original, porque el checkpoint de cada particion depende del orden del recorrido.
+    """
+    guardado = checkpoint_etapa(cursor, ETAPA_MODO_RECORRIDO)
+    if guardado:
+        return guardado
+    marcar_etapa(cursor, ETAPA_MODO_RECORRIDO, ESTADO_COMPLETADA)
+    actualizar_checkpoint_etapa(cursor, ETAPA_MODO_RECORRIDO, modo)
+    return modo
+
+
+def ejecutar_etapa(db_path, etapa, funcion, *args, **kwargs):
+    """
+    Ejecuta funcion(*args, **kwargs) salvo que la etapa ya este completada en el caso.
+    Si la funcion lanza una excepcion la etapa queda en curso y se repetira al reanudar.
+    El tiempo de la etapa queda en stage_metrics (ver medir_etapa).
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        cursor = conn.cursor()
+        if etapa_completada(cursor, etapa):
+            return None
+        marcar_etapa(cursor, etapa, ESTADO_EN_CURSO)
+        conn.commit()
+    finally:
+        conn.close()
+
+    with medir_etapa(db_path, etapa):
+        resultado = funcion(*args, **kwargs)
+    completar_etapa(db_path, etapa)
+    return resultado
+
+
+def completar_etapa(db_path, etapa):
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        marcar_etapa(conn.cursor(), etapa, ESTADO_COMPLETADA)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def ingesta_pendiente(db_path):
+    """
+    True si el caso tiene una ingesta empezada que no llego a terminar, o que termino con
+    alguna etapa fallida (p.ej. una particion con error) que se reintentara al reanudar.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        try:
+            empezada = cursor.execute("SELECT COUNT(*) FROM ingesta_etapa").fetchone()[0] > 0
+        except sqlite3.OperationalError:
+            # Casos creados antes de registrar las etapas
+            return False
+        return empezada and (not etapa_completada(cursor, ETAPA_FIN) or bool(obtener_etapas_sin_completar(cursor)))
+    finally:
+        conn.close()
+
+
+def etapas_pendientes(db_path):
+    """
+    Etapas empezadas y no completadas del caso.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        return obtener_etapas_sin_completar(conn.cursor())
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
@@ -0,0 +1,24 @@
+import sqlite3
+
+from curses_ui.awesome_layout import AwesomeLayout
+from curses_ui.case_tree_browser import CaseTreeBrowser
+from database.create_database import arbol_disponible
+from forensic_core.arbol_directorios import construir_arbol
+
+
+def explorar_caso(db_path, case_dir):
+    layout = AwesomeLayout()
+    layout.render()
+
+    conn = sqlite3.connect(db_path)
+    disponible = arbol_disponible(conn.cursor())
+    conn.close()
+    if not disponible:
+        # Casos ingestados antes del arbol de directorios: se construye una vez y queda en el caso
+        layout.change_header("Construyendo el arbol de directorios del caso (solo la primera vez)...")
+        construir_arbol(db_path)
+
+    layout.change_header("Explorador del sistema de archivos del caso")
+    layout.change_footer("ENTER/→: abrir  ←: subir  t: tamaño del subarbol  ESC: salir")
+    CaseTreeBrowser(layout.body_win, db_path).render()
+    layout.clear()
@@ -4,6 +4,8 @@ import hashlib
 from email import policy
 from email.parser import BytesParser
 
+from forensic_core.lector_contenido import copiar_contenido
+
 def _safe_name(name: str, default="unnamed"):
     if not name:
         return default
@@ -63,7 +65,7 @@ def _sha256(path):
             h.update(chunk)
     return h.hexdigest()
 
-def export_eml(case_dir, file_entry, size, offset, chunk_size):
+def export_eml(case_dir, file_entry, size, offset, chunk_size, img=None, fs_info=None):
     """
     Exporta un archivo .eml con metadatos forenses:
       - Crea carpeta: <case_dir>/<nombre.eml>/
@@ -80,13 +82,17 @@ def export_eml(case_dir, file_entry, size, offset, chunk_size):
     # 1) Guardar copia íntegra
     eml_path = os.path.join(carpeta_destino, "original.eml")
     with open(eml_path, "wb") as f:
-        cur = offset
-        while cur < size:
-            data = file_entry.read_random(cur, min(chunk_size, size - cur))
-            if not data:
-                break
-            f.write(data)
-            cur += len(data)
+        if offset == 0:
+            # Fichero completo: lectura por data runs si se conoce la imagen
+            copiar_contenido(file_entry, size, f, img, fs_info)
+        else:
+            cur = offset
+            while cur < size:
+                data = file_entry.read_random(cur, min(chunk_size, size - cur))
+                if not data:
+                    break
+                f.write(data)
+                cur += len(data)
 
     # 2) Parsear mensaje
     with open(eml_path, "rb") as f:
@@ -1,14 +1,13 @@
 import os
-import pytsk3
 from .export_eml import export_eml
-from forensic_core.e01_reader import open_e01_image
+from forensic_core.lector_contenido import copiar_contenido
+from forensic_core.sesiones_imagen import obtener_sistema_archivos
 
 BASE_DIR_EXPORT = "exported_files"
 
 def exportar_archivo(case_dir ,ewf_path, partition_offset, path):
 
-    img = open_e01_image(ewf_path)
-    fs = pytsk3.FS_Info(img, offset=partition_offset)
+    img, fs = obtener_sistema_archivos(ewf_path, partition_offset)
     file_entry = fs.open(path)
 
     size = file_entry.info.meta.size
@@ -23,12 +22,8 @@ def exportar_archivo(case_dir ,ewf_path, partition_offset, path):
     os.makedirs(os.path.join(case_dir,BASE_DIR_EXPORT), exist_ok=True)
 
     if ".eml" in file_entry.info.name.name.decode("utf-8", errors="ignore"):
-        export_eml(case_dir=case_dir ,file_entry=file_entry, size=size, offset=offset, chunk_size=chunk_size)
+        export_eml(case_dir=case_dir ,file_entry=file_entry, size=size, offset=offset, chunk_size=chunk_size,
+                   img=img, fs_info=fs)
     else:
         with open(output_path, "wb") as f:
-            while offset < size:
-                data = file_entry.read_random(offset, min(chunk_size, size - offset))
-                if not data:
-                    break
-                f.write(data)
-                offset += len(data)
+            copiar_contenido(file_entry, size, f, img, fs)
@@ -0,0 +1,236 @@
+import heapq
+import logging
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import tempfile
+from array import array
+
+from database.create_database import asegurar_columna_known, marcar_entradas_conocidas, obtener_hashes_entradas
+
+
+'''
+Conjunto de ficheros conocidos (estilo NSRL): hashes de ficheros de sistema y aplicaciones
+que no interesan en la investigacion. Las entradas cuyo hash esta en el conjunto quedan con
+known=1 en filesystem_entry; la exportacion de archivos interesantes y la busqueda las omiten.
+
+El conjunto se construye una vez a partir de un fichero de texto o CSV (un hash por linea, o
+un CSV del NSRL: se toma cualquier columna con un MD5 o un SHA-256 en hexadecimal) y se guarda
+en un fichero binario compacto:
+
+    cabecera | MD5 ordenados (16 bytes) | tabla de prefijos | SHA-256 ordenados (32 bytes) | tabla
+
+La tabla de prefijos guarda, para cada valor de los dos primeros bytes, donde empiezan sus
+hashes. Al consultar el fichero se mapea en memoria (mmap) y se hace una busqueda binaria solo
+dentro del tramo del prefijo: con decenas de millones de hashes cada consulta toca unas pocas
+paginas y el conjunto no se carga en RAM. La construccion ordena por tramos en disco y los
+mezcla, asi que tampoco necesita tener todos los hashes en memoria.
+
+Los SHA-1 del NSRL se ignoran: la ingesta no calcula SHA-1 de los ficheros.
+'''
+
+NOMBRE_CONJUNTO = "ficheros_conocidos.idx"
+VARIABLE_CONJUNTO = "FORENSIC_FICHEROS_CONOCIDOS"
+
+MAGIA = b"FCONOC1\n"
+ALGORITMOS = (("md5", 16), ("sha256", 32))
+# magia + (numero de hashes, offset de los hashes, offset de la tabla) por algoritmo
+CABECERA = struct.Struct("<8s" + "QQQ" * len(ALGORITMOS))
+PREFIJOS = 1 << 16
+HASHES_POR_TRAMO = 1_000_000
+
+_HEX = re.compile(r"(?<![0-9A-Fa-f])([0-9A-Fa-f]{64}|[0-9A-Fa-f]{40}|[0-9A-Fa-f]{32})(?![0-9A-Fa-f])")
+
+
+def resolver_ruta_conjunto(ruta_conjunto, case_dir):
+    """
+    Ruta del conjunto de ficheros conocidos para el caso, o None si no hay ninguno.
+    Por defecto se usa <directorio de casos>/ficheros_conocidos.idx si existe.
+    """
+    if ruta_conjunto is None:
+        ruta_conjunto = os.environ.get(VARIABLE_CONJUNTO)
+    if ruta_conjunto is None:
+        ruta_conjunto = os.path.join(os.path.dirname(os.path.abspath(case_dir)), NOMBRE_CONJUNTO)
+    elif ruta_conjunto.strip().lower() in ("", "0", "off", "no"):
+        return None
+    return ruta_conjunto if os.path.isfile(ruta_conjunto) else None
+
+
+def _leer_hashes(origen):
+    # Devuelve (algoritmo, bytes) por cada hash reconocible del fichero de origen
+    with open(origen, encoding="utf-8", errors="ignore") as f:
+        for linea in f:
+            for encontrado in _HEX.findall(linea):
+                if len(encontrado) == 32:
+                    yield "md5", bytes.fromhex(encontrado)
+                elif len(encontrado) == 64:
+                    yield "sha256", bytes.fromhex(encontrado)
+
+
+def _volcar_tramo(tramo, directorio):
+    tramo.sort()
+    fd, ruta = tempfile.mkstemp(suffix=".tramo", dir=directorio)
+    with os.fdopen(fd, "wb") as f:
+        f.write(b"".join(tramo))
+    tramo.clear()
+    return ruta
+
+
+def _leer_tramo(ruta, ancho):
+    with open(ruta, "rb") as f:
+        while True:
+            bloque = f.read(ancho * 4096)
+            if not bloque:
+                return
+            for i in range(0, len(bloque), ancho):
+                yield bloque[i:i + ancho]
+
+
+def construir_conjunto(origenes, destino, hashes_por_tramo=HASHES_POR_TRAMO):
+    """
+    Construye el fichero binario del conjunto a partir de uno o varios ficheros de texto/CSV.
+    Devuelve {algoritmo: hashes distintos}.
+    """
+    if isinstance(origenes, str):
+        origenes = [origenes]
+    directorio = os.path.dirname(os.path.abspath(destino))
+    tramos = {algoritmo: [] for algoritmo, _ in ALGORITMOS}
+    pendientes = {algoritmo: [] for algoritmo, _ in ALGORITMOS}
+    try:
+        for origen in origenes:
+            for algoritmo, digest in _leer_hashes(origen):
+                pendientes[algoritmo].append(digest)
+                if len(pendientes[algoritmo]) >= hashes_por_tramo:
+                    tramos[algoritmo].append(_volcar_tramo(pendientes[algoritmo], directorio))
+        for algoritmo, _ in ALGORITMOS:
+            if pendientes[algoritmo]:
+                tramos[algoritmo].append(_volcar_tramo(pendientes[algoritmo], directorio))
+
+        temporal = destino + ".tmp"
+        secciones = []
+        with open(temporal, "wb") as f:
+            f.write(b"\0" * CABECERA.size)
+            for algoritmo, ancho in ALGORITMOS:
+                offset_hashes = f.tell()
+                # conteo[p] = hashes con prefijo p; al final se acumula en la tabla de inicios
+                conteo = array("Q", bytes(8 * (PREFIJOS + 1)))
+                anterior = None
+                total = 0
+                for digest in heapq.merge(*(_leer_tramo(ruta, ancho) for ruta in tramos[algoritmo])):
+                    if digest == anterior:
+                        continue
+                    f.write(digest)
+                    conteo[(digest[0] << 8) | digest[1]] += 1
+                    anterior = digest
+                    total += 1
+                offset_tabla = f.tell()
+                acumulado = 0
+                for prefijo in range(PREFIJOS + 1):
+                    conteo[prefijo], acumulado = acumulado, acumulado + conteo[prefijo]
+                f.write(conteo.tobytes() if total else b"")
+                secciones += [total, offset_hashes, offset_tabla]
+            f.seek(0)
+            f.write(CABECERA.pack(MAGIA, *secciones))
+        os.replace(temporal, destino)
+    finally:
+        for rutas in tramos.values():
+            for ruta in rutas:
+                os.remove(ruta)
+    return {algoritmo: secciones[i * 3] for i, (algoritmo, _) in enumerate(ALGORITMOS)}
+
+
+class ConjuntoConocidos:
+    """
+    Consulta del fichero binario del conjunto, mapeado en memoria.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._fichero = open(ruta, "rb")
+        self._mapa = mmap.mmap(self._fichero.fileno(), 0, access=mmap.ACCESS_READ)
+        valores = CABECERA.unpack_from(self._mapa, 0)
+        if valores[0] != MAGIA:
+            self.cerrar()
+            raise ValueError(f"{ruta} no es un conjunto de ficheros conocidos")
+        self._secciones = {
+            algoritmo: (ancho, *valores[1 + i * 3:4 + i * 3]) for i, (algoritmo, ancho) in enumerate(ALGORITMOS)
+        }
+
+    def __len__(self):
+        return sum(seccion[1] for seccion in self._secciones.values())
+
+    def _contiene(self, algoritmo, digest_hex):
+        ancho, total, offset_hashes, offset_tabla = self._secciones[algoritmo]
+        if not total or not digest_hex:
+            return False
+        try:
+            digest = bytes.fromhex(digest_hex.strip())
+        except ValueError:
+            return False
+        if len(digest) != ancho:
+            return False
+        bajo, alto = struct.unpack_from("<QQ", self._mapa, offset_tabla + ((digest[0] << 8) | digest[1]) * 8)
+        mapa = self._mapa
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            inicio = offset_hashes + medio * ancho
+            actual = mapa[inicio:inicio + ancho]
+            if actual == digest:
+                return True
+            if actual < digest:
+                bajo = medio + 1
+            else:
+                alto = medio
+        return False
+
+    def contiene_md5(self, md5):
+        return self._contiene("md5", md5)
+
+    def contiene_sha256(self, sha256):
+        return self._contiene("sha256", sha256)
+
+    def conocido(self, sha256=None, md5=None):
+        return self.contiene_sha256(sha256) or self.contiene_md5(md5)
+
+    def cerrar(self):
+        self._mapa.close()
+        self._fichero.close()
+
+
+def abrir_conjunto(ruta):
+    """
+    ConjuntoConocidos en ruta, o None si no hay ruta o el fichero no es valido.
+    """
+    if not ruta:
+        return None
+    try:
+        return ConjuntoConocidos(ruta)
+    except (OSError, ValueError, struct.error):
+        logging.exception(f"No se pudo abrir el conjunto de ficheros conocidos {ruta}")
+        return None
+
+
+def marcar_conocidos(db_path, ruta_conjunto):
+    """
+    Marca con known=1 las entradas del caso cuyo hash esta en el conjunto (y desmarca el
+    resto, por si el conjunto ha cambiado). Devuelve cuantas entradas son conocidas.
+    """
+    conjunto = abrir_conjunto(ruta_conjunto)
+    if conjunto is None:
+        return 0
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        asegurar_columna_known(conn)
+        cursor = conn.cursor()
+        conocidas = [
+            entry_id for entry_id, sha256, md5 in obtener_hashes_entradas(conn.cursor())
+            if conjunto.conocido(sha256, md5)
+        ]
+        marcar_entradas_conocidas(cursor, conocidas, reiniciar=True)
+        conn.commit()
+        return len(conocidas)
+    finally:
+        conn.close()
+        conjunto.cerrar()
@@ -0,0 +1,88 @@
+import hashlib
+
+try:
+    import blake3 # type: ignore
+except ImportError:
+    blake3 = None
+
+
+# BLAKE3 se añade si el paquete opcional esta instalado (se guarda en case_info.hash_blake3)
+ALGORITMOS_POR_DEFECTO = ("md5", "sha1", "sha256") + (("blake3",) if blake3 is not None else ())
+
+
+def algoritmos_disponibles():
+    disponibles = set(hashlib.algorithms_available)
+    if blake3 is not None:
+        disponibles.add("blake3")
+    return disponibles
+
+
+def nuevo_hash(algoritmo):
+    """
+    Crea un objeto hash para el algoritmo indicado ("md5", "sha1", "sha256", "blake3", ...).
+    BLAKE3 solo esta disponible si el paquete opcional `blake3` esta instalado.
+    """
+    algoritmo = algoritmo.lower()
+    if algoritmo == "blake3":
+        if blake3 is None:
+            raise ValueError("BLAKE3 requiere el paquete opcional 'blake3' (pip install blake3).")
+        return blake3.blake3()
+    if algoritmo not in hashlib.algorithms_available:
+        raise ValueError(f"Algoritmo no soportado. Usa uno de: {algoritmos_disponibles()}")
+    return hashlib.new(algoritmo)
+
+
+def nuevos_hashes(algoritmos=ALGORITMOS_POR_DEFECTO):
+    """
+    Devuelve un diccionario {algoritmo: objeto_hash} para alimentar varios digest en una sola pasada.
+    """
+    return {algoritmo.lower(): nuevo_hash(algoritmo) for algoritmo in algoritmos}
+
+
+def actualizar_hashes(hashes, data):
+    for hash_obj in hashes.values():
+        hash_obj.update(data)
+
+
+def digests_hex(hashes):
+    return {algoritmo: hash_obj.hexdigest() for algoritmo, hash_obj in hashes.items()}
+
+
+# Hash del contenido de ficheros dentro de la imagen
+ALGORITMOS_CONTENIDO = ("sha256", "md5")
+TAMANO_BLOQUE_CONTENIDO = 8 * 1024 * 1024
+
+# Politicas de hash por tamaño durante la ingesta
+POLITICA_HASH_SIEMPRE = "siempre"      # todos los ficheros, sin limite de tamaño
+POLITICA_HASH_LIMITE = "limite"        # solo ficheros menores que el limite
+POLITICA_HASH_DIFERIDO = "diferido"    # los mayores que el limite se encolan para segundo plano
+LIMITE_HASH = 10 * 1024 * 1024
+
+
+def decidir_hash(size, politica=POLITICA_HASH_DIFERIDO, limite=LIMITE_HASH):
+    """
+    Devuelve "ahora", "diferido" o None segun la politica para un fichero de ese tamaño.
+    """
+    if size is None or size <= 0:
+        return None
+    if politica == POLITICA_HASH_SIEMPRE or size < limite:
+        return "ahora"
+    if politica == POLITICA_HASH_DIFERIDO:
+        return "diferido"
+    return None
+
+
+def hashear_contenido(file_obj, size, algoritmos=ALGORITMOS_CONTENIDO, tamano_bloque=TAMANO_BLOQUE_CONTENIDO,
+                      img=None, fs_info=None):
+    """
+    Calcula varios hashes del contenido de un fichero de pytsk3 en una sola pasada,
+    leyendo por bloques para que la memoria no dependa del tamaño del fichero.
+    Con img y fs_info la lectura sigue los data runs del fichero (ver lector_contenido).
+    """
+    # Importacion diferida: las constantes de este modulo se usan sin pytsk3 (CLI, benchmarks)
+    from forensic_core.lector_contenido import iterar_contenido
+
+    hashes = nuevos_hashes(algoritmos)
+    for data in iterar_contenido(file_obj, size, img, fs_info, tamano_bloque):
+        actualizar_hashes(hashes, data)
+    return digests_hex(hashes)
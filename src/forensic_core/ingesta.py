@@ -0,0 +1,680 @@
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import pytsk3 # type: ignore
+
+from database.create_database import (
+    asegurar_columna_known, completar_hash_pendiente, desmarcar_entrada_conocida, guardar_hash_fichero, marcar_entradas_conocidas,
+    obtener_hash_entrada, obtener_hashes_pendientes, obtener_pendientes_sin_hash
+)
+from forensic_core.almacen_hashes import (
+    ORIGEN_ALMACEN, ORIGEN_CALCULADO, TAMANO_MINIMO_ALMACEN, abrir_almacen, huella_contenido, resolver_ruta_almacen
+)
+from forensic_core.ficheros_conocidos import abrir_conjunto, resolver_ruta_conjunto
+from forensic_core.hashing import LIMITE_HASH, POLITICA_HASH_DIFERIDO, decidir_hash, hashear_contenido
+
+
+'''
+Motor de ingesta productor/consumidor del sistema de archivos:
+    - Productor: el proceso principal enumera directorios y genera las filas de filesystem_entry.
+    - Trabajadores: un pool de procesos, cada uno con su propio handle pyewf/pytsk3, calcula los hashes.
+    - Escritor: el proceso principal es el unico que escribe en la base de datos del caso.
+Los lotes se escriben en el mismo orden en que se enumeran, asi los entry_id no dependen del reparto.
+Con varias particiones (ingestar_particiones) hay un hilo productor por particion con su propio
+handle de la imagen; el escritor sigue siendo uno solo y mezcla los lotes de todas.
+'''
+
+TAMANO_LOTE = 256
+LOTES_EN_VUELO_POR_TRABAJADOR = 4
+LOTES_EN_COLA_ESCRITOR = 8   # por particion, en la ingesta concurrente
+
+# Marca de fin de una particion en la cola del escritor
+FIN_PARTICION = object()
+
+# Imagen y sistema de archivos abiertos por cada proceso trabajador
+_img_trabajador = None
+_fs_trabajador = None
+_almacen_trabajador = None
+
+
+def _get_ts(attr):
+    return datetime.fromtimestamp(attr, timezone.utc) if attr else None
+
+
+def _leer_punto_control(texto):
+    # Los puntos de control se guardan en JSON; los casos anteriores guardaban el full_path tal cual
+    if texto is None:
+        return None
+    try:
+        return json.loads(texto)
+    except ValueError:
+        return texto
+
+
+def enumerar_entradas(dir_obj, parent_path, reanudar_desde=None, _posicion=()):
+    """
+    Recorre en profundidad el directorio y genera una tupla por entrada:
+    (full_path, name, ext, tipo, size, inode, mtime, atime, ctime, crtime, deleted, orphan, posicion)
+
+    posicion es el punto de control de la entrada: el indice que ocupa en cada directorio desde
+    la raiz. El orden de TSK es siempre el mismo para una imagen, asi que identifica la entrada
+    aunque haya otra con el mismo nombre (p.ej. una borrada y otra asignada).
+
+    reanudar_desde es la posicion de la ultima entrada ya guardada de un recorrido interrumpido:
+    las entradas anteriores se saltan sin abrir sus subdirectorios y se continua justo despues
+    de ella. En los casos antiguos es un full_path y se busca por nombre.
+    """
+    if isinstance(reanudar_desde, str):
+        reanudar_desde = [nombre for nombre in reanudar_desde.split("/") if nombre]
+    pendiente = list(reanudar_desde) if reanudar_desde else None
+    objetivo = pendiente[0] if pendiente else None
+    for indice, entry in enumerate(dir_obj):
+        if isinstance(objetivo, int):
+            if indice < objetivo:
+                # Guardada antes del checkpoint junto con todo su subarbol
+                continue
+            if indice > objetivo:
+                logging.error(f"Punto de control {reanudar_desde} no encontrado en {parent_path}: se continua tras el")
+                objetivo = None
+        if not entry.info.name.name or entry.info.name.name in [b".", b".."]:
+            continue
+
+        try:
+            name = entry.info.name.name.decode("utf-8", "ignore")
+            full_path = os.path.join(parent_path, name)
+            ext = os.path.splitext(name)[1].lower()
+            tipo = entry.info.meta.type if entry.info.meta else None
+            tipo = "dir" if tipo == pytsk3.TSK_FS_META_TYPE_DIR else "file"
+            size = entry.info.meta.size if entry.info.meta else 0
+            inode = entry.info.meta.addr if entry.info.meta else None
+            deleted = 1 if int(entry.info.name.flags) & int(pytsk3.TSK_FS_NAME_FLAG_UNALLOC) else 0
+            posicion = _posicion + (indice,)
+
+            fila = (
+                full_path, name, ext, tipo, size, inode,
+                _get_ts(entry.info.meta.mtime), _get_ts(entry.info.meta.atime),
+                _get_ts(entry.info.meta.ctime), _get_ts(entry.info.meta.crtime),
+                deleted, 0, posicion
+            )
+        except Exception:
+            continue
+
+        reanudar_dentro = None
+        if objetivo is not None:
+            if isinstance(objetivo, str) and name != objetivo:
+                continue
+            # Ultima entrada guardada, o un ancestor suyo: se continua dentro de su subarbol
+            # (el de la ultima guardada aun no se habia recorrido)
+            reanudar_dentro = pendiente[1:] or None
+            objetivo = None
+        else:
+            yield fila
+
+        # Recursividad en carpetas
+        if tipo == "dir":
+            try:
+                subdir = entry.as_directory()
+            except Exception:
+                if reanudar_dentro:
+                    logging.error(f"No se pudo abrir {full_path} para reanudar el recorrido")
+                continue
+            yield from enumerar_entradas(subdir, full_path, reanudar_dentro, posicion)
+    if objetivo is not None:
+        logging.error(f"Punto de control {reanudar_desde} no encontrado en {parent_path}")
+
+
+# Modos de recorrido del sistema de archivos
+MODO_RECORRIDO_DIRECTORIOS = "directorios"   # as_directory() desde la raiz
+MODO_RECORRIDO_MFT = "mft"                   # lectura secuencial de la MFT por inode (solo NTFS)
+
+RUTA_HUERFANOS = "/$OrphanFiles"
+_ESPACIO_NOMBRES_DOS = 2
+_MAX_PROFUNDIDAD_RUTA = 512
+
+
+def es_ntfs(fs_info):
+    try:
+        return int(fs_info.info.ftype) & int(pytsk3.TSK_FS_TYPE_NTFS_DETECT) != 0
+    except Exception:
+        return False
+
+
+def _nombres_ntfs(file_obj):
+    """
+    Devuelve [(nombre, inode_padre, secuencia_padre)] de los atributos $FILE_NAME del registro,
+    sin los nombres cortos DOS 8.3 (un fichero con varios enlaces duros tiene varios).
+    """
+    nombres = []
+    tipo_fname = int(pytsk3.TSK_FS_ATTR_TYPE_NTFS_FNAME)
+    for attr in file_obj:
+        info = attr.info
+        if int(info.type) != tipo_fname:
+            continue
+        try:
+            data = file_obj.read_random(0, info.size, info.type, info.id)
+        except Exception:
+            continue
+        if len(data) < 66 or data[65] == _ESPACIO_NOMBRES_DOS:
+            continue
+        referencia = int.from_bytes(data[0:8], "little")
+        nombre = data[66:66 + 2 * data[64]].decode("utf-16-le", "ignore")
+        if nombre:
+            nombres.append((nombre, referencia & 0xFFFFFFFFFFFF, referencia >> 48))
+    return nombres
+
+
+def _registros_mft(fs_info, desde=None):
+    # (inode, file_obj) de cada registro de la MFT que TSK consigue abrir, en orden
+    for inode in range(max(fs_info.info.first_inum, desde or 0), fs_info.info.last_inum + 1):
+        try:
+            file_obj = fs_info.open_meta(inode=inode)
+        except Exception:
+            continue
+        if file_obj.info.meta is None:
+            continue
+        yield inode, file_obj
+
+
+def _padre_valido(padre, secuencia_padre, directorios, raiz):
+    """
+    True si el directorio padre sigue siendo el mismo registro al que apunta la referencia.
+    Al liberar un registro NTFS incrementa su secuencia, asi que si el padre esta borrado
+    tambien vale la secuencia anterior.
+    """
+    if padre == raiz:
+        return True
+    datos = directorios.get(padre)
+    if datos is None:
+        return False
+    secuencia, borrado = datos[3], datos[4]
+    return secuencia_padre == secuencia or (borrado and secuencia_padre == secuencia - 1)
+
+
+def _ruta_directorio(inode, directorios, rutas, raiz):
+    """
+    Reconstruye la ruta de un directorio subiendo por el mapa de padres.
+    Devuelve None si la cadena se rompe (padre desaparecido o reutilizado) o tiene un ciclo.
+    """
+    cadena = []
+    actual = inode
+    while actual not in rutas:
+        if actual == raiz:
+            rutas[actual] = ""
+            break
+        datos = directorios.get(actual)
+        if datos is None or len(cadena) > _MAX_PROFUNDIDAD_RUTA:
+            return None
+        nombre, padre, secuencia_padre = datos[:3]
+        if not _padre_valido(padre, secuencia_padre, directorios, raiz):
+            return None
+        cadena.append((actual, nombre))
+        actual = padre
+
+    ruta = rutas[actual]
+    for inode_dir, nombre in reversed(cadena):
+        ruta = f"{ruta}/{nombre}"
+        rutas[inode_dir] = ruta
+    return ruta or "/"
+
+
+def enumerar_mft(fs_info, reanudar_desde=None):
+    """
+    Recorre la MFT secuencialmente por inode y genera las mismas tuplas que enumerar_entradas.
+
+    Primera pasada: mapa en memoria de los directorios (inode -> nombre, padre, secuencias).
+    Segunda pasada: una fila por nombre de cada registro con la ruta reconstruida desde las
+    referencias al padre de $FILE_NAME. Los registros no asignados salen con deleted=1 y los que
+    no tienen un padre recuperable (borrado o reutilizado) van bajo /$OrphanFiles con orphan=1.
+
+    El punto de control de cada fila (ultimo campo) es [inode, indice del nombre]: un registro
+    con varios enlaces duros genera una fila por nombre. reanudar_desde es el de la ultima fila
+    guardada y se continua con los nombres y registros posteriores; en los casos antiguos es un
+    full_path y se salta todo hasta el.
+    """
+    raiz = fs_info.info.root_inum
+    unalloc = int(pytsk3.TSK_FS_META_FLAG_UNALLOC)
+
+    directorios = {}   # inode -> (nombre, inode_padre, secuencia_padre, secuencia, borrado)
+    for inode, file_obj in _registros_mft(fs_info):
+        meta = file_obj.info.meta
+        if meta.type != pytsk3.TSK_FS_META_TYPE_DIR:
+            continue
+        nombres = _nombres_ntfs(file_obj)
+        if nombres:
+            directorios[inode] = nombres[0] + (meta.seq, bool(int(meta.flags) & unalloc))
+
+    rutas = {}
+    pendiente = reanudar_desde if isinstance(reanudar_desde, str) else None
+    ultimo_inode, ultimo_nombre = reanudar_desde if isinstance(reanudar_desde, list) else (None, None)
+    for inode, file_obj in _registros_mft(fs_info, ultimo_inode):
+        if inode == raiz:
+            continue
+        meta = file_obj.info.meta
+        tipo = "dir" if meta.type == pytsk3.TSK_FS_META_TYPE_DIR else "file"
+        deleted = 1 if int(meta.flags) & unalloc else 0
+
+        for indice, (name, padre, secuencia_padre) in enumerate(_nombres_ntfs(file_obj)):
+            if inode == ultimo_inode and indice <= ultimo_nombre:
+                continue
+            ruta_padre = None
+            if _padre_valido(padre, secuencia_padre, directorios, raiz):
+                ruta_padre = _ruta_directorio(padre, directorios, rutas, raiz)
+            orphan = 1 if ruta_padre is None else 0
+            full_path = os.path.join(RUTA_HUERFANOS if orphan else ruta_padre, name)
+
+            if pendiente is not None:
+                if full_path == pendiente:
+                    pendiente = None
+                continue
+
+            yield (
+                full_path, name, os.path.splitext(name)[1].lower(), tipo, meta.size, inode,
+                _get_ts(meta.mtime), _get_ts(meta.atime), _get_ts(meta.ctime), _get_ts(meta.crtime),
+                deleted, orphan, (inode, indice)
+            )
+    if pendiente is not None:
+        logging.error(f"Punto de control {pendiente} no encontrado en la MFT")
+
+
+def _decidir_hash_fila(fila, politica, limite):
+    _full_path, _name, _ext, tipo, size, inode = fila[:6]
+    if tipo != "file" or inode is None:
+        return None
+    return decidir_hash(size, politica, limite)
+
+
+def _hash_por_inode(fs_info, inode, size, img=None, almacen=None, reutilizar=True):
+    # Devuelve {"sha256": ..., "md5": ...} leyendo el contenido por bloques (por data runs si hay img).
+    # Con almacen, los ficheros grandes llevan "huella" (para registrarlos); con reutilizar se
+    # buscan antes por ella y un acierto vuelve con origen='almacen' sin leer el fichero entero.
+    # "leidos" son los bytes de contenido hasheados (para el progreso): no lo lleva un acierto
+    try:
+        file_obj = fs_info.open_meta(inode=inode)
+        huella = None
+        if almacen is not None and size >= TAMANO_MINIMO_ALMACEN:
+            huella = huella_contenido(file_obj, size)
+            conocido = almacen.buscar(size, huella) if reutilizar else None
+            if conocido:
+                return {**conocido, "huella": huella, "origen": ORIGEN_ALMACEN}
+        digests = hashear_contenido(file_obj, size, img=img, fs_info=fs_info)
+        digests["leidos"] = size
+        if huella:
+            digests["huella"] = huella
+        return digests
+    except Exception:
+        return None
+
+
+def _hash_del_almacen(fs_info, inode, size, almacen):
+    # {"sha256", "md5"} del almacen leyendo solo la huella; None si no es conocida
+    try:
+        huella = huella_contenido(fs_info.open_meta(inode=inode), size)
+    except Exception:
+        return None
+    return almacen.buscar(size, huella)
+
+
+def _hashear_lote_con(fs_info, trabajos, img=None, almacen=None):
+    return [_hash_por_inode(fs_info, *trabajo, img, almacen) if trabajo else None for trabajo in trabajos]
+
+
+def _iniciar_trabajador(e01_path, partition_offset, ruta_almacen=None):
+    global _img_trabajador, _fs_trabajador, _almacen_trabajador
+    from forensic_core.e01_reader import open_e01_image
+    _img_trabajador = open_e01_image(e01_path)
+    _fs_trabajador = pytsk3.FS_Info(_img_trabajador, offset=partition_offset)
+    _almacen_trabajador = abrir_almacen(ruta_almacen, solo_lectura=True)
+
+
+def _hashear_lote(trabajos):
+    return _hashear_lote_con(_fs_trabajador, trabajos, _img_trabajador, _almacen_trabajador)
+
+
+def _trabajos_de_lote(lote, politica, limite):
+    return [(fila[5], fila[4]) if _decidir_hash_fila(fila, politica, limite) == "ahora" else None for fila in lote]
+
+
+def _lotes(entradas, tamano=TAMANO_LOTE):
+    lote = []
+    for fila in entradas:
+        lote.append(fila)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _escribir_lote(escritor, lote, hashes, partition_id, case_id, partition_offset, politica, limite,
+                   verificar_almacen=False):
+    for fila, digests in zip(lote, hashes):
+        full_path, name, ext, tipo, size, inode, mtime, atime, ctime, crtime, deleted, orphan, posicion = fila
+        sha256 = digests.get("sha256") if digests else None
+        entry_id = escritor.insertar_filesystem_entry(
+            partition_id, full_path, name, ext, tipo, size,
+            inode, mtime, atime, ctime, crtime, sha256, deleted, orphan
+        )
+
+        origen = digests.get("origen", ORIGEN_CALCULADO) if digests else None
+        if sha256:
+            escritor.insertar_file_hash(entry_id, sha256, digests.get("md5"), origen)
+            if digests.get("huella"):
+                escritor.registrar_contenido(size, digests["huella"], sha256, digests.get("md5"))
+        # Con verificar_almacen el hash del almacen es provisional: la pasada en segundo plano lee
+        # el fichero entero y lo sustituye
+        verificar = verificar_almacen and origen == ORIGEN_ALMACEN
+        if verificar or (not sha256 and _decidir_hash_fila(fila, politica, limite) == "diferido"):
+            escritor.insertar_hash_pendiente(entry_id, partition_offset, inode, size)
+
+        # Insertar en línea de tiempo
+        if crtime:
+            escritor.insertar_timeline_event(case_id, "fs", entry_id, f"Archivo: {name}", crtime)
+
+        # Con todas sus filas encoladas la entrada ya puede volcarse y avanzar el checkpoint
+        escritor.fin_entrada(partition_id, posicion)
+
+
+def ingestar_directorio(escritor, fs_info, dir_obj, parent_path, partition_id, case_id,
+                        reanudar_desde=None, **opciones):
+    """
+    Ingesta el arbol que cuelga de dir_obj recorriendolo con as_directory().
+    reanudar_desde continua un recorrido interrumpido (ver enumerar_entradas).
+    """
+    entradas = enumerar_entradas(dir_obj, parent_path, reanudar_desde)
+    ingestar_entradas(escritor, fs_info, entradas, partition_id, case_id, **opciones)
+
+
+def ingestar_mft(escritor, fs_info, partition_id, case_id, reanudar_desde=None, **opciones):
+    """
+    Ingesta la particion NTFS leyendo la MFT por inode (ver enumerar_mft), incluidos
+    los registros borrados y huerfanos que el recorrido por directorios no alcanza.
+    """
+    entradas = enumerar_mft(fs_info, reanudar_desde)
+    ingestar_entradas(escritor, fs_info, entradas, partition_id, case_id, **opciones)
+
+
+def ingestar_entradas(escritor, fs_info, entradas, partition_id, case_id,
+                      e01_path=None, partition_offset=None, workers=1, img=None,
+                      politica_hash=POLITICA_HASH_DIFERIDO, limite_hash=LIMITE_HASH, ruta_almacen=None,
+                      verificar_almacen=False):
+    """
+    Guarda las filas de `entradas` en filesystem_entry, file_hash y unified_timeline
+    a traves del EscritorIngesta (volcados por lotes con executemany).
+
+    Con workers > 1 (y e01_path/partition_offset para que cada proceso abra su imagen)
+    los hashes se calculan en un pool de procesos; si no, se calculan en este proceso,
+    leyendo por data runs cuando se pasa la imagen (img) sobre la que esta montado fs_info.
+
+    politica_hash/limite_hash deciden que ficheros se hashean durante el recorrido; con
+    POLITICA_HASH_DIFERIDO los mayores que el limite quedan en hash_pendiente. Con ruta_almacen
+    se consulta el almacen de hashes compartido (ver almacen_hashes); con verificar_almacen los
+    hashes que salgan de el se encolan tambien para leerlos enteros en segundo plano.
+    """
+    if partition_offset is None:
+        partition_offset = fs_info.info.offset
+
+    def escribir(lote, hashes):
+        _escribir_lote(escritor, lote, hashes, partition_id, case_id, partition_offset, politica_hash, limite_hash,
+                       verificar_almacen)
+
+    _hashear_entradas(fs_info, entradas, escribir, e01_path, partition_offset, workers, img,
+                      politica_hash, limite_hash, ruta_almacen)
+
+
+def _hashear_entradas(fs_info, entradas, entregar, e01_path, partition_offset, workers, img,
+                      politica_hash, limite_hash, ruta_almacen=None):
+    # Agrupa las entradas en lotes, calcula sus hashes y llama a entregar(lote, hashes) en orden
+    if workers <= 1 or e01_path is None:
+        almacen = abrir_almacen(ruta_almacen, solo_lectura=True)
+        try:
+            for lote in _lotes(entradas):
+                trabajos = _trabajos_de_lote(lote, politica_hash, limite_hash)
+                entregar(lote, _hashear_lote_con(fs_info, trabajos, img, almacen))
+        finally:
+            if almacen is not None:
+                almacen.cerrar()
+        return
+
+    # spawn: los trabajadores no heredan hilos (verificacion de hash) ni handles del proceso principal
+    contexto = multiprocessing.get_context("spawn")
+    max_en_vuelo = workers * LOTES_EN_VUELO_POR_TRABAJADOR
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto,
+                             initializer=_iniciar_trabajador, initargs=(e01_path, partition_offset, ruta_almacen)) as pool:
+        en_vuelo = deque()
+
+        def entregar_mas_antiguo():
+            lote, trabajos, futuro = en_vuelo.popleft()
+            try:
+                hashes = futuro.result()
+            except Exception:
+                # Si el pool falla, se calcula el lote aqui para no perder hashes
+                hashes = _hashear_lote_con(fs_info, trabajos, img)
+            entregar(lote, hashes)
+
+        for lote in _lotes(entradas):
+            trabajos = _trabajos_de_lote(lote, politica_hash, limite_hash)
+            en_vuelo.append((lote, trabajos, pool.submit(_hashear_lote, trabajos)))
+            if len(en_vuelo) >= max_en_vuelo:
+                entregar_mas_antiguo()
+
+        while en_vuelo:
+            entregar_mas_antiguo()
+
+
+def enumerar_particion(fs_info, modo_recorrido=MODO_RECORRIDO_DIRECTORIOS, reanudar_desde=None):
+    """
+    Entradas de la particion segun el modo de recorrido; la MFT solo se lee en NTFS.
+    """
+    reanudar_desde = _leer_punto_control(reanudar_desde)
+    if modo_recorrido == MODO_RECORRIDO_MFT and es_ntfs(fs_info):
+        return enumerar_mft(fs_info, reanudar_desde)
+    return enumerar_entradas(fs_info.open_dir("/"), "/", reanudar_desde)
+
+
+class _IngestaCancelada(Exception):
+    pass
+
+
+def _recorrer_particion(particion, cola, cancelar, e01_path, workers, politica_hash, limite_hash, modo_recorrido,
+                        ruta_almacen=None):
+    """
+    Hilo productor de una particion: abre su propio handle de la imagen y su FS_Info,
+    recorre y hashea, y deja los lotes en la cola del escritor. Termina siempre con
+    (partition_id, FIN_PARTICION, error o None).
+    """
+    from forensic_core.e01_reader import open_e01_image
+
+    partition_id, partition_offset, reanudar_desde = particion
+    img = None
+
+    def poner(elemento):
+        # put con timeout para no quedarse bloqueado si el escritor ha abortado
+        while not cancelar.is_set():
+            try:
+                cola.put(elemento, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def entregar(lote, hashes):
+        if not poner((partition_id, lote, hashes)):
+            raise _IngestaCancelada()
+
+    error = None
+    try:
+        img = open_e01_image(e01_path)
+        fs_info = pytsk3.FS_Info(img, offset=partition_offset)
+        entradas = enumerar_particion(fs_info, modo_recorrido, reanudar_desde)
+        _hashear_entradas(fs_info, entradas, entregar, e01_path, partition_offset, workers, img,
+                          politica_hash, limite_hash, ruta_almacen)
+    except _IngestaCancelada:
+        return
+    except Exception as e:
+        logging.exception(f"Error recorriendo la particion {partition_id}")
+        error = e
+    finally:
+        if img is not None:
+            img.close()
+    poner((partition_id, FIN_PARTICION, error))
+
+
+def ingestar_particiones(escritor, particiones, case_id, e01_path, workers=1,
+                         politica_hash=POLITICA_HASH_DIFERIDO, limite_hash=LIMITE_HASH,
+                         modo_recorrido=MODO_RECORRIDO_DIRECTORIOS, progreso=None, ruta_almacen=None,
+                         verificar_almacen=False):
+    """
+    Recorre varias particiones a la vez, un hilo productor por particion con su propio handle
+    de la imagen y su parte del pool de hashes (workers se reparte entre ellas). El hilo que
+    llama es el unico escritor: consume los lotes de todas y los guarda con `escritor`.
+
+    particiones: lista de (partition_id, partition_offset, reanudar_desde).
+    progreso(partition_id, entradas_guardadas, bytes_hasheados, terminada), si se indica, se llama
+    tras cada lote.
+
+    Con ruta_almacen los trabajadores consultan el almacen de hashes compartido; los contenidos
+    nuevos los registra el escritor si tiene almacen (EscritorIngesta.almacen). verificar_almacen
+    como en ingestar_entradas.
+
+    Devuelve {partition_id: None si termino bien o la excepcion que la interrumpio}.
+    """
+    if not particiones:
+        return {}
+
+    offsets = {partition_id: offset for partition_id, offset, _ in particiones}
+    guardadas = dict.fromkeys(offsets, 0)
+    hasheados = dict.fromkeys(offsets, 0)
+    workers_por_particion = max(1, workers // len(particiones))
+    cola = queue.Queue(maxsize=LOTES_EN_COLA_ESCRITOR * len(particiones))
+    cancelar = threading.Event()
+
+    for particion in particiones:
+        threading.Thread(
+            target=_recorrer_particion,
+            args=(particion, cola, cancelar, e01_path, workers_por_particion,
+                  politica_hash, limite_hash, modo_recorrido, ruta_almacen),
+            name=f"recorrido-particion-{particion[0]}",
+            daemon=True
+        ).start()
+
+    resultados = {}
+    try:
+        while len(resultados) < len(particiones):
+            partition_id, lote, hashes = cola.get()
+            if lote is FIN_PARTICION:
+                resultados[partition_id] = hashes
+            else:
+                _escribir_lote(escritor, lote, hashes, partition_id, case_id, offsets[partition_id],
+                               politica_hash, limite_hash, verificar_almacen)
+                guardadas[partition_id] += len(lote)
+                hasheados[partition_id] += sum(digests.get("leidos", 0) for digests in hashes if digests)
+            if progreso:
+                progreso(partition_id, guardadas[partition_id], hasheados[partition_id], partition_id in resultados)
+        escritor.vaciar()
+    except BaseException:
+        cancelar.set()
+        raise
+    return resultados
+
+
+def procesar_hashes_pendientes(db_path, e01_path, ruta_almacen=None, ruta_conocidos=None, verificar_almacen=False):
+    """
+    Calcula en streaming los hashes de los ficheros encolados en hash_pendiente
+    y los guarda en filesystem_entry y file_hash. Devuelve cuantos se procesaron.
+    Son los ficheros grandes: antes de leerlos enteros se consulta el almacen de hashes.
+    Los que ya tienen un hash del almacen estan encolados para verificarlos (ver
+    almacen_hashes) y se leen siempre enteros. Con verificar_almacen, los que aun no tienen
+    hash toman antes uno provisional del almacen y tambien se verifican.
+    Los que estan en el conjunto de ficheros conocidos se marcan con known=1.
+    """
+    from forensic_core.e01_reader import open_e01_image
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    cursor = conn.cursor()
+    almacen = abrir_almacen(resolver_ruta_almacen(ruta_almacen, os.path.dirname(db_path)))
+    conjunto = abrir_conjunto(resolver_ruta_conjunto(ruta_conocidos, os.path.dirname(db_path)))
+    if conjunto is not None:
+        asegurar_columna_known(conn)
+    img = None
+    sistemas = {}
+    procesados = 0
+
+    def sistema(partition_offset):
+        nonlocal img
+        if partition_offset not in sistemas:
+            if img is None:
+                img = open_e01_image(e01_path)
+            try:
+                sistemas[partition_offset] = pytsk3.FS_Info(img, offset=partition_offset)
+            except Exception:
+                sistemas[partition_offset] = None
+        return sistemas[partition_offset]
+
+    try:
+        # Hashes provisionales: solo se lee la huella, el caso tiene hash mientras se verifica
+        if almacen is not None and verificar_almacen:
+            for entry_id, partition_offset, inode, size in obtener_pendientes_sin_hash(cursor):
+                fs_info = sistema(partition_offset)
+                if fs_info is None or size < TAMANO_MINIMO_ALMACEN:
+                    continue
+                conocido = _hash_del_almacen(fs_info, inode, size, almacen)
+                if conocido:
+                    guardar_hash_fichero(cursor, entry_id, conocido["sha256"], conocido["md5"], ORIGEN_ALMACEN)
+                    conn.commit()
+
+        while True:
+            pendientes = obtener_hashes_pendientes(cursor)
+            if not pendientes:
+                break
+            for entry_id, partition_offset, inode, size in pendientes:
+                fs_info = sistema(partition_offset)
+                previo, _size, origen_previo = obtener_hash_entrada(cursor, entry_id) or (None, None, None)
+                verificar = origen_previo == ORIGEN_ALMACEN
+                digests = _hash_por_inode(fs_info, inode, size, img, almacen, reutilizar=not verificar) if fs_info else None
+                digests = digests or {}
+                cambiado = verificar and digests.get("sha256") and digests["sha256"] != previo
+                if cambiado:
+                    logging.warning(f"El hash del almacen de la entrada {entry_id} no coincide con el contenido "
+                                    f"({previo} frente a {digests['sha256']}); se sustituye por el calculado")
+                # Commit por fichero: el bloqueo de escritura solo dura lo que tardan unas pocas sentencias
+                completar_hash_pendiente(cursor, entry_id, digests.get("sha256"), digests.get("md5"),
+                                         digests.get("origen", ORIGEN_CALCULADO))
+                if conjunto is not None and conjunto.conocido(digests.get("sha256"), digests.get("md5")):
+                    marcar_entradas_conocidas(cursor, [entry_id])
+                elif conjunto is not None and cambiado:
+                    desmarcar_entrada_conocida(cursor, entry_id)
+                conn.commit()
+                # Si la huella ya tenia otro sha256, el almacen deja de reutilizarla (ver AlmacenHashes.buscar)
+                if digests.get("huella"):
+                    almacen.registrar([(size, digests["huella"], digests["sha256"], digests.get("md5"))])
+                procesados += 1
+    finally:
+        conn.close()
+        if almacen is not None:
+            almacen.cerrar()
+        if conjunto is not None:
+            conjunto.cerrar()
+    return procesados
+
+
+def programar_hashes_pendientes(db_path, e01_path, ruta_almacen=None, ruta_conocidos=None, verificar_almacen=False):
+    """
+    Lanza procesar_hashes_pendientes en un hilo en segundo plano.
+    """
+    hilo = threading.Thread(
+        target=procesar_hashes_pendientes,
+        args=(db_path, e01_path, ruta_almacen, ruta_conocidos, verificar_almacen),
+        name="hashes-pendientes",
+        daemon=True
+    )
+    hilo.start()
+    return hilo
@@ -0,0 +1,133 @@
+import pytsk3 # type: ignore
+
+
+TAMANO_LECTURA_RUN = 8 * 1024 * 1024
+TAMANO_LECTURA_RANDOM = 1024 * 1024
+
+
+def _flag_activo(flags, flag):
+    return bool(int(flags) & int(flag))
+
+
+def _atributo_datos(file_obj):
+    """
+    Devuelve el atributo de datos por defecto (sin nombre, no residente, sin comprimir ni cifrar)
+    o None si el fichero debe leerse con read_random.
+    """
+    tipos_datos = (int(pytsk3.TSK_FS_ATTR_TYPE_NTFS_DATA), int(pytsk3.TSK_FS_ATTR_TYPE_DEFAULT))
+    for attr in file_obj:
+        info = attr.info
+        if int(info.type) not in tipos_datos or info.name:
+            continue
+        if not _flag_activo(info.flags, pytsk3.TSK_FS_ATTR_NONRES):
+            return None
+        if _flag_activo(info.flags, pytsk3.TSK_FS_ATTR_COMP) or _flag_activo(info.flags, pytsk3.TSK_FS_ATTR_ENC):
+            return None
+        return attr
+    return None
+
+
+def obtener_runs(file_obj, fs_info, size):
+    """
+    Resuelve una sola vez los data runs del fichero.
+
+    Returns:
+        tuple: (runs, initsize) con runs = [(offset_logico, offset_en_imagen | None si es disperso, longitud)]
+               en bytes y ordenados, o None si el fichero no admite lectura por runs.
+    """
+    try:
+        attr = _atributo_datos(file_obj)
+        if attr is None:
+            return None
+
+        block_size = fs_info.info.block_size
+        fs_offset = fs_info.info.offset
+        runs = []
+        for run in attr:
+            if _flag_activo(run.flags, pytsk3.TSK_FS_ATTR_RUN_FLAG_FILLER):
+                # TSK no conoce la ubicacion real de este tramo
+                return None
+            logico = run.offset * block_size
+            longitud = run.len * block_size
+            if _flag_activo(run.flags, pytsk3.TSK_FS_ATTR_RUN_FLAG_SPARSE):
+                runs.append((logico, None, longitud))
+            else:
+                runs.append((logico, fs_offset + run.addr * block_size, longitud))
+
+        # Bytes por encima del tamaño inicializado se leen como ceros (igual que read_random)
+        try:
+            initsize = attr.info.nrd.initsize
+        except AttributeError:
+            initsize = size
+        return sorted(runs), min(initsize, size)
+    except Exception:
+        return None
+
+
+def _ceros(longitud, tamano_bloque):
+    while longitud > 0:
+        n = min(tamano_bloque, longitud)
+        yield bytes(n)
+        longitud -= n
+
+
+def _iterar_read_random(file_obj, size, inicio=0, tamano_bloque=TAMANO_LECTURA_RANDOM):
+    cur = inicio
+    while cur < size:
+        data = file_obj.read_random(cur, min(tamano_bloque, size - cur))
+        if not data:
+            break
+        yield data
+        cur += len(data)
+
+
+def iterar_contenido(file_obj, size, img=None, fs_info=None, tamano_bloque=TAMANO_LECTURA_RUN):
+    """
+    Genera el contenido del fichero por bloques.
+
+    Con img y fs_info lee directamente de la imagen siguiendo los data runs: lecturas grandes y
+    contiguas por run, y los runs dispersos se rellenan con ceros sin tocar la imagen. Si el
+    fichero es residente, comprimido, cifrado o algo falla, se usa read_random como siempre.
+    """
+    resultado = obtener_runs(file_obj, fs_info, size) if img is not None and fs_info is not None else None
+    if resultado is None:
+        yield from _iterar_read_random(file_obj, size)
+        return
+
+    runs, initsize = resultado
+    producido = 0
+    for logico, fisico, longitud in runs:
+        if producido >= initsize:
+            break
+        if logico > producido:
+            # Hueco entre runs: no hay clusters asignados
+            yield from _ceros(min(logico, initsize) - producido, tamano_bloque)
+            producido = min(logico, initsize)
+        fin = min(logico + longitud, initsize)
+        if fisico is None:
+            yield from _ceros(fin - producido, tamano_bloque)
+            producido = max(producido, fin)
+            continue
+        while producido < fin:
+            n = min(tamano_bloque, fin - producido)
+            data = img.read(fisico + (producido - logico), n)
+            if not data:
+                # Lectura corta de la imagen: seguir por la via de TSK desde aqui
+                yield from _iterar_read_random(file_obj, size, inicio=producido)
+                return
+            yield data
+            producido += len(data)
+
+    if producido < size:
+        yield from _ceros(size - producido, tamano_bloque)
+
+
+def copiar_contenido(file_obj, size, destino, img=None, fs_info=None):
+    """
+    Escribe el contenido del fichero en el fichero abierto `destino`. Devuelve los bytes escritos.
+    """
+    escritos = 0
+    for data in iterar_contenido(file_obj, size, img, fs_info):
+        destino.write(data)
+        escritos += len(data)
+    return escritos
@@ -0,0 +1,167 @@
+import cProfile
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from database.create_database import insertar_stage_metric
+
+
+'''
+Instrumentacion de la ingesta: medir_etapa envuelve una etapa y guarda en stage_metrics del
+caso su duracion, tiempo de CPU y los contadores que la etapa haya ido sumando.
+
+El perfilado es opcional y se activa con la variable de entorno FORENSIC_PERFIL:
+    FORENSIC_PERFIL=cprofile             volcado .prof de cada etapa (solo el hilo que la ejecuta)
+    FORENSIC_PERFIL=tracemalloc          pico de memoria de Python de cada etapa
+    FORENSIC_PERFIL=cprofile,tracemalloc ambos
+Los volcados van a FORENSIC_PERFIL_DIR o, si no se indica, a <caso>/perfiles.
+'''
+
+VARIABLE_PERFIL = "FORENSIC_PERFIL"
+VARIABLE_DIR_PERFIL = "FORENSIC_PERFIL_DIR"
+
+_lock = threading.Lock()
+_ejecucion = None
+_perfilando = threading.local()
+# Mediciones abiertas con tracemalloc: reset_peak es global y borraria su pico
+_midiendo_memoria = []
+
+
+def iniciar_ejecucion():
+    """
+    Marca el inicio de una ejecucion: las etapas medidas a partir de aqui se agrupan bajo ella.
+    """
+    global _ejecucion
+    with _lock:
+        _ejecucion = datetime.now(timezone.utc).isoformat()
+        return _ejecucion
+
+
+def ejecucion_actual():
+    global _ejecucion
+    with _lock:
+        if _ejecucion is None:
+            _ejecucion = datetime.now(timezone.utc).isoformat()
+        return _ejecucion
+
+
+def modos_perfil():
+    valor = os.environ.get(VARIABLE_PERFIL, "")
+    return {modo.strip().lower() for modo in valor.split(",") if modo.strip()}
+
+
+class MedicionEtapa:
+    """
+    Resultado de una etapa medida; la etapa puede sumar contadores mientras se ejecuta.
+    """
+
+    def __init__(self, etapa):
+        self.etapa = etapa
+        self.inicio = datetime.now(timezone.utc).isoformat()
+        self.duracion = None
+        self.cpu = None
+        self.memoria_pico = None
+        # Pico anterior a un reset_peak de una etapa anidada
+        self.memoria_pico_previo = 0
+        self.perfil = None
+        self.error = None
+        self.contadores = {}
+
+    def contar(self, nombre, cantidad=1):
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+
+def _ruta_perfil(db_path, etapa):
+    directorio = os.environ.get(VARIABLE_DIR_PERFIL) or os.path.join(os.path.dirname(db_path), "perfiles")
+    os.makedirs(directorio, exist_ok=True)
+    nombre = "".join(c if c.isalnum() or c in "-_." else "_" for c in etapa)
+    return os.path.join(directorio, f"{ejecucion_actual().replace(':', '-')}_{nombre}.prof")
+
+
+@contextmanager
+def medir_etapa(db_path, etapa):
+    """
+    with medir_etapa(db_path, "recorrido") as medicion:
+        ...
+        medicion.contar("entradas", n)
+
+    Al salir (tambien si la etapa falla) inserta la medicion en stage_metrics. Las etapas
+    anidadas se miden igual, pero solo la mas externa de cada hilo se perfila con cProfile.
+    Con tracemalloc, antes de que una etapa anidada reinicie el pico se guarda en las etapas
+    abiertas, que al salir se quedan con el mayor de los dos.
+    """
+    medicion = MedicionEtapa(etapa)
+    modos = modos_perfil()
+
+    perfil = None
+    if "cprofile" in modos and not getattr(_perfilando, "activo", False):
+        perfil = cProfile.Profile()
+        _perfilando.activo = True
+
+    iniciado_tracemalloc = False
+    if "tracemalloc" in modos:
+        with _lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                iniciado_tracemalloc = True
+            else:
+                pico = tracemalloc.get_traced_memory()[1]
+                for abierta in _midiendo_memoria:
+                    abierta.memoria_pico_previo = max(abierta.memoria_pico_previo, pico)
+                tracemalloc.reset_peak()
+            _midiendo_memoria.append(medicion)
+
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+    if perfil:
+        perfil.enable()
+    try:
+        yield medicion
+    except BaseException as e:
+        medicion.error = repr(e)
+        raise
+    finally:
+        if perfil:
+            perfil.disable()
+            _perfilando.activo = False
+        medicion.duracion = time.perf_counter() - inicio
+        medicion.cpu = time.process_time() - inicio_cpu
+        if "tracemalloc" in modos:
+            with _lock:
+                if tracemalloc.is_tracing():
+                    medicion.memoria_pico = max(tracemalloc.get_traced_memory()[1], medicion.memoria_pico_previo)
+                    if iniciado_tracemalloc:
+                        tracemalloc.stop()
+                if medicion in _midiendo_memoria:
+                    _midiendo_memoria.remove(medicion)
+        if perfil:
+            try:
+                medicion.perfil = _ruta_perfil(db_path, etapa)
+                perfil.dump_stats(medicion.perfil)
+            except OSError:
+                logging.exception(f"No se pudo guardar el perfil de la etapa {etapa}")
+                medicion.perfil = None
+        guardar_medicion(db_path, medicion)
+
+
+def guardar_medicion(db_path, medicion):
+    # Las metricas son informativas: un fallo al guardarlas no interrumpe la ingesta
+    try:
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            insertar_stage_metric(
+                conn.cursor(), ejecucion_actual(), medicion.etapa, medicion.inicio, medicion.duracion,
+                medicion.cpu, medicion.memoria_pico, json.dumps(medicion.contadores) if medicion.contadores else None,
+                medicion.perfil, medicion.error
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        logging.exception(f"No se pudieron guardar las metricas de la etapa {medicion.etapa}")
+    logging.info(f"Etapa {medicion.etapa}: {medicion.duracion:.2f}s (CPU {medicion.cpu:.2f}s) {medicion.contadores}")
@@ -0,0 +1,163 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+
+'''
+Progreso de la ingesta. digestE01 publica eventos estructurados (etapa actual, bytes hasheados,
+entradas por segundo, particion, ETA) en un ProgresoIngesta:
+    - La interfaz lee instantanea() cuando quiere repintar; publicar solo actualiza contadores
+      bajo un lock, asi el pipeline no espera nunca a la pantalla.
+    - Si se indica ruta_log, los eventos se escriben como JSON lines (uno por linea, como mucho
+      uno cada `intervalo` segundos por fuente, mas los cambios de etapa y los finales) para
+      analizar despues el rendimiento de la ingesta.
+'''
+
+INTERVALO_PUBLICACION = 0.5
+
+
+def formatear_bytes(n):
+    for unidad in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.1f} {unidad}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def formatear_tiempo(segundos):
+    if segundos is None:
+        return "--:--"
+    segundos = int(segundos)
+    horas, resto = divmod(segundos, 3600)
+    minutos, segundos = divmod(resto, 60)
+    return f"{horas}:{minutos:02d}:{segundos:02d}" if horas else f"{minutos:02d}:{segundos:02d}"
+
+
+def _eta(hecho, total, velocidad):
+    if not total or not velocidad or hecho >= total:
+        return None
+    return (total - hecho) / velocidad
+
+
+class ProgresoIngesta:
+    """
+    Estado compartido del progreso de una ingesta, seguro entre hilos.
+    """
+
+    def __init__(self, ruta_log=None, intervalo=INTERVALO_PUBLICACION):
+        self._lock = threading.Lock()
+        self.intervalo = intervalo
+        self.inicio = time.monotonic()
+        self.etapa = None
+        self.inicio_etapa = self.inicio
+        self.imagen = None        # {"leidos", "total", "inicio"}
+        self.particiones = {}     # partition_id -> {"entradas", "bytes_hasheados", "total_estimado", "terminada", "inicio"}
+        self._ultima_escritura = {}
+        self._log = open(ruta_log, "a", encoding="utf-8") if ruta_log else None
+
+    def iniciar_etapa(self, etapa):
+        with self._lock:
+            self.etapa = etapa
+            self.inicio_etapa = time.monotonic()
+            self._publicar("etapa", {"etapa": etapa}, forzar=True)
+
+    def progreso_imagen(self, leidos, total):
+        """
+        Callback de calcular_hashes_E01: (bytes_leidos, bytes_totales).
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            if self.imagen is None:
+                self.imagen = {"inicio": ahora}
+            self.imagen["leidos"] = leidos
+            self.imagen["total"] = total
+            self._publicar("imagen", self._datos_imagen(ahora), forzar=leidos >= total)
+
+    def estimar_particion(self, partition_id, total_estimado):
+        # Numero aproximado de entradas de la particion (p.ej. registros de la MFT) para la ETA
+        with self._lock:
+            self._particion(partition_id)["total_estimado"] = total_estimado
+
+    def progreso_particion(self, partition_id, entradas, bytes_hasheados, terminada):
+        """
+        Callback de ingestar_particiones.
+        """
+        with self._lock:
+            datos = self._particion(partition_id)
+            datos["entradas"] = entradas
+            datos["bytes_hasheados"] = bytes_hasheados
+            datos["terminada"] = terminada
+            self._publicar(f"particion_{partition_id}", self._datos_particion(partition_id, time.monotonic()),
+                           forzar=terminada)
+        if terminada:
+            logging.info(f"Particion {partition_id} recorrida: {entradas} entradas guardadas")
+
+    def instantanea(self):
+        """
+        Copia del estado actual con velocidades y ETA calculadas, para pintarla.
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            return {
+                "etapa": self.etapa,
+                "transcurrido": ahora - self.inicio,
+                "imagen": self._datos_imagen(ahora) if self.imagen else None,
+                "particiones": [self._datos_particion(pid, ahora) for pid in sorted(self.particiones)],
+            }
+
+    def cerrar(self):
+        with self._lock:
+            if self._log:
+                self._log.close()
+                self._log = None
+
+    def _particion(self, partition_id):
+        if partition_id not in self.particiones:
+            self.particiones[partition_id] = {
+                "entradas": 0, "bytes_hasheados": 0, "total_estimado": None,
+                "terminada": False, "inicio": time.monotonic()
+            }
+        return self.particiones[partition_id]
+
+    def _datos_imagen(self, ahora):
+        leidos, total = self.imagen.get("leidos", 0), self.imagen.get("total", 0)
+        velocidad = leidos / max(ahora - self.imagen["inicio"], 1e-6)
+        return {
+            "bytes_hasheados": leidos, "bytes_totales": total,
+            "bytes_por_seg": velocidad, "eta_seg": _eta(leidos, total, velocidad),
+        }
+
+    def _datos_particion(self, partition_id, ahora):
+        datos = self.particiones[partition_id]
+        transcurrido = max(ahora - datos["inicio"], 1e-6)
+        por_seg = datos["entradas"] / transcurrido
+        return {
+            "particion": partition_id,
+            "entradas": datos["entradas"],
+            "entradas_por_seg": por_seg,
+            "bytes_hasheados": datos["bytes_hasheados"],
+            "bytes_por_seg": datos["bytes_hasheados"] / transcurrido,
+            "total_estimado": datos["total_estimado"],
+            "eta_seg": None if datos["terminada"] else _eta(datos["entradas"], datos["total_estimado"], por_seg),
+            "terminada": datos["terminada"],
+        }
+
+    def _publicar(self, fuente, datos, forzar=False):
+        # Se llama con el lock tomado
+        if self._log is None:
+            return
+        ahora = time.monotonic()
+        if not forzar and ahora - self._ultima_escritura.get(fuente, 0) < self.intervalo:
+            return
+        self._ultima_escritura[fuente] = ahora
+        evento = {
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "transcurrido": round(ahora - self.inicio, 3),
+            "etapa": self.etapa,
+            "fuente": fuente,
+            **datos
+        }
+        self._log.write(json.dumps(evento) + "\n")
+        self._log.flush()
@@ -1,18 +1,16 @@
 import sqlite3
 import os
 from curses_ui.search_files_menu import SearchFilesMenu
-from forensic_core.e01_reader import open_e01_image
 from curses_ui.awesome_layout import AwesomeLayout
-from curses_ui.awesome_input import AwesomeInput
-from curses_ui.awesome_menu2 import AwesomeMenu
+from curses_ui.incremental_search_input import IncrementalSearchInput
 from curses_ui.file_viewer_panel import FileViewerPanel
-import pytsk3
-import pyewf
 import curses
-import textwrap
-import requests
+from database.create_database import asegurar_columna_known, crear_indice_rutas, indice_rutas_disponible, obtener_hash_entrada
+from forensic_core.almacen_hashes import describir_origen
+from forensic_core.busqueda import compilar_consulta
 from forensic_core.export_file import exportar_archivo
-from dotenv import load_dotenv, find_dotenv
+from forensic_core.lector_contenido import iterar_contenido
+from forensic_core.sesiones_imagen import obtener_sistema_archivos
 
 
 def _popup_scroll(win, title, body):
@@ -49,6 +47,9 @@ def _fmt_ts(ts):
         return "N/A"
 
 def vt_query_and_format(sha256, api_key):
+    # requests solo hace falta al consultar VirusTotal: no se importa al arrancar
+    import requests
+
     if not sha256 or not str(sha256).strip():
         return "No se puede consultar: SHA-256 no disponible."
     try:
@@ -115,6 +116,8 @@ def vt_query_and_format(sha256, api_key):
 
 
 def show_virustotal_popup(win, sha256):
+    from dotenv import find_dotenv, load_dotenv
+
     load_dotenv(find_dotenv())
     api_key = os.getenv("APIVIRUSTOTAL")
     if not api_key:
@@ -128,33 +131,59 @@ def show_virustotal_popup(win, sha256):
 
 def search_files(db_path, case_dir):
     conn = sqlite3.connect(db_path)
+    asegurar_columna_known(conn)
     cursor = conn.cursor()
     layout = AwesomeLayout()
     layout.render()
-    layout.change_header("Introduce el parametro de busqueda")
-    layout.change_footer("Presiona ENTER para buscar, ESC para salir")
 
-    query = AwesomeInput(layout.body_win).render()
+    if not indice_rutas_disponible(cursor):
+        # Casos ingestados antes del indice trigram: se construye una vez y queda en el caso
+        layout.change_header("Indexando las rutas del caso (solo la primera vez)...")
+        crear_indice_rutas(conn)
 
-    if query is None:
-        layout.clear()
-        return
+    layout.change_header("Introduce el parametro de busqueda (p.ej. factura ext:.pdf size>1M mtime:2023)")
+    layout.change_footer("Los resultados aparecen mientras escribes. ENTER: ver todos, ESC: salir")
+
+    # Texto suelto: subcadena de la ruta; el resto de filtros en forensic_core.busqueda.
+    # Mientras se escribe se muestran los primeros resultados; ENTER abre la lista completa
+    query = ""
+    while True:
+        query = IncrementalSearchInput(layout.body_win, db_path, default_text=query).render()
+        if query is None:
+            conn.close()
+            layout.clear()
+            return
+        try:
+            consulta = compilar_consulta(cursor, query)
+            break
+        except ValueError as e:
+            layout.change_header(f"Error en la busqueda: {e}")
 
-    cursor.execute("SELECT * FROM filesystem_entry WHERE type !='dir' AND full_path LIKE ?", ('%' + query + '%',))
-    results = cursor.fetchall()
+    # Resultados leidos por paginas segun se desplaza el menu. Los ficheros conocidos (NSRL) se
+    # ocultan salvo known:yes|all; solo se indica cuantos hay
+    results = consulta.resultados(db_path)
     conn.close()
-    if not results:
+    results.asegurar(1)
+    if not len(results):
+        results.cerrar()
         print("No se encontraron resultados.")
         return
     layout.change_header(f"Busqueda: {query}")
     layout.change_footer("Presiona ENTER para seleccionar, ESC para salir")
 
+    def estado(fila):
+        if results.contando:
+            return f" {fila + 1} de {len(results)}{'' if results.completo else '+'} (contando...) ", False
+        total = results.total if results.total is not None else len(results)
+        ocultos = f", {results.ocultos} conocidos ocultos" if results.ocultos else ""
+        return f" {fila + 1} de {total}{ocultos} ", True
 
     menu = SearchFilesMenu(
         title="Resultados de la busqueda, presiona ENTER para seleccionar, ESC para salir",
-        options=[f"{result[3]} ({result[6]} bytes)" for result in results],
-        info=[result[2] for result in results],
-        win=layout.body_win)
+        options=results.vista(lambda result: f"{result[3]} ({result[6]} bytes)"),
+        info=results.vista(lambda result: result[2]),
+        win=layout.body_win,
+        estado=estado)
     selected = menu.render()
     
     while selected is not None:
@@ -179,12 +208,10 @@ def search_files(db_path, case_dir):
         cursor.execute("SELECT e01_path FROM case_info")
         path = cursor.fetchall()
 
-        sha_row = cursor.execute(
-            "SELECT sha256, size FROM filesystem_entry WHERE entry_id = ?",
-            (selected_file[0],)
-        ).fetchone()
+        sha_row = obtener_hash_entrada(cursor, selected_file[0])
         sha256_db = sha_row[0] if sha_row else None
         size_db   = sha_row[1] if sha_row else None
+        origen_db = sha_row[2] if sha_row else None
 
         conn.close()
 
@@ -197,6 +224,7 @@ def search_files(db_path, case_dir):
 
         if sha256_db and str(sha256_db).strip():
             metadata2["SHA-256"] = str(sha256_db).strip()
+            metadata2["Origen del hash"] = describir_origen(origen_db)
         else:
             if (size_db == 0) or (size_db is None and selected_file[6] == 0):
                 metadata2["SHA-256"] = "— (no calculado: tamaño 0 bytes)"
@@ -231,15 +259,15 @@ def search_files(db_path, case_dir):
         layout.change_footer("Presiona ESC para salir")
         selected = menu.render()
     
+    results.cerrar()
     if selected is None:
         layout.clear()
         return
     selected_file = results[selected]
     return selected_file
 
-def extract_file_info2(img, partition_offset, path, layout):
+def extract_file_info2(img, fs, path, layout):
     try:
-        fs = pytsk3.FS_Info(img, offset=partition_offset)
         file_obj = fs.open(path)
         meta = file_obj.info.meta
         if meta is None or meta.size is None:
@@ -250,15 +278,7 @@ def extract_file_info2(img, partition_offset, path, layout):
             raise ValueError("Tamaño del archivo no es válido.")
         if size > 10 * 1024 * 1024:
             raise ValueError("Archivo muy grande para mostrarlo por pantalla.")
-        offset = 0
-        while offset < size:
-            chunk = file_obj.read_random(offset, min(4096, size - offset))
-            if not isinstance(chunk, bytes):
-                raise ValueError(f"Esperado un objeto 'bytes', pero se encontró {type(chunk)}.")
-            if not chunk:
-                break
-            content += chunk
-            offset += len(chunk)
+        content = b"".join(iterar_contenido(file_obj, size, img, fs))
         return file_obj, content
     except Exception as e:
         layout.change_footer(f"Error al extraer el archivo: {str(e)}")
@@ -304,8 +324,12 @@ def prepare_content_lines(content: bytes) -> list[str]:
 
 
 def get_info_file2(ewf_path, partition_offset, path, layout):
-    img = open_e01_image(ewf_path)
-    file_obj, content = extract_file_info2(img, partition_offset, path, layout)
+    try:
+        img, fs = obtener_sistema_archivos(ewf_path, partition_offset)
+    except Exception as e:
+        layout.change_footer(f"Error al montar la particion: {str(e)}")
+        return {}, []
+    file_obj, content = extract_file_info2(img, fs, path, layout)
     
     if file_obj is None:
         layout.change_footer("No se pudo abrir el archivo.")
@@ -0,0 +1,53 @@
+import threading
+
+
+'''
+Sesiones de imagen por caso: cada .E01 se abre una sola vez y cada particion se monta una
+sola vez, en la primera operacion que lo necesite. Exportaciones, visor de ficheros y
+extraccion de hives comparten los mismos handles hasta que se cierra el caso.
+'''
+
+_lock = threading.Lock()
+_imagenes = {}   # e01_path -> EWFImgInfo
+_sistemas = {}   # (e01_path, partition_offset) -> pytsk3.FS_Info
+
+
+def obtener_imagen(e01_path):
+    from forensic_core.e01_reader import open_e01_image
+
+    with _lock:
+        img = _imagenes.get(e01_path)
+        if img is None:
+            img = open_e01_image(e01_path)
+            _imagenes[e01_path] = img
+        return img
+
+
+def obtener_sistema_archivos(e01_path, partition_offset):
+    """
+    Devuelve (img, fs_info) de la sesion; monta la particion si aun no lo estaba.
+    """
+    img = obtener_imagen(e01_path)
+    clave = (e01_path, partition_offset)
+    with _lock:
+        fs = _sistemas.get(clave)
+        if fs is None:
+            import pytsk3 # type: ignore
+
+            fs = pytsk3.FS_Info(img, offset=partition_offset)
+            _sistemas[clave] = fs
+        return img, fs
+
+
+def cerrar_sesiones():
+    """
+    Libera todos los sistemas de archivos e imagenes abiertos (al salir del caso).
+    """
+    with _lock:
+        _sistemas.clear()
+        for img in _imagenes.values():
+            try:
+                img.close()
+            except Exception:
+                pass
+        _imagenes.clear()
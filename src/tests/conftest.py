@@ -0,0 +1,25 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# Los modulos se importan como en main.py, desde src
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.create_database import crear_base_de_datos  # noqa: E402
+
+
+@pytest.fixture
+def db_caso(tmp_path):
+    # Caso vacio con el esquema completo, indices incluidos
+    ruta = str(tmp_path / "caso.db")
+    crear_base_de_datos(ruta)
+    return ruta
+
+
+@pytest.fixture
+def conn_caso(db_caso):
+    conn = sqlite3.connect(db_caso)
+    yield conn
+    conn.close()
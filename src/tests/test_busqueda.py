@@ -0,0 +1,134 @@
+import time
+
+import pytest
+
+from database.create_database import insertar_file_hash, insertar_filesystem_entry, marcar_entradas_conocidas
+from forensic_core.busqueda import compilar_consulta
+
+
+def _resultados(db_caso, conn, texto, **opciones):
+    resultados = compilar_consulta(conn.cursor(), texto).resultados(db_caso, **opciones)
+    resultados.asegurar(10 ** 6)
+    while resultados.contando:
+        time.sleep(0.01)
+    return resultados
+
+
+def _nombres(db_caso, conn, texto):
+    resultados = _resultados(db_caso, conn, texto)
+    try:
+        return sorted(resultados[i][3] for i in range(len(resultados)))
+    finally:
+        resultados.cerrar()
+
+
+@pytest.fixture
+def caso(db_caso, conn_caso):
+    cursor = conn_caso.cursor()
+    filas = [
+        ("/Users/jimmy/Documents", "Documents", None, "dir", 0, "2023-01-10 10:00:00", 0),
+        ("/Users/jimmy/Documents/factura_01.pdf", "factura_01.pdf", ".pdf", "file", 2048, "2023-01-15 09:30:00", 0),
+        ("/Users/jimmy/Documents/factura_02.pdf", "factura_02.pdf", ".pdf", "file", 500, "2023-04-02 12:00:00", 0),
+        ("/Users/jimmy/Documents/notas.docx", "notas.docx", ".docx", "file", 5 * 1024 ** 2, "2022-12-31 23:59:59", 0),
+        ("/Users/ana/mis documentos/plan.txt", "plan.txt", ".txt", "file", 10, "2023-02-01 00:00:00", 1),
+        ("/Windows/System32/kernel32.dll", "kernel32.dll", ".dll", "file", 700000, "2021-06-01 08:00:00", 0),
+    ]
+    ids = {}
+    for full_path, name, extension, tipo, size, mtime, deleted in filas:
+        ids[name] = insertar_filesystem_entry(cursor, 1, full_path, name, extension, tipo, size, 0,
+                                              mtime=mtime, deleted=deleted)
+    insertar_file_hash(cursor, ids["kernel32.dll"], "ab" * 32, "cd" * 16)
+    insertar_file_hash(cursor, ids["notas.docx"], "3a7bd3e2" + "0" * 56)
+    marcar_entradas_conocidas(cursor, [ids["kernel32.dll"]])
+    conn_caso.commit()
+    return db_caso, conn_caso
+
+
+@pytest.mark.parametrize("texto, esperados", [
+    ("factura", ["factura_01.pdf", "factura_02.pdf"]),
+    ("ext:.pdf", ["factura_01.pdf", "factura_02.pdf"]),
+    ("ext:pdf,docx", ["factura_01.pdf", "factura_02.pdf", "notas.docx"]),
+    ("name:fac*_0?.pdf size>1K", ["factura_01.pdf"]),
+    ("size:1K..10M", ["factura_01.pdf", "notas.docx"]),
+    ("mtime:2023-01..2023-03", ["factura_01.pdf", "plan.txt"]),
+    ("mtime<2023", ["notas.docx"]),
+    ('"mis documentos"', ["plan.txt"]),
+    ("user:JIMMY", ["factura_01.pdf", "factura_02.pdf", "notas.docx"]),
+    ("deleted:yes", ["plan.txt"]),
+    ("type:dir", ["Documents"]),
+    ("hash:3A7BD3E2", ["notas.docx"]),
+    ("kernel32", []),
+    ("kernel32 known:all", ["kernel32.dll"]),
+    ("known:yes ext:.dll", ["kernel32.dll"]),
+])
+def test_filtros(caso, texto, esperados):
+    assert _nombres(*caso, texto) == esperados
+
+
+def test_conocidos_ocultos_se_cuentan(caso):
+    resultados = _resultados(*caso, "Windows")
+    try:
+        assert len(resultados) == 0
+        assert resultados.total == 0
+        assert resultados.ocultos == 1
+    finally:
+        resultados.cerrar()
+
+
+@pytest.mark.parametrize("texto", ["", '""', "size>abc", "mtime:2023-13", "known:quizas", "sort:inode",
+                                   "limit:0", "hash:xyz", "ext:", "deleted>1"])
+def test_terminos_no_validos(conn_caso, texto):
+    with pytest.raises(ValueError):
+        compilar_consulta(conn_caso.cursor(), texto)
+
+
+@pytest.fixture
+def caso_grande(db_caso, conn_caso):
+    # Tamaños repetidos: el orden por size necesita el desempate por entry_id del keyset
+    cursor = conn_caso.cursor()
+    for i in range(53):
+        insertar_filesystem_entry(cursor, 1, f"/datos/fichero_{i:03d}.bin", f"fichero_{i:03d}.bin", ".bin",
+                                  "file", (i * 7) % 10, 0)
+    conn_caso.commit()
+    return db_caso, conn_caso
+
+
+def test_paginacion_recorre_todas_las_filas(caso_grande):
+    db_caso, conn = caso_grande
+    resultados = compilar_consulta(conn.cursor(), "ext:.bin").resultados(db_caso, tamano_pagina=5, paginas_en_memoria=2)
+    try:
+        ids = [resultados[i][0] for i in range(53)]
+        assert ids == sorted(ids) and len(set(ids)) == 53
+        assert resultados.completo
+        # Las primeras paginas ya no estan en memoria: se vuelven a leer desde su inicio
+        assert [resultados[i][0] for i in range(12)] == ids[:12]
+        with pytest.raises(IndexError):
+            resultados[53]
+    finally:
+        resultados.cerrar()
+
+
+@pytest.mark.parametrize("orden, descendente", [("sort:size", False), ("sort:-size", True)])
+def test_paginacion_ordenada_con_empates(caso_grande, orden, descendente):
+    db_caso, conn = caso_grande
+    esperado = [fila[0] for fila in conn.execute(
+        f"SELECT entry_id FROM filesystem_entry ORDER BY size {'DESC' if descendente else 'ASC'}, "
+        f"entry_id {'DESC' if descendente else 'ASC'}"
+    )]
+    resultados = compilar_consulta(conn.cursor(), f"ext:.bin {orden}").resultados(db_caso, tamano_pagina=4,
+                                                                                   paginas_en_memoria=1)
+    try:
+        resultados.asegurar(10 ** 6)
+        assert [resultados[i][0] for i in range(len(resultados))] == esperado
+    finally:
+        resultados.cerrar()
+
+
+def test_limite(caso_grande):
+    resultados = _resultados(*caso_grande, "fichero limit:12", tamano_pagina=5)
+    try:
+        assert len(resultados) == 12
+        assert resultados.completo
+        assert resultados.total == 12
+    finally:
+        resultados.cerrar()
@@ -0,0 +1,95 @@
+import json
+import sqlite3
+
+from database.create_database import EscritorIngesta, obtener_etapa
+from forensic_core.arbol_directorios import construir_arbol
+
+
+def _guardadas(db_caso):
+    # Lo que ve otra conexion: solo lo ya volcado y confirmado
+    conn = sqlite3.connect(db_caso)
+    try:
+        entradas = [fila[0] for fila in conn.execute("SELECT entry_id FROM filesystem_entry ORDER BY entry_id")]
+        con_hash = [fila[0] for fila in conn.execute("SELECT entry_id FROM file_hash ORDER BY entry_id")]
+        fila = obtener_etapa(conn.cursor(), "recorrido_1")
+        return entradas, con_hash, json.loads(fila[1]) if fila else None
+    finally:
+        conn.close()
+
+
+def _entrada(escritor, posicion, full_path=None, tipo="file", deleted=0):
+    full_path = full_path or f"/f{posicion}.txt"
+    entry_id = escritor.insertar_filesystem_entry(1, full_path, full_path.rpartition("/")[2], ".txt", tipo,
+                                                  10, posicion, deleted=deleted)
+    if tipo == "file":
+        escritor.insertar_file_hash(entry_id, f"{posicion:064x}")
+    escritor.fin_entrada(1, {"posicion": posicion})
+    return entry_id
+
+
+def test_vuelca_entre_entradas_con_su_checkpoint(db_caso, conn_caso):
+    escritor = EscritorIngesta(conn_caso, tamano_lote=5)
+    escritor.etapas_checkpoint[1] = "recorrido_1"
+    ids = [_entrada(escritor, posicion) for posicion in range(7)]
+    assert ids == list(range(1, 8))
+
+    # Cada entrada son dos filas: se vuelca tras la 3.ª y la 6.ª, nunca con la entrada a medias
+    entradas, con_hash, checkpoint = _guardadas(db_caso)
+    assert entradas == ids[:6]
+    assert con_hash == entradas
+    assert checkpoint == {"posicion": 5}
+
+    escritor.vaciar()
+    entradas, con_hash, checkpoint = _guardadas(db_caso)
+    assert entradas == con_hash == ids
+    assert checkpoint == {"posicion": 6}
+
+
+def test_fin_entrada_sin_checkpoint_no_lo_cambia(db_caso, conn_caso):
+    escritor = EscritorIngesta(conn_caso, tamano_lote=1)
+    escritor.etapas_checkpoint[1] = "recorrido_1"
+    _entrada(escritor, 0)
+    escritor.insertar_filesystem_entry(1, "/sin_posicion", "sin_posicion", None, "file", 0, 99)
+    escritor.fin_entrada()
+    entradas, _, checkpoint = _guardadas(db_caso)
+    assert len(entradas) == 2
+    assert checkpoint == {"posicion": 0}
+
+
+def test_reanudar_sigue_los_entry_id_y_los_directorios(db_caso, conn_caso):
+    with EscritorIngesta(conn_caso) as escritor:
+        directorio = _entrada(escritor, 0, "/docs", tipo="dir")
+        _entrada(escritor, 1, "/docs/a.txt")
+
+    # Un escritor nuevo (la ingesta reanudada) continua la numeracion y conoce /docs
+    with EscritorIngesta(conn_caso) as escritor:
+        hijo = _entrada(escritor, 2, "/docs/b.txt")
+        raiz = _entrada(escritor, 3, "/c.txt")
+    assert hijo == 3 and raiz == 4
+
+    filas = dict((fila[0], fila[1:]) for fila in conn_caso.execute(
+        "SELECT entry_id, parent_id, depth FROM filesystem_entry"
+    ))
+    assert filas == {directorio: (None, 1), 2: (directorio, 2), hijo: (directorio, 2), raiz: (None, 1)}
+
+
+def test_padre_vigente_y_padre_insertado_despues(db_caso, conn_caso):
+    with EscritorIngesta(conn_caso) as escritor:
+        # Orden de MFT: el fichero llega antes que su directorio
+        adelantado = _entrada(escritor, 0, "/tmp/x/antes.txt")
+        borrado = _entrada(escritor, 1, "/tmp", tipo="dir", deleted=1)
+        vigente = _entrada(escritor, 2, "/tmp", tipo="dir")
+        otro_borrado = _entrada(escritor, 3, "/tmp", tipo="dir", deleted=1)
+        subdirectorio = _entrada(escritor, 4, "/tmp/x", tipo="dir")
+        despues = _entrada(escritor, 5, "/tmp/x/despues.txt")
+
+    padres = dict(conn_caso.execute("SELECT entry_id, parent_id FROM filesystem_entry"))
+    assert padres[adelantado] is None
+    assert padres[subdirectorio] == vigente != borrado != otro_borrado
+    assert padres[despues] == subdirectorio
+
+    # construir_arbol solo completa la entrada que llego antes que su directorio
+    assert construir_arbol(db_caso) == 1
+    padres = dict(conn_caso.execute("SELECT entry_id, parent_id FROM filesystem_entry"))
+    assert padres[adelantado] == subdirectorio
+    assert construir_arbol(db_caso) == 0
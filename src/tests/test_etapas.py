@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from forensic_core.etapas import (ESTADO_COMPLETADA, ESTADO_EN_CURSO, ETAPA_FIN, ETAPA_MODO_RECORRIDO, completar_etapa,
+                                  ejecutar_etapa, etapas_pendientes, fijar_modo_recorrido, ingesta_pendiente)
+
+
+def _estado(db_caso, etapa):
+    conn = sqlite3.connect(db_caso)
+    try:
+        fila = conn.execute("SELECT estado FROM ingesta_etapa WHERE etapa = ?", (etapa,)).fetchone()
+        return fila[0] if fila else None
+    finally:
+        conn.close()
+
+
+def test_etapa_completada_no_se_repite(db_caso):
+    llamadas = []
+
+    def funcion(valor, doble=False):
+        llamadas.append(valor)
+        return valor * 2 if doble else valor
+
+    assert ejecutar_etapa(db_caso, "indices", funcion, 21, doble=True) == 42
+    assert _estado(db_caso, "indices") == ESTADO_COMPLETADA
+    assert ejecutar_etapa(db_caso, "indices", funcion, 21, doble=True) is None
+    assert llamadas == [21]
+
+
+def test_etapa_fallida_se_reanuda(db_caso):
+    intentos = []
+
+    def funcion():
+        intentos.append(1)
+        if len(intentos) == 1:
+            raise OSError("fallo simulado")
+        return "hecho"
+
+    with pytest.raises(OSError):
+        ejecutar_etapa(db_caso, "recorrido_4", funcion)
+    assert _estado(db_caso, "recorrido_4") == ESTADO_EN_CURSO
+    assert etapas_pendientes(db_caso) == ["recorrido_4"]
+    assert ingesta_pendiente(db_caso)
+
+    assert ejecutar_etapa(db_caso, "recorrido_4", funcion) == "hecho"
+    assert etapas_pendientes(db_caso) == []
+    # Sin la etapa final la ingesta sigue pendiente
+    assert ingesta_pendiente(db_caso)
+    completar_etapa(db_caso, ETAPA_FIN)
+    assert not ingesta_pendiente(db_caso)
+
+
+def test_las_etapas_quedan_medidas(db_caso):
+    with pytest.raises(ValueError):
+        ejecutar_etapa(db_caso, "artefactos", int, "no es un numero")
+    ejecutar_etapa(db_caso, "artefactos", int, "7")
+    conn = sqlite3.connect(db_caso)
+    try:
+        errores = [fila[0] for fila in conn.execute("SELECT error FROM stage_metrics WHERE etapa = 'artefactos'")]
+    finally:
+        conn.close()
+    assert len(errores) == 2
+    assert errores[0] and "ValueError" in errores[0]
+    assert errores[1] is None
+
+
+def test_modo_recorrido_se_mantiene_al_reanudar(conn_caso):
+    cursor = conn_caso.cursor()
+    assert fijar_modo_recorrido(cursor, "mft") == "mft"
+    assert fijar_modo_recorrido(cursor, "directorios") == "mft"
+    assert cursor.execute("SELECT estado FROM ingesta_etapa WHERE etapa = ?",
+                          (ETAPA_MODO_RECORRIDO,)).fetchone()[0] == ESTADO_COMPLETADA
+
+
+def test_caso_sin_etapas(tmp_path):
+    ruta = str(tmp_path / "antiguo.db")
+    sqlite3.connect(ruta).close()
+    assert not ingesta_pendiente(ruta)
+    assert etapas_pendientes(ruta) == []
@@ -0,0 +1,98 @@
+import hashlib
+
+import pytest
+
+from database.create_database import insertar_file_hash, insertar_filesystem_entry
+from forensic_core.ficheros_conocidos import ConjuntoConocidos, abrir_conjunto, construir_conjunto, marcar_conocidos
+
+
+def _md5(texto):
+    return hashlib.md5(texto.encode()).hexdigest()
+
+
+def _sha256(texto):
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+MD5 = [_md5(f"md5-{i}") for i in range(40)]
+SHA256 = [_sha256(f"sha-{i}") for i in range(40)]
+# Extremos de la tabla de prefijos y dos hashes con el mismo prefijo
+BORDES = ["0" * 64, "f" * 64, "abcd" + "0" * 60, "abcd" + "f" * 60]
+
+
+@pytest.fixture
+def conjunto(tmp_path):
+    texto = tmp_path / "hashes.txt"
+    texto.write_text("\n".join(MD5[:20] + SHA256[:20] + [MD5[0], SHA256[0].upper()]) + "\n")
+    # CSV estilo NSRL: el SHA-1 se ignora
+    csv = tmp_path / "NSRLFile.csv"
+    lineas = ['"SHA-1","MD5","FileName","FileSize"']
+    lineas += [f'"{hashlib.sha1(m.encode()).hexdigest().upper()}","{m.upper()}","f{i}.dll","1"'
+               for i, m in enumerate(MD5[20:])]
+    lineas += [f"{s},{b}" for s, b in zip(SHA256[20:], BORDES)]
+    lineas += [f"{s}" for s in SHA256[24:]]
+    csv.write_text("\n".join(lineas) + "\n")
+
+    destino = tmp_path / "conocidos.idx"
+    # Tramos pequeños para que la construccion mezcle varios
+    totales = construir_conjunto([str(texto), str(csv)], str(destino), hashes_por_tramo=7)
+    assert totales == {"md5": 40, "sha256": 44}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["NSRLFile.csv", "conocidos.idx", "hashes.txt"]
+    conjunto = ConjuntoConocidos(str(destino))
+    yield conjunto
+    conjunto.cerrar()
+
+
+def test_consulta(conjunto):
+    assert len(conjunto) == 84
+    assert all(conjunto.contiene_md5(m) for m in MD5)
+    assert all(conjunto.contiene_sha256(s) for s in SHA256 + BORDES)
+    assert conjunto.contiene_sha256(SHA256[3].upper())
+    assert not conjunto.contiene_md5(_md5("otro"))
+    assert not conjunto.contiene_sha256(_sha256("otro"))
+    assert not conjunto.contiene_sha256("abcd" + "1" * 60)
+    # Un hash de otro algoritmo, mal formado o vacio no es conocido
+    assert not conjunto.contiene_sha256(MD5[0])
+    assert not conjunto.contiene_md5("zz" * 16)
+    assert not conjunto.conocido(None, None)
+    assert conjunto.conocido(_sha256("otro"), MD5[5])
+
+
+def test_conjunto_vacio(tmp_path):
+    origen = tmp_path / "vacio.txt"
+    origen.write_text("sin hashes\n")
+    destino = str(tmp_path / "vacio.idx")
+    assert construir_conjunto(str(origen), destino) == {"md5": 0, "sha256": 0}
+    conjunto = ConjuntoConocidos(destino)
+    try:
+        assert len(conjunto) == 0
+        assert not conjunto.conocido(SHA256[0], MD5[0])
+    finally:
+        conjunto.cerrar()
+
+
+def test_fichero_no_valido(tmp_path):
+    ruta = tmp_path / "otro.idx"
+    ruta.write_bytes(b"no es un conjunto" * 10)
+    assert abrir_conjunto(str(ruta)) is None
+    assert abrir_conjunto(str(tmp_path / "no_existe.idx")) is None
+    assert abrir_conjunto(None) is None
+
+
+def test_marcar_conocidos(tmp_path, db_caso, conn_caso):
+    origen = tmp_path / "hashes.txt"
+    origen.write_text(f"{SHA256[0]}\n{MD5[1]}\n")
+    destino = str(tmp_path / "conocidos.idx")
+    construir_conjunto(str(origen), destino)
+
+    cursor = conn_caso.cursor()
+    ids = [insertar_filesystem_entry(cursor, 1, f"/f{i}", f"f{i}", None, "file", 1, i) for i in range(3)]
+    insertar_file_hash(cursor, ids[0], SHA256[0])
+    insertar_file_hash(cursor, ids[1], _sha256("otro"), MD5[1])
+    insertar_file_hash(cursor, ids[2], _sha256("otro mas"), _md5("otro mas"))
+    cursor.execute("UPDATE filesystem_entry SET known = 1 WHERE entry_id = ?", (ids[2],))
+    conn_caso.commit()
+
+    assert marcar_conocidos(db_caso, destino) == 2
+    conocidas = [fila[0] for fila in conn_caso.execute("SELECT entry_id FROM filesystem_entry WHERE known = 1")]
+    assert conocidas == ids[:2]
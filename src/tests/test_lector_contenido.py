@@ -0,0 +1,140 @@
+import io
+
+import pytest
+
+pytsk3 = pytest.importorskip("pytsk3")
+
+from forensic_core.lector_contenido import copiar_contenido, iterar_contenido, obtener_runs  # noqa: E402
+
+
+BLOQUE = 512
+OFFSET_FS = 1024
+
+
+class _Run:
+    def __init__(self, offset, longitud, addr=0, flags=0):
+        self.offset = offset
+        self.len = longitud
+        self.addr = addr
+        self.flags = flags
+
+
+class _Atributo:
+    def __init__(self, runs, initsize, flags=None, tipo=None):
+        self.runs = runs
+        self.info = _Info(
+            type=int(pytsk3.TSK_FS_ATTR_TYPE_DEFAULT) if tipo is None else tipo,
+            name=None,
+            flags=int(pytsk3.TSK_FS_ATTR_NONRES) if flags is None else flags,
+            nrd=_Info(initsize=initsize),
+        )
+
+    def __iter__(self):
+        return iter(self.runs)
+
+
+class _Info:
+    def __init__(self, **valores):
+        self.__dict__.update(valores)
+
+
+class _Fichero:
+    """
+    Fichero de TSK con un solo atributo; read_random lee el contenido esperado.
+    """
+
+    def __init__(self, atributo, contenido):
+        self.atributo = atributo
+        self.contenido = contenido
+        self.lecturas_random = 0
+
+    def __iter__(self):
+        return iter([self.atributo])
+
+    def read_random(self, offset, longitud):
+        self.lecturas_random += 1
+        return self.contenido[offset:offset + longitud]
+
+
+class _Imagen:
+    def __init__(self, datos, tope=None):
+        self.datos = datos
+        self.tope = len(datos) if tope is None else tope
+
+    def read(self, offset, longitud):
+        return self.datos[offset:min(offset + longitud, self.tope)]
+
+
+FS_INFO = _Info(info=_Info(block_size=BLOQUE, offset=OFFSET_FS))
+
+
+def _bloque(n):
+    return bytes([n]) * BLOQUE
+
+
+@pytest.fixture
+def disperso():
+    """
+    Bloques logicos: 0 en el cluster 2, 1 disperso, 2 sin run (hueco), 3-4 en los clusters 5-6.
+    El tamaño inicializado acaba a mitad del bloque 4 y el fichero medio bloque despues.
+    """
+    imagen = bytes(OFFSET_FS) + b"".join(_bloque(i) for i in range(8))
+    runs = [
+        _Run(3, 2, addr=5),
+        _Run(0, 1, addr=2),
+        _Run(1, 1, flags=int(pytsk3.TSK_FS_ATTR_RUN_FLAG_SPARSE)),
+    ]
+    initsize = 4 * BLOQUE + 100
+    size = 5 * BLOQUE + 256
+    esperado = _bloque(2) + bytes(2 * BLOQUE) + _bloque(5) + _bloque(6)[:100]
+    esperado += bytes(size - len(esperado))
+    return imagen, _Atributo(runs, initsize), size, esperado
+
+
+def test_runs_ordenados_y_dispersos(disperso):
+    imagen, atributo, size, _ = disperso
+    runs, initsize = obtener_runs(_Fichero(atributo, b""), FS_INFO, size)
+    assert runs == [
+        (0, OFFSET_FS + 2 * BLOQUE, BLOQUE),
+        (BLOQUE, None, BLOQUE),
+        (3 * BLOQUE, OFFSET_FS + 5 * BLOQUE, 2 * BLOQUE),
+    ]
+    assert initsize == 4 * BLOQUE + 100
+
+
+@pytest.mark.parametrize("tamano_bloque", [BLOQUE, 300, 1 << 20])
+def test_contenido_disperso(disperso, tamano_bloque):
+    imagen, atributo, size, esperado = disperso
+    fichero = _Fichero(atributo, esperado)
+    bloques = list(iterar_contenido(fichero, size, _Imagen(imagen), FS_INFO, tamano_bloque=tamano_bloque))
+    assert b"".join(bloques) == esperado
+    assert max(len(bloque) for bloque in bloques) <= tamano_bloque
+    assert fichero.lecturas_random == 0
+
+
+def test_lectura_corta_sigue_por_tsk(disperso):
+    imagen, atributo, size, esperado = disperso
+    fichero = _Fichero(atributo, esperado)
+    destino = io.BytesIO()
+    # La imagen se acaba a mitad del cluster 5
+    escritos = copiar_contenido(fichero, size, destino, _Imagen(imagen, tope=OFFSET_FS + 5 * BLOQUE + 10), FS_INFO)
+    assert escritos == size
+    assert destino.getvalue() == esperado
+    assert fichero.lecturas_random > 0
+
+
+@pytest.mark.parametrize("atributo", [
+    # Residente
+    _Atributo([], 0, flags=0),
+    # Comprimido
+    _Atributo([_Run(0, 1, addr=2)], BLOQUE,
+              flags=int(pytsk3.TSK_FS_ATTR_NONRES) | int(pytsk3.TSK_FS_ATTR_COMP)),
+    # Tramo de ubicacion desconocida
+    _Atributo([_Run(0, 1, flags=int(pytsk3.TSK_FS_ATTR_RUN_FLAG_FILLER))], BLOQUE),
+])
+def test_sin_runs_se_lee_con_read_random(atributo):
+    contenido = bytes(range(256)) * 3
+    fichero = _Fichero(atributo, contenido)
+    assert obtener_runs(fichero, FS_INFO, len(contenido)) is None
+    assert b"".join(iterar_contenido(fichero, len(contenido), _Imagen(b""), FS_INFO)) == contenido
+    assert fichero.lecturas_random > 0
@@ -10,7 +10,7 @@ def calcular_sha256(path):
             hash_sha256.update(chunk)
     return hash_sha256.hexdigest()
 
-def crear_directorio_caso(nombre):
-    base_dir = os.path.join(CASES_DIR, nombre)
+def crear_directorio_caso(nombre, casos_dir=CASES_DIR):
+    base_dir = os.path.join(casos_dir, nombre)
     os.makedirs(base_dir, exist_ok=True)
     return base_dir